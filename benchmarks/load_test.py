@@ -0,0 +1,306 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+from array import array
+from master.modbus_master import ModbusMasterClient
+from shared.protocol import MAX_READ_REGISTERS
+from shared.utils import configure_logging, WARNING
+
+try:
+    import resource
+except ImportError:     # Windows: sin getrusage (el informe lleva max_rss_kb None)
+    resource = None
+
+
+# ------------------------------------------------
+# Utilidades
+# ------------------------------------------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _usage():
+    if resource is None:
+        times = os.times()
+        return {"user": times.user, "system": times.system, "max_rss_kb": None}
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {"user": usage.ru_utime, "system": usage.ru_stime, "max_rss_kb": rss}
+
+
+def _cpu(user, system, wall):
+    return {"user_s": round(user, 3), "system_s": round(system, 3),
+            "percent": round(100 * (user + system) / wall, 1) if wall else None}
+
+
+def percentiles(samples):
+    """Estadísticas exactas (ms) de una lista de latencias en segundos."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+
+    def at(q):
+        return round(ordered[min(last, int(q * len(ordered)))] * 1000, 4)
+
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered) * 1000, 4),
+            "p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1] * 1000, 4)}
+
+
+# ------------------------------------------------
+# Proceso del esclavo
+# ------------------------------------------------
+def _serve(engine, port, ready, stop, results, snapshot=None):
+    from slave.modbus_slave import ModbusSlaveServer
+    configure_logging(level=WARNING)
+    server = ModbusSlaveServer("127.0.0.1", port, engine=engine)
+    if snapshot:
+        server.load_snapshot(snapshot)
+    server.start()
+    start = _usage()
+    ready.set()
+    stop.wait()
+    end = _usage()
+    results.put({"start": start, "end": end, "requests": server.request_count,
+                 "latency": server.metrics.stats()["latency_all"]})
+    server.stop()
+
+
+# ------------------------------------------------
+# Procesos de clientes
+# ------------------------------------------------
+def _client_loop(config, port, seed, measure_from, measure_to, out):
+    rng = random.Random(seed)
+    client = ModbusMasterClient("127.0.0.1", port, max_in_flight=config["in_flight"])
+    reads, writes = array("d"), array("d")
+    errors = 0
+    if not client.connect():
+        out.append((reads, writes, 1))
+        return
+    read_size, write_size, write_ratio = config["read_size"], config["write_size"], config["write_ratio"]
+    clock = time.perf_counter
+    while True:
+        started = clock()
+        if started >= measure_to:
+            break
+        if rng.random() < write_ratio:
+            address = rng.randrange(0, 65536 - write_size)
+            if write_size == 1:
+                ok = client.write_register(address, rng.randrange(65536))
+            else:
+                ok = client.write_many({address + i: rng.randrange(65536) for i in range(write_size)}).ok
+            samples = writes
+        else:
+            address = rng.randrange(0, 65536 - read_size)
+            ok = client.read_registers(address, read_size) is not None
+            samples = reads
+        finished = clock()
+        if started >= measure_from:
+            samples.append(finished - started)
+            errors += not ok
+    client.disconnect()
+    out.append((reads, writes, errors))
+
+
+def _run_worker(config, port, clients, seed, results):
+    configure_logging(level=WARNING)
+    start = _usage()
+    # Cada proceso mide `duration` segundos tras su propio calentamiento
+    now = time.perf_counter()
+    measure_from = now + config["warmup"]
+    measure_to = measure_from + config["duration"]
+    out = []
+    threads = [threading.Thread(target=_client_loop, args=(config, port, seed + i, measure_from, measure_to, out))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reads, writes, errors = array("d"), array("d"), 0
+    for r, w, e in out:
+        reads.extend(r)
+        writes.extend(w)
+        errors += e
+    results.put({"reads": reads.tobytes(), "writes": writes.tobytes(), "errors": errors,
+                 "start": start, "end": _usage()})
+
+
+# ------------------------------------------------
+# Orquestación
+# ------------------------------------------------
+def run(config):
+    """Ejecuta una prueba de carga y devuelve el informe (dict serializable a JSON)."""
+    context = multiprocessing.get_context("spawn")
+    server = None
+    server_results = context.Queue()
+    if config["target"]:
+        host, port = config["target"].rsplit(":", 1)
+        if host not in ("127.0.0.1", "localhost"):
+            raise ValueError("Only local targets are supported")
+        port = int(port)
+    else:
+        port = _free_port()
+        ready, stop = context.Event(), context.Event()
+        server = context.Process(target=_serve, args=(config["engine"], port, ready, stop, server_results))
+        server.start()
+        if not ready.wait(10):
+            server.terminate()
+            raise RuntimeError("Slave did not start")
+
+    workers = []
+    worker_results = context.Queue()
+    per_worker = [config["clients"] // config["processes"]] * config["processes"]
+    for i in range(config["clients"] % config["processes"]):
+        per_worker[i] += 1
+    for index, clients in enumerate(per_worker):
+        if clients:
+            worker = context.Process(target=_run_worker,
+                                     args=(config, port, clients, config["seed"] + index * 1000, worker_results))
+            worker.start()
+            workers.append(worker)
+
+    timeout = config["warmup"] + config["duration"] + 60
+    results = [worker_results.get(timeout=timeout) for _ in workers]
+    for worker in workers:
+        worker.join()
+    server_report = None
+    if server:
+        stop.set()
+        server_report = server_results.get(timeout=10)
+        server.join(timeout=10)
+
+    reads, writes, errors = array("d"), array("d"), 0
+    client_user = client_system = 0.0
+    client_rss = []
+    for result in results:
+        reads.frombytes(result["reads"])
+        writes.frombytes(result["writes"])
+        errors += result["errors"]
+        client_user += result["end"]["user"] - result["start"]["user"]
+        client_system += result["end"]["system"] - result["start"]["system"]
+        client_rss.append(result["end"]["max_rss_kb"])
+
+    # El CPU incluye el calentamiento (no se puede separar), por eso se divide por el tiempo total
+    wall = config["duration"] + config["warmup"]
+    duration = config["duration"]
+    operations = len(reads) + len(writes)
+    report = {
+        "config": config,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": multiprocessing.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "throughput": {
+            "operations_per_s": round(operations / duration, 1),
+            "reads_per_s": round(len(reads) / duration, 1),
+            "writes_per_s": round(len(writes) / duration, 1),
+            "registers_per_s": round((len(reads) * config["read_size"] + len(writes) * config["write_size"])
+                                     / duration, 1),
+        },
+        "latency_ms": {"read": percentiles(reads), "write": percentiles(writes)},
+        "errors": errors,
+        "clients": {"cpu": _cpu(client_user, client_system, wall),
+                    "max_rss_kb": None if None in client_rss else max(client_rss, default=0)},
+    }
+    if server_report:
+        start, end = server_report["start"], server_report["end"]
+        report["server"] = {
+            "cpu": _cpu(end["user"] - start["user"], end["system"] - start["system"], wall),
+            "max_rss_kb": server_report["end"]["max_rss_kb"],
+            "requests": server_report["requests"],
+            "processing_ms": {key: round(value * 1000, 4) if isinstance(value, float) else value
+                              for key, value in server_report["latency"].items()},
+        }
+    return report
+
+
+def _change(old, new):
+    """Variación porcentual; "n/a" con una base a 0 (p. ej. una ejecución en la que todo falló)."""
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def compare(report, baseline, tolerance):
+    """Compara con un informe anterior; devuelve la lista de regresiones por encima de `tolerance`."""
+    regressions = []
+    changed = [key for key, value in report["config"].items()
+               if key not in ("seed", "target") and baseline["config"].get(key) != value]
+    if changed:
+        print(f"Warning: configuration differs from baseline ({', '.join(changed)})")
+    old, new = baseline["throughput"]["operations_per_s"], report["throughput"]["operations_per_s"]
+    print(f"throughput: {old:.0f} -> {new:.0f} ops/s ({_change(old, new)})")
+    if new < old * (1 - tolerance):
+        regressions.append("throughput")
+    for kind in ("read", "write"):
+        old_stats, new_stats = baseline["latency_ms"].get(kind), report["latency_ms"].get(kind)
+        if not old_stats or not new_stats:
+            continue
+        for key in ("p50", "p99"):
+            old, new = old_stats[key], new_stats[key]
+            print(f"{kind} {key}: {old:.3f} -> {new:.3f} ms ({_change(old, new)})")
+            if new > old * (1 + tolerance):
+                regressions.append(f"{kind} {key}")
+    return regressions
+
+
+# ------------------------------------------------
+# Punto de entrada
+# ------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Modbus TCP load test (slave throughput / master scan rate)")
+    parser.add_argument("--engine", choices=("thread", "async"), default="async", help="slave engine")
+    parser.add_argument("--target", help="benchmark an already running local slave (127.0.0.1:port)")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent master clients")
+    parser.add_argument("--processes", type=int, default=1, help="client processes (clients are split across them)")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before the run")
+    parser.add_argument("--read-size", type=int, default=10, help="registers per read")
+    parser.add_argument("--write-size", type=int, default=1, help="registers per write (1 = FC6, >1 = FC16)")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="fraction of operations that are writes")
+    parser.add_argument("--in-flight", type=int, default=1, help="pipelined requests per client for reads > 125")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (fraction)")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.read_size <= 65535 or not 1 <= args.write_size <= 65535:
+        parser.error("read/write size out of range")
+    if args.clients < 1 or args.processes < 1:
+        parser.error("--clients and --processes must be >= 1")
+    config = {
+        "engine": args.engine, "target": args.target, "clients": args.clients,
+        "processes": min(args.processes, args.clients), "duration": args.duration, "warmup": args.warmup,
+        "read_size": args.read_size, "write_size": args.write_size, "write_ratio": args.write_ratio,
+        "in_flight": args.in_flight, "seed": args.seed,
+    }
+    if args.read_size > MAX_READ_REGISTERS:
+        # Las lecturas grandes se dividen en varias peticiones FC3 (en pipeline con --in-flight)
+        config["requests_per_read"] = -(-args.read_size // MAX_READ_REGISTERS)
+
+    report = run(config)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
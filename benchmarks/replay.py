@@ -0,0 +1,240 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import socket
+import sys
+import threading
+import time
+from array import array
+from benchmarks.load_test import _cpu, _free_port, _serve, _usage, compare, percentiles
+from shared.capture import read_capture
+from shared.protocol import MBAP_SIZE, ModbusProtocolError, build_frame, parse_mbap
+from shared.utils import configure_logging, WARNING
+
+# Funciones de lectura (FC1–FC4); el resto cuenta como escritura
+READ_CODES = frozenset((1, 2, 3, 4))
+
+
+# ------------------------------------------------
+# Captura
+# ------------------------------------------------
+def load_sessions(path):
+    """Agrupa una captura por sesión: {sesión: [Transaction, ...]} ordenadas por tiempo.
+
+    Los tiempos quedan relativos a la primera transacción de la captura.
+    """
+    sessions = {}
+    for transaction in read_capture(path):
+        sessions.setdefault(transaction.session, []).append(transaction)
+    if not sessions:
+        return sessions
+    origin = min(transactions[0].time for transactions in sessions.values())
+    for transactions in sessions.values():
+        transactions.sort(key=lambda transaction: transaction.time)
+        for transaction in transactions:
+            transaction.time -= origin
+    return sessions
+
+
+# ------------------------------------------------
+# Reproducción de una sesión
+# ------------------------------------------------
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed by slave")
+        data += chunk
+    return bytes(data)
+
+
+def _replay_session(transactions, port, speed, timeout, barrier, start, out):
+    """Una conexión por sesión: envía cada petición en su instante (t / speed) y espera la respuesta.
+
+    Con `speed` None las peticiones se encadenan sin pausas. Un error de red o
+    un timeout cierra la sesión: las peticiones restantes cuentan como errores.
+    """
+    reads, writes, lag = array("d"), array("d"), array("d")
+    errors = mismatches = 0
+    sock = None
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        sock = None
+    # Todas las sesiones arrancan a la vez, ya conectadas
+    barrier.wait()
+    if sock is None:
+        out.append((reads, writes, lag, len(transactions), 0))
+        return
+    clock = time.perf_counter
+    t0 = start[0]
+    with sock:
+        for index, transaction in enumerate(transactions):
+            if speed:
+                due = t0 + transaction.time / speed
+                delay = due - clock()
+                if delay > 0:
+                    time.sleep(delay)
+                lag.append(max(0.0, clock() - due))
+            sent = clock()
+            try:
+                sock.sendall(build_frame(index & 0xFFFF, transaction.unit_id, transaction.request))
+                transaction_id, length, _unit_id = parse_mbap(_recv_exact(sock, MBAP_SIZE))
+                response = _recv_exact(sock, length)
+            except (OSError, ModbusProtocolError):
+                errors += len(transactions) - index
+                break
+            elapsed = clock() - sent
+            if transaction_id != index & 0xFFFF:
+                errors += len(transactions) - index
+                break
+            (reads if transaction.request[0] in READ_CODES else writes).append(elapsed)
+            if transaction.response and response != transaction.response:
+                mismatches += 1
+    out.append((reads, writes, lag, errors, mismatches))
+
+
+# ------------------------------------------------
+# Orquestación
+# ------------------------------------------------
+def run(config):
+    """Reproduce una captura contra un esclavo local y devuelve el informe (dict serializable a JSON)."""
+    sessions = load_sessions(config["capture"])
+    if not sessions:
+        raise ValueError(f"Empty capture: {config['capture']}")
+    speed = None if config["speed"] == "max" else float(config["speed"])
+
+    context = multiprocessing.get_context("spawn")
+    server = None
+    server_results = context.Queue()
+    if config["target"]:
+        host, port = config["target"].rsplit(":", 1)
+        if host not in ("127.0.0.1", "localhost"):
+            raise ValueError("Only local targets are supported")
+        port = int(port)
+    else:
+        port = _free_port()
+        ready, stop = context.Event(), context.Event()
+        server = context.Process(target=_serve, args=(config["engine"], port, ready, stop, server_results,
+                                                      config["snapshot"]))
+        server.start()
+        if not ready.wait(10):
+            server.terminate()
+            raise RuntimeError("Slave did not start")
+
+    start = []
+    barrier = threading.Barrier(len(sessions), action=lambda: start.append(time.perf_counter()))
+    out = []
+    threads = [threading.Thread(target=_replay_session,
+                                args=(transactions, port, speed, config["timeout"], barrier, start, out))
+               for transactions in sessions.values()]
+    usage = _usage()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start[0]
+    end = _usage()
+    server_report = None
+    if server:
+        stop.set()
+        server_report = server_results.get(timeout=10)
+        server.join(timeout=10)
+
+    reads, writes, lag = array("d"), array("d"), array("d")
+    errors = mismatches = 0
+    for r, w, l, e, m in out:
+        reads.extend(r)
+        writes.extend(w)
+        lag.extend(l)
+        errors += e
+        mismatches += m
+    transactions = [transaction for session in sessions.values() for transaction in session]
+    recorded = max(transaction.time for transaction in transactions)
+    operations = len(reads) + len(writes)
+    report = {
+        "config": config,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": multiprocessing.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "capture": {
+            "transactions": len(transactions), "sessions": len(sessions), "duration_s": round(recorded, 3),
+            "latency_ms": percentiles([transaction.duration for transaction in transactions]),
+        },
+        "replay": {"duration_s": round(wall, 3), "speedup": round(recorded / wall, 2) if wall else None,
+                   "schedule_lag_ms": percentiles(lag)},
+        "throughput": {
+            "operations_per_s": round(operations / wall, 1),
+            "reads_per_s": round(len(reads) / wall, 1),
+            "writes_per_s": round(len(writes) / wall, 1),
+        },
+        "latency_ms": {"read": percentiles(reads), "write": percentiles(writes)},
+        "errors": errors,
+        # Respuestas distintas de las capturadas (p. ej. el esclavo parte de otro estado)
+        "mismatches": mismatches,
+        "clients": {"cpu": _cpu(end["user"] - usage["user"], end["system"] - usage["system"], wall)},
+    }
+    if server_report:
+        start_usage, end_usage = server_report["start"], server_report["end"]
+        report["server"] = {
+            "cpu": _cpu(end_usage["user"] - start_usage["user"], end_usage["system"] - start_usage["system"], wall),
+            "max_rss_kb": end_usage["max_rss_kb"],
+            "requests": server_report["requests"],
+            "processing_ms": {key: round(value * 1000, 4) if isinstance(value, float) else value
+                              for key, value in server_report["latency"].items()},
+        }
+    return report
+
+
+# ------------------------------------------------
+# Punto de entrada
+# ------------------------------------------------
+def _speed(text):
+    if text == "max":
+        return text
+    try:
+        value = float(text)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid speed '{text}' (expected a positive factor or 'max')")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured Modbus TCP traffic against a local slave")
+    parser.add_argument("capture", help="traffic capture (.mbcap)")
+    parser.add_argument("--speed", type=_speed, default=1.0, help="time scale: 1 = real time, 10, 100... or 'max'")
+    parser.add_argument("--engine", choices=("thread", "async"), default="async", help="slave engine")
+    parser.add_argument("--snapshot", help="register snapshot loaded into the spawned slave before the replay")
+    parser.add_argument("--target", help="replay against an already running local slave (127.0.0.1:port)")
+    parser.add_argument("--timeout", type=float, default=3.0, help="response timeout in seconds")
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (fraction)")
+    args = parser.parse_args(argv)
+
+    configure_logging(level=WARNING)
+    config = {"capture": args.capture, "speed": args.speed, "engine": args.engine, "snapshot": args.snapshot,
+              "target": args.target, "timeout": args.timeout}
+    report = run(config)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
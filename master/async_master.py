@@ -0,0 +1,256 @@
+import asyncio
+import time
+from master.modbus_master import plan_reads, _collect_scan, _merge_intervals
+from shared.protocol import (
+    HOLDING_REGISTERS, MAX_READ_REGISTERS, READ_FUNCTIONS, MBAP_SIZE, ModbusProtocolError, ModbusExceptionResponse,
+    build_frame, parse_mbap, check_response, read_table_pdu, write_single_register_pdu, decode_table,
+)
+from shared.metrics import DeviceMetrics
+from shared.utils import log, WARNING
+
+
+class AsyncDeviceSession:
+    """Sesión Modbus TCP asyncio con un dispositivo (equivalente a ModbusMasterClient)."""
+
+    def __init__(self, host="127.0.0.1", port=502, unit_id=1, timeout=3.0, max_gap=0):
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self.max_gap = max_gap
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        self._transaction_id = 0
+        self.metrics = DeviceMetrics("master", f"{host}:{port}/{unit_id}")
+
+    @property
+    def is_open(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    # ------------------------------------------------
+    # Conexión
+    # ------------------------------------------------
+    async def connect(self):
+        """Abre la conexión TCP; devuelve True si tuvo éxito."""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+            return True
+        except (OSError, asyncio.TimeoutError) as e:
+            log("Connection error (%s:%d): %s", self.host, self.port, e, level=WARNING)
+            self._reader = self._writer = None
+            return False
+
+    async def close(self):
+        """Cierra la conexión TCP."""
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    # ------------------------------------------------
+    # Transacciones
+    # ------------------------------------------------
+    async def _request(self, pdu):
+        """Envía un PDU y espera su respuesta (una transacción a la vez por sesión)."""
+        async with self._lock:
+            if not self.is_open and not await self.connect():
+                raise ConnectionError(f"Cannot connect to {self.host}:{self.port}")
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            transaction_id = self._transaction_id
+            metrics = self.metrics
+            started = time.perf_counter()
+            try:
+                self._writer.write(build_frame(transaction_id, self.unit_id, pdu))
+                response = await asyncio.wait_for(self._read_response(transaction_id), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ModbusProtocolError) as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    metrics.timeouts += 1
+                else:
+                    metrics.network_errors += 1
+                metrics.observe(pdu[0], time.perf_counter() - started, MBAP_SIZE + len(pdu), 0)
+                # Conexión en estado desconocido: se reabre en la próxima petición
+                await self.close()
+                raise
+        metrics.observe(pdu[0], time.perf_counter() - started, MBAP_SIZE + len(pdu), MBAP_SIZE + len(response))
+        if response[:1] and response[0] & 0x80 and len(response) > 1:
+            metrics.exception(response[1])
+        check_response(pdu, response)
+        return response
+
+    async def _read_response(self, transaction_id):
+        while True:
+            header = await self._reader.readexactly(MBAP_SIZE)
+            rx_transaction_id, pdu_length, _unit_id = parse_mbap(header)
+            pdu = await self._reader.readexactly(pdu_length)
+            # Respuestas tardías de peticiones anteriores se descartan
+            if rx_transaction_id == transaction_id:
+                return pdu
+
+    # ------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------
+    async def _read_block(self, start_addr, count, table=HOLDING_REGISTERS):
+        """Ejecuta una única petición de lectura (FC1–FC4); los bits se devuelven como PackedBits."""
+        try:
+            response = await self._request(read_table_pdu(table, start_addr, count))
+            return decode_table(table, response, count)
+        except asyncio.TimeoutError:
+            log("Read timeout (%s:%d, %d, %d)", self.host, self.port, start_addr, count, level=WARNING)
+        except (OSError, ModbusProtocolError, ModbusExceptionResponse, asyncio.IncompleteReadError) as e:
+            log("Read error (%s:%d): %s", self.host, self.port, e, level=WARNING)
+        return None
+
+    async def read_registers(self, start_addr=0, count=10):
+        """Lee registros holding; más de 125 se dividen en varias peticiones."""
+        values = []
+        for block_start, block_count in plan_reads([(start_addr, count)], max_count=MAX_READ_REGISTERS):
+            block = await self._read_block(block_start, block_count)
+            if block is None:
+                return None
+            values.extend(block)
+        return values
+
+    async def read_scan(self, addresses, max_gap=None, table=HOLDING_REGISTERS):
+        """Lee un conjunto disperso de direcciones/rangos de una tabla con el mínimo de peticiones."""
+        addresses = list(addresses)
+        gap = self.max_gap if max_gap is None else max_gap
+        blocks = plan_reads(addresses, max_gap=gap, max_count=READ_FUNCTIONS[table][1])
+        results = [await self._read_block(start, count, table) for start, count in blocks]
+        return _collect_scan(_merge_intervals(addresses), blocks, results)
+
+    async def read_tags(self, tags, max_gap=None, table=HOLDING_REGISTERS):
+        """Lee y decodifica un TagSet; devuelve un dict nombre→valor (None si su bloque falló)."""
+        return tags.decode(await self.read_scan(tags.addresses(), max_gap, table))
+
+    async def write_register(self, address, value):
+        """Escribe un valor en un holding register (FC6)."""
+        try:
+            pdu = write_single_register_pdu(address, value)
+            response = await self._request(pdu)
+            return response == pdu
+        except asyncio.TimeoutError:
+            log("Write timeout (%s:%d, address %d)", self.host, self.port, address, level=WARNING)
+        except (OSError, ModbusProtocolError, ModbusExceptionResponse, asyncio.IncompleteReadError) as e:
+            log("Write error (%s:%d): %s", self.host, self.port, e, level=WARNING)
+        return False
+
+
+class PollResult:
+    """Resultado de un ciclo de sondeo de un dispositivo."""
+
+    __slots__ = ("device", "timestamp", "values", "latency", "error")
+
+    def __init__(self, device, timestamp, values, latency, error=None):
+        self.device = device
+        self.timestamp = timestamp
+        self.values = values
+        self.latency = latency
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else self.error
+        return f"PollResult({self.device!r}, {len(self.values)} values, {self.latency * 1000:.1f} ms, {status})"
+
+
+class AsyncMasterEngine:
+    """Motor de sondeo concurrente: muchos dispositivos en un único event loop.
+
+    Cada dispositivo se sondea en su propia tarea con su propio intervalo y
+    timeout, de modo que uno lento no retrasa a los demás. Los resultados se
+    entregan como un flujo (`async for result in engine.stream()`).
+    """
+
+    def __init__(self, max_queue=10000):
+        self.devices = {}
+        self._results = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+
+    def add_device(self, name, host, port=502, unit_id=1, addresses=((0, 10),),
+                   interval=1.0, timeout=3.0, max_gap=0):
+        """Registra un dispositivo y el conjunto de direcciones a sondear."""
+        session = AsyncDeviceSession(host, port, unit_id, timeout=timeout, max_gap=max_gap)
+        self.devices[name] = (session, list(addresses), interval)
+        return session
+
+    def session(self, name):
+        return self.devices[name][0]
+
+    # ------------------------------------------------
+    # Sondeo
+    # ------------------------------------------------
+    async def poll_device(self, name):
+        """Ejecuta un ciclo de lectura de un dispositivo y devuelve su PollResult.
+
+        Un conjunto de direcciones no válido (ValueError de `plan_reads`) no
+        detiene el sondeo: se registra y el resultado lleva el error.
+        """
+        session, addresses, _interval = self.devices[name]
+        started = time.perf_counter()
+        try:
+            # Timeout global del ciclo además del de cada transacción
+            values = await asyncio.wait_for(session.read_scan(addresses), session.timeout * 2)
+            error = None if values else "no data"
+        except asyncio.TimeoutError:
+            values, error = {}, "timeout"
+        except ValueError as e:
+            log("Poll error (%s): %s", name, e, level=WARNING)
+            values, error = {}, str(e)
+        return PollResult(name, time.time(), values, time.perf_counter() - started, error)
+
+    async def poll_all(self):
+        """Sondea todos los dispositivos una vez; entrega los resultados según terminan."""
+        for future in asyncio.as_completed([self.poll_device(name) for name in self.devices]):
+            yield await future
+
+    async def _device_loop(self, name):
+        interval = self.devices[name][2]
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            try:
+                result = await self.poll_device(name)
+            except Exception as e:
+                # Un fallo inesperado no debe terminar la tarea del dispositivo
+                log("Poll error (%s): %s", name, e, level=WARNING)
+                result = PollResult(name, time.time(), {}, 0.0, str(e))
+            if self._results.full():
+                # El consumidor va atrasado: se descarta el resultado más antiguo
+                self._results.get_nowait()
+            self._results.put_nowait(result)
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Ciclo vencido: no acumular atraso
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def start(self):
+        """Lanza una tarea de sondeo periódico por dispositivo (requiere un loop en ejecución)."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._device_loop(name)) for name in self.devices]
+            log(f"Async master polling {len(self._tasks)} devices.")
+
+    async def stream(self):
+        """Flujo continuo de PollResult de todos los dispositivos."""
+        self.start()
+        while True:
+            yield await self._results.get()
+
+    async def stop(self):
+        """Detiene el sondeo y cierra todas las sesiones."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*(session.close() for session, _, _ in self.devices.values()))
+        log("Async master stopped.")
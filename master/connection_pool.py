@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+from pyModbusTCP.client import ModbusClient
+from pyModbusTCP.constants import MB_NO_ERR, MB_EXCEPT_ERR
+from master.pipeline import PipelinedModbusClient
+from shared.protocol import read_registers_pdu
+from shared.utils import log, WARNING
+
+# Estados de una conexión
+CONNECTED = "connected"
+CONNECTING = "connecting"
+BACKOFF = "backoff"
+CLOSED = "closed"
+
+
+class PooledConnection:
+    """Socket compartido con un dispositivo (host, puerto, unit ID).
+
+    Nunca se reconecta de forma implícita: tras un fallo de red pasa a BACKOFF
+    y las peticiones fallan al instante hasta que vence `next_retry`. Cada
+    intento fallido duplica la espera (con jitter) hasta `max_delay`.
+    """
+
+    def __init__(self, key, client, base_delay=0.5, max_delay=30.0, max_in_flight=1):
+        self.key = key
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.lock = threading.RLock()
+        self.state = CLOSED
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self.next_retry = 0.0
+        self.last_used = time.monotonic()
+        self.users = 0
+        self._listeners = ()
+
+    def __repr__(self):
+        host, port, unit_id = self.key
+        return f"PooledConnection({host}:{port}, unit {unit_id}, {self.state})"
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            for callback in self._listeners:
+                try:
+                    callback(self.key, state)
+                except Exception as e:
+                    log(f"Connection state listener error: {e}")
+
+    @property
+    def available(self):
+        """True si está conectada o si toca reintentar la conexión."""
+        return self.state == CONNECTED or (self.state != CLOSED and time.monotonic() >= self.next_retry)
+
+    def ensure_open(self):
+        """Abre el socket si hace falta; respeta la espera de backoff (no bloquea si no toca)."""
+        with self.lock:
+            if self.state == CONNECTED and self.client.is_open:
+                return True
+            if time.monotonic() < self.next_retry:
+                return False
+            self._set_state(CONNECTING)
+            if self.client.open():
+                self.attempts = 0
+                self.next_retry = 0.0
+                self._set_state(CONNECTED)
+                return True
+            self._schedule_retry()
+            return False
+
+    def _schedule_retry(self):
+        self.attempts += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.attempts - 1))
+        # Jitter: evita que muchos clientes reconecten a la vez
+        delay *= random.uniform(0.5, 1.0)
+        self.next_retry = time.monotonic() + delay
+        self.client.close()
+        self._set_state(BACKOFF)
+        host, port, unit_id = self.key
+        log("Connection to %s:%d (unit %d) down; retry in %.1fs", host, port, unit_id, delay, level=WARNING)
+
+    def check_result(self):
+        """Tras una petición: si falló por red, cierra el socket y entra en backoff."""
+        self.last_used = time.monotonic()
+        error = self.client.last_error
+        if error not in (MB_NO_ERR, MB_EXCEPT_ERR):
+            with self.lock:
+                if self.state == CONNECTED:
+                    self._schedule_retry()
+
+    def probe(self, address=0):
+        """Comprobación de salud: una lectura de 1 registro (una excepción Modbus cuenta como viva)."""
+        with self.lock:
+            if not self.ensure_open():
+                return False
+            self.client.custom_request(read_registers_pdu(address, 1))
+            self.check_result()
+            return self.state == CONNECTED
+
+    def close(self):
+        with self.lock:
+            self.client.close()
+            self._set_state(CLOSED)
+
+
+class ConnectionPool:
+    """Conexiones Modbus TCP compartidas por clave (host, puerto, unit ID).
+
+    Un único hilo revisa periódicamente las conexiones: sondea las que llevan
+    `idle_check` segundos sin uso y reintenta las que están en backoff, de modo
+    que un equipo caído cuesta un temporizador y no un timeout en cada sondeo.
+    """
+
+    def __init__(self, timeout=3.0, base_delay=0.5, max_delay=30.0, idle_check=10.0, probe_address=0):
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idle_check = idle_check
+        self.probe_address = probe_address
+        self.connections = {}
+        self._listeners = ()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """Registra `callback((host, puerto, unit), estado)` para los cambios de estado."""
+        self._listeners = self._listeners + (callback,)
+        for connection in self.connections.values():
+            connection._listeners = self._listeners
+        return callback
+
+    def unsubscribe(self, callback):
+        self._listeners = tuple(cb for cb in self._listeners if cb is not callback)
+        for connection in self.connections.values():
+            connection._listeners = self._listeners
+
+    def acquire(self, host, port=502, unit_id=1, max_in_flight=1):
+        """Devuelve la conexión compartida para (host, puerto, unit ID), creándola si no existe.
+
+        Todos los usuarios de una conexión deben pedir el mismo `max_in_flight`
+        (el socket es pipeline o no lo es); si no coincide se lanza ValueError.
+        """
+        key = (host, port, unit_id)
+        with self._lock:
+            connection = self.connections.get(key)
+            if connection is not None and connection.max_in_flight != max_in_flight:
+                raise ValueError(f"Connection to {host}:{port} (unit {unit_id}) is already pooled with "
+                                 f"max_in_flight={connection.max_in_flight}, not {max_in_flight}")
+            if connection is None:
+                if max_in_flight > 1:
+                    client = PipelinedModbusClient(host=host, port=port, unit_id=unit_id, timeout=self.timeout,
+                                                   auto_open=False, max_in_flight=max_in_flight)
+                else:
+                    client = ModbusClient(host=host, port=port, unit_id=unit_id, timeout=self.timeout,
+                                          auto_open=False)
+                connection = PooledConnection(key, client, self.base_delay, self.max_delay, max_in_flight)
+                connection._listeners = self._listeners
+                self.connections[key] = connection
+            connection.users += 1
+        self._start_monitor()
+        return connection
+
+    def release(self, connection):
+        """Libera un uso; el socket se cierra cuando ya nadie lo usa."""
+        with self._lock:
+            connection.users -= 1
+            if connection.users > 0:
+                return
+            self.connections.pop(connection.key, None)
+        connection.close()
+
+    def states(self):
+        return {key: connection.state for key, connection in self.connections.items()}
+
+    def close(self):
+        self._stop_event.set()
+        with self._lock:
+            connections, self.connections = list(self.connections.values()), {}
+        for connection in connections:
+            connection.close()
+
+    # ------------------------------------------------
+    # Supervisión
+    # ------------------------------------------------
+    def _start_monitor(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._monitor, daemon=True)
+            self._thread.start()
+
+    def _monitor(self):
+        interval = min(self.idle_check, self.base_delay)
+        while not self._stop_event.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                connections = list(self.connections.values())
+            for connection in connections:
+                if connection.state == BACKOFF and now >= connection.next_retry:
+                    connection.ensure_open()
+                elif connection.state == CONNECTED and now - connection.last_used >= self.idle_check:
+                    # No bloquear si la conexión está ocupada: ya se está usando
+                    if connection.lock.acquire(blocking=False):
+                        try:
+                            connection.probe(self.probe_address)
+                        finally:
+                            connection.lock.release()
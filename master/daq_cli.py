@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from master.modbus_master import ModbusMasterClient
+from master.recorder import Recorder, export_csv, read_recording, read_schema
+from master.scheduler import ScanScheduler
+from master.tags import load_tags
+from shared.capture import TrafficCapture
+from shared.protocol import COILS, DISCRETE_INPUTS, HOLDING_REGISTERS
+from shared.utils import log, WARNING
+
+
+# ------------------------------------------------
+# Configuración
+# ------------------------------------------------
+def _parse_block(text):
+    """`inicio:cantidad` -> (inicio, cantidad)."""
+    try:
+        start, count = (int(part) for part in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid register block '{text}' (expected start:count)")
+    if count < 1 or not 0 <= start <= start + count <= 65536:
+        raise argparse.ArgumentTypeError(f"Register block out of range: {text}")
+    return start, count
+
+
+def load_config(path):
+    """Lee la configuración JSON de dispositivos y grupos de sondeo.
+
+    {"devices": [{"name": "plc1", "host": "192.168.0.10", "port": 502, "unit_id": 1,
+                  "groups": [{"name": "fast", "rate": 0.1, "tags": "tags.csv"},
+                             {"name": "slow", "rate": 1.0, "registers": [[0, 20]]},
+                             {"name": "alarms", "rate": 0.5, "table": "coils", "registers": [[0, 64]]}]}]}
+
+    `table` (coils, discrete_inputs, holding_registers o input_registers) es
+    holding_registers por defecto; los tags solo admiten tablas de registros.
+    Las rutas de los CSV de tags son relativas al fichero de configuración.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for device in config.get("devices", []):
+        for group in device.get("groups", []):
+            if "tags" in group:
+                group["tags"] = os.path.join(base, group["tags"])
+    return config
+
+
+def _config_from_args(args):
+    group = {"name": "scan", "rate": args.rate}
+    if args.tags:
+        group["tags"] = args.tags
+    else:
+        group["registers"] = args.registers or [(0, 10)]
+    return {"devices": [{"name": args.name or f"{args.host}:{args.port}", "host": args.host, "port": args.port,
+                         "unit_id": args.unit, "max_gap": args.max_gap, "max_in_flight": args.in_flight,
+                         "groups": [group]}]}
+
+
+# ------------------------------------------------
+# Adquisición
+# ------------------------------------------------
+def _column_type(tag):
+    """Tipo de columna de la grabación: uint16 si el valor del tag cabe sin escalar, si no float64."""
+    if tag.type in ("uint16", "bitfield") and tag.scale == 1 and tag.offset == 0:
+        return "H"
+    return "d"
+
+
+class DataAcquisition:
+    """Sondeo sin GUI de uno o varios dispositivos hacia un Recorder.
+
+    Cada dispositivo tiene su ModbusMasterClient y su ScanScheduler (un hilo);
+    cada grupo de sondeo es un grupo de la grabación (`dispositivo.grupo`).
+    Con `capture` se graban además las tramas de todos los dispositivos (.mbcap).
+    """
+
+    def __init__(self, config, output, block_rows=512, flush_interval=1.0, capture=None):
+        self.devices = []
+        self.capture = TrafficCapture(capture) if capture else None
+        groups = []
+        for device in config["devices"]:
+            client = ModbusMasterClient(device["host"], device.get("port", 502), device.get("unit_id", 1),
+                                        max_gap=device.get("max_gap", 0),
+                                        max_in_flight=device.get("max_in_flight", 1), capture=self.capture)
+            scheduler = ScanScheduler(client)
+            name = device.get("name", f"{client.host}:{client.port}")
+            for group in device["groups"]:
+                key = f"{name}.{group['name']}"
+                table = group.get("table", HOLDING_REGISTERS)
+                if "tags" in group:
+                    tags = load_tags(group["tags"])
+                    columns = [(tag.name, _column_type(tag)) for tag in tags if tag.type != "string"]
+                    if len(columns) < len(tags):
+                        log("String tags are not recorded (group %s)", key, level=WARNING)
+                    scheduler.add_group(key, tags, group["rate"], table)
+                else:
+                    blocks = [tuple(block) for block in group["registers"]]
+                    scheduler.add_group(key, [range(start, start + count) for start, count in blocks],
+                                        group["rate"], table)
+                    kind = "bit" if table in (COILS, DISCRETE_INPUTS) else "H"
+                    columns = [(str(addr), kind) for start, count in blocks for addr in range(start, start + count)]
+                groups.append((key, columns))
+            self.devices.append((name, client, scheduler))
+        self.recorder = Recorder(output, groups, block_rows, flush_interval)
+        self.samples = 0
+
+    def _on_result(self, result):
+        values = result.values
+        if values and not isinstance(next(iter(values)), str):
+            # Grupos de direcciones: columnas por dirección
+            values = {str(addr): value for addr, value in values.items()}
+        self.recorder.append(result.group, result.timestamp, values)
+        self.samples += len(values)
+
+    def start(self):
+        for name, client, scheduler in self.devices:
+            if not client.connect():
+                log("Device %s not reachable yet; polling will keep retrying", name, level=WARNING)
+            scheduler.start(self._on_result)
+
+    def stop(self):
+        for _name, client, scheduler in self.devices:
+            scheduler.stop()
+            client.disconnect()
+        self.recorder.close()
+        if self.capture:
+            self.capture.close()
+
+    def stats(self):
+        return {name: scheduler.stats() for name, _client, scheduler in self.devices}
+
+
+def record(args):
+    config = load_config(args.config) if args.config else _config_from_args(args)
+    daq = DataAcquisition(config, args.output, args.block_rows, args.flush_interval, args.capture)
+    stop = threading.Event()
+    # Parada limpia también con SIGTERM (servicio / systemd)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    daq.start()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    interval = args.stats or 1.0
+    last_rows, last_samples, last_time = 0, 0, time.monotonic()
+    try:
+        while True:
+            timeout = interval if deadline is None else min(interval, deadline - time.monotonic())
+            if timeout <= 0 or stop.wait(timeout):
+                break
+            if args.stats:
+                now = time.monotonic()
+                rows, samples = daq.recorder.rows, daq.samples
+                log(f"{(rows - last_rows) / (now - last_time):.0f} rows/s, "
+                    f"{(samples - last_samples) / (now - last_time):.0f} samples/s, {rows} rows total")
+                last_rows, last_samples, last_time = rows, samples, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daq.stop()
+        for name, groups in daq.stats().items():
+            for group, stats in groups.items():
+                log(f"{group}: {stats['scans']} scans, {stats['missed']} missed, {stats['errors']} errors")
+    return 0
+
+
+def info(args):
+    schema, _offset = read_schema(args.recording)
+    rows = {group["name"]: 0 for group in schema["groups"]}
+    first = last = None
+    for name, stamps, _values in read_recording(args.recording):
+        rows[name] += len(stamps)
+        if len(stamps):
+            first = stamps[0] if first is None else min(first, stamps[0])
+            last = stamps[-1] if last is None else max(last, stamps[-1])
+    for group in schema["groups"]:
+        print(f"{group['name']}: {rows[group['name']]} rows, {len(group['columns'])} columns")
+    if first is not None:
+        print(f"from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))} "
+              f"to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))}")
+    return 0
+
+
+def export(args):
+    export_csv(args.recording, args.output, args.group)
+    return 0
+
+
+# ------------------------------------------------
+# Punto de entrada
+# ------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Modbus TCP data acquisition")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="poll devices and record samples")
+    rec.add_argument("--config", help="JSON device/group configuration")
+    rec.add_argument("--host", default="127.0.0.1")
+    rec.add_argument("--port", type=int, default=502)
+    rec.add_argument("--unit", type=int, default=1)
+    rec.add_argument("--name", help="device name in the recording")
+    rec.add_argument("--tags", help="tag CSV (name,address,type,...)")
+    rec.add_argument("--registers", type=_parse_block, action="append", help="start:count (repeatable)")
+    rec.add_argument("--rate", type=float, default=1.0, help="scan period in seconds")
+    rec.add_argument("--max-gap", type=int, default=0, help="registers read in excess to merge blocks")
+    rec.add_argument("--in-flight", type=int, default=1, help="pipelined requests per device")
+    rec.add_argument("-o", "--output", required=True, help="recording file (.mbrec); appended if it exists")
+    rec.add_argument("--duration", type=float, default=0, help="seconds to record (0 = until stopped)")
+    rec.add_argument("--block-rows", type=int, default=512, help="rows per written block")
+    rec.add_argument("--flush-interval", type=float, default=1.0, help="max seconds before buffered rows are written")
+    rec.add_argument("--stats", type=float, default=10.0, help="progress log interval in seconds (0 = off)")
+    rec.add_argument("--capture", help="also capture request/response frames to this file (.mbcap)")
+    rec.set_defaults(handler=record)
+
+    exp = commands.add_parser("export", help="export a recording to CSV")
+    exp.add_argument("recording")
+    exp.add_argument("-o", "--output", required=True)
+    exp.add_argument("--group", help="only this group")
+    exp.set_defaults(handler=export)
+
+    inf = commands.add_parser("info", help="summarize a recording")
+    inf.add_argument("recording")
+    inf.set_defaults(handler=info)
+
+    args = parser.parse_args(argv)
+    if args.command == "record" and args.tags and args.registers:
+        parser.error("use either --tags or --registers")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,25 +2,47 @@ import sys
 from datetime import datetime
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel,
-    QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QHBoxLayout, QMessageBox, QTextEdit, QFrame
+    QLineEdit, QPushButton, QHBoxLayout, QMessageBox, QTextEdit, QFrame, QComboBox
 )
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import QTimer, QThread, Signal
+from master.connection_pool import ConnectionPool, CONNECTED, BACKOFF
 from master.modbus_master import ModbusMasterClient
+from master.register_cache import RegisterCache
+from master.poll_worker import PollWorker
+from shared.protocol import BIT_TABLES, COILS, HOLDING_REGISTERS
+from shared.register_table import RegisterTableModel, RegisterTableView, TABLE_CHOICES
+from shared.utils import LOG_MAX_LINES
 
 
 class MasterApp(QWidget):
     """Cliente Modbus TCP con LED de estado y cuadro de mensajes."""
 
+    # Peticiones hacia el hilo de sondeo
+    connect_requested = Signal(object)
+    poll_requested = Signal(int, str, int, int)
+    write_requested = Signal(int, str, int, int)
+    close_requested = Signal()
+    # Cambios de estado de la conexión (emitida desde el hilo del pool)
+    connection_state_changed = Signal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Modbus Hub - Master Client (TCP)")
         self.setGeometry(300, 200, 900, 600)
 
-        self.start_addr = 0
-        self.quantity = 10
         self.connected = False
         self.client = None
+        self._poll_pending = False
+        # Sesión de conexión: las respuestas de una sesión anterior se descartan
+        self._generation = 0
+        self._last_poll_msg = None
+        # Tabla mostrada (coils, discrete inputs, holding o input registers)
+        self.current_table = HOLDING_REGISTERS
+
+        # Pool de conexiones: socket compartido y reconexión con backoff
+        self.pool = ConnectionPool()
+        self.pool.subscribe(lambda key, state: self.connection_state_changed.emit(state))
+        self._link_state = None
 
         # Conexión TCP
         self.ip_input = QLineEdit("127.0.0.1")
@@ -39,18 +61,20 @@ class MasterApp(QWidget):
         status_layout.addWidget(self.status_led)
         status_layout.addStretch()
 
-        # Rango
+        # Rango: tabla y salto a una dirección; se leen las filas visibles de la tabla
         range_layout = QHBoxLayout()
+        self.table_select = QComboBox()
+        for table, label in TABLE_CHOICES:
+            self.table_select.addItem(label, table)
         self.start_input = QLineEdit("0")
-        self.qty_input = QLineEdit("10")
-        range_layout.addWidget(QLabel("Start:"))
+        range_layout.addWidget(QLabel("Table:"))
+        range_layout.addWidget(self.table_select)
+        range_layout.addWidget(QLabel("Go to address:"))
         range_layout.addWidget(self.start_input)
-        range_layout.addWidget(QLabel("Quantity:"))
-        range_layout.addWidget(self.qty_input)
 
-        # Tabla
-        self.table = QTableWidget()
-        self.refresh_table_layout()
+        # Tabla virtual (0–65535)
+        self.model = RegisterTableModel()
+        self.table = RegisterTableView(self.model)
 
         # Escritura
         write_layout = QHBoxLayout()
@@ -66,6 +90,8 @@ class MasterApp(QWidget):
         # Cuadro de mensajes
         self.log_box = QTextEdit()
         self.log_box.setReadOnly(True)
+        # Registro acotado: las líneas más antiguas se descartan
+        self.log_box.document().setMaximumBlockCount(LOG_MAX_LINES)
         self.log_box.setMinimumHeight(120)
         self.log_box.setStyleSheet("background-color: #111; color: #0f0; font-family: monospace;")
 
@@ -90,7 +116,22 @@ class MasterApp(QWidget):
         self.connect_button.clicked.connect(self.toggle_connection)
         self.write_button.clicked.connect(self.write_register_to_slave)
         self.start_input.editingFinished.connect(self.update_range)
-        self.qty_input.editingFinished.connect(self.update_range)
+        self.table_select.currentIndexChanged.connect(self.change_table)
+        self.table.verticalScrollBar().valueChanged.connect(self.update_table)
+
+        # Hilo de sondeo: las lecturas/escrituras no bloquean la GUI
+        self.poll_thread = QThread(self)
+        self.worker = PollWorker()
+        self.worker.moveToThread(self.poll_thread)
+        self.connect_requested.connect(self.worker.connect_client)
+        self.poll_requested.connect(self.worker.poll)
+        self.write_requested.connect(self.worker.write)
+        self.close_requested.connect(self.worker.close)
+        self.worker.connect_done.connect(self.on_connect_done)
+        self.worker.read_done.connect(self.on_read_done)
+        self.worker.write_done.connect(self.on_write_done)
+        self.connection_state_changed.connect(self.on_connection_state)
+        self.poll_thread.start()
 
         # Timer
         self.timer = QTimer()
@@ -104,6 +145,12 @@ class MasterApp(QWidget):
         self.log_box.append(f"[{timestamp}] {msg}")
         self.log_box.verticalScrollBar().setValue(self.log_box.verticalScrollBar().maximum())
 
+    def log_poll(self, msg):
+        """Mensaje de cada sondeo: solo se muestra si cambia respecto al anterior."""
+        if msg != self._last_poll_msg:
+            self._last_poll_msg = msg
+            self.log(msg)
+
     # ------------------------------------------------
     # LED
     # ------------------------------------------------
@@ -116,33 +163,22 @@ class MasterApp(QWidget):
     def update_range(self):
         try:
             start = int(self.start_input.text())
-            qty = int(self.qty_input.text())
-            if start < 0 or start >= 65536 or qty < 1 or qty > 125:
+            if start < 0 or start >= 65536:
                 raise ValueError
-            if start + qty > 65536:
-                qty = 65536 - start
-            self.start_addr = start
-            self.quantity = qty
-            self.refresh_table_layout()
-            self.log(f"Range updated: start={start}, qty={qty}")
+            self.table.scroll_to_address(start)
+            self.log(f"Showing registers from {start}")
         except ValueError:
             QMessageBox.warning(self, "Invalid Input", "Please enter valid numeric values.")
 
-    def refresh_table_layout(self):
-        cols_needed = ((self.quantity - 1) // 10 + 1) * 2
-        self.table.setColumnCount(cols_needed)
-        self.table.setRowCount(10)
-        headers = []
-        for i in range(0, cols_needed, 2):
-            block = i // 2
-            headers.extend([f"Address {block+1}", f"Value {block+1}"])
-        self.table.setHorizontalHeaderLabels(headers)
-        for i in range(self.quantity):
-            addr = self.start_addr + i
-            col_block = (i // 10) * 2
-            row = i % 10
-            self.table.setItem(row, col_block, QTableWidgetItem(str(addr)))
-            self.table.setItem(row, col_block + 1, QTableWidgetItem("0"))
+    def change_table(self):
+        """Cambia la tabla mostrada; la lectura en curso de la anterior se descarta al llegar."""
+        self.current_table = self.table_select.currentData()
+        self.model.clear(1 if self.current_table in BIT_TABLES else 65535)
+        # Discrete inputs e input registers son de solo lectura
+        self.write_button.setEnabled(self.current_table in (COILS, HOLDING_REGISTERS))
+        self.write_button.setText("Write Coil" if self.current_table == COILS else "Write Register")
+        self._last_poll_msg = None
+        self.update_table()
 
     # ------------------------------------------------
     # Conexión
@@ -166,46 +202,95 @@ class MasterApp(QWidget):
             QMessageBox.warning(self, "Invalid Unit ID", "Please enter a valid number.")
             return
 
-        self.client = ModbusMasterClient(host=ip, port=port, unit_id=unit)
-        if self.client.connect():
+        # Caché de 1 s: desplazarse por la tabla no repite lecturas recientes
+        self.client = ModbusMasterClient(host=ip, port=port, unit_id=unit, cache=RegisterCache(max_age=1.0),
+                                         pool=self.pool)
+        # La conexión (hasta el timeout si el equipo no responde) se abre en el hilo de sondeo
+        self.connect_button.setEnabled(False)
+        self.status_label.setText("Status: Connecting...")
+        self.set_led("orange")
+        self.connect_requested.emit(self.client)
+
+    def on_connect_done(self, client, ok):
+        self.connect_button.setEnabled(True)
+        if ok:
             self.connected = True
+            self._generation += 1
+            self._last_poll_msg = None
+            self._poll_pending = False
             self.connect_button.setText("Disconnect")
             self.status_label.setText("Status: Connected")
             self.set_led("green")
             self.timer.start(2000)
-            self.log(f"Connected to {ip}:{port}")
+            self.log(f"Connected to {client.host}:{client.port}")
         else:
+            self.client = None
+            self.status_label.setText("Status: Disconnected")
             QMessageBox.warning(self, "Connection Failed", "Could not connect to Modbus server.")
             self.set_led("red")
             self.log("Connection failed.")
 
     def disconnect_from_server(self):
         if self.client:
-            self.client.disconnect()
+            # Se cierra en el hilo de sondeo, tras la petición en curso
+            self.close_requested.emit()
+            self.client = None
         self.connected = False
+        self._generation += 1
+        self._poll_pending = False
         self.connect_button.setText("Connect")
         self.status_label.setText("Status: Disconnected")
         self.set_led("red")
         self.timer.stop()
         self.log("Disconnected from server.")
 
+    def on_connection_state(self, state):
+        """Refleja en el LED el estado de la conexión compartida."""
+        previous, self._link_state = self._link_state, state
+        if not self.connected:
+            return
+        if state == CONNECTED and previous == BACKOFF:
+            self.status_label.setText("Status: Connected")
+            self.set_led("green")
+            self.log("Connection restored.")
+        elif state == BACKOFF:
+            self.status_label.setText("Status: Reconnecting...")
+            self.set_led("orange")
+            self.log("Connection lost; retrying with backoff.")
+
     # ------------------------------------------------
     # Lectura periódica
     # ------------------------------------------------
     def update_table(self):
+        """Solicita al hilo de sondeo las filas visibles; si hay una lectura en curso, se descarta."""
+        if not self.connected or self._poll_pending:
+            return
+        if not self.client.available:
+            # Equipo caído: el pool reintenta con backoff, no se sondea mientras tanto
+            return
+        start, count = self.table.visible_range()
+        if count < 1:
+            return
+        self._poll_pending = True
+        self.poll_requested.emit(self._generation, self.current_table, start, count)
+
+    def on_read_done(self, generation, table, start_addr, count, values):
+        if generation != self._generation:
+            # Respuesta de una conexión anterior: la lectura pendiente (si la hay) es otra
+            return
+        self._poll_pending = False
         if not self.connected:
             return
-        values = self.client.read_registers(self.start_addr, self.quantity)
-        if values:
-            for i, val in enumerate(values):
-                col_block = (i // 10) * 2
-                row = i % 10
-                item = QTableWidgetItem(str(val))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(row, col_block + 1, item)
-            self.log(f"Read registers {self.start_addr}–{self.start_addr + len(values) - 1}")
+        if table != self.current_table:
+            # Lectura de la tabla anterior: se pide ya la nueva
+            self.update_table()
+            return
+        if values is not None:
+            # El modelo solo notifica a la vista las celdas que cambiaron (los bits llegan empaquetados)
+            self.model.update_values(start_addr, values)
+            self.log_poll(f"Read {self.table_select.currentText().lower()} {start_addr}–{start_addr + count - 1}")
         else:
-            self.log("Read error.")
+            self.log_poll("Read error.")
 
 
     # ------------------------------------------------
@@ -215,20 +300,40 @@ class MasterApp(QWidget):
         if not self.connected:
             QMessageBox.warning(self, "Not Connected", "Connect first.")
             return
+        max_value = self.model.max_value
         try:
             addr = int(self.write_addr.text())
             val = int(self.write_value.text())
-            if not (0 <= addr < 65536 and 0 <= val < 65536):
+            if not (0 <= addr < 65536 and 0 <= val <= max_value):
                 raise ValueError
         except ValueError:
-            QMessageBox.warning(self, "Invalid Input", "Address/Value must be between 0–65535.")
+            QMessageBox.warning(self, "Invalid Input", f"Address must be 0–65535 and value 0–{max_value}.")
+            return
+        self.write_requested.emit(self._generation, self.current_table, addr, val)
+
+    def on_write_done(self, generation, table, addr, val, ok):
+        if not self.connected or generation != self._generation:
             return
-        if self.client.write_register(addr, val):
+        if ok:
+            # El valor escrito ya es el vigente: se actualiza la celda sin releer la tabla
+            if table == self.current_table:
+                self.model.update_values(addr, [val])
             self.log(f"Write successful: address={addr}, value={val}")
-            self.update_table()
         else:
             self.log(f"Write failed at address {addr}")
 
+    # ------------------------------------------------
+    # Cierre
+    # ------------------------------------------------
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.client:
+            self.close_requested.emit()
+        self.poll_thread.quit()
+        self.poll_thread.wait()
+        self.pool.close()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,28 +1,205 @@
+import struct
+import threading
+import time
 from pyModbusTCP.client import ModbusClient
-from shared.utils import log
+from pyModbusTCP.constants import MB_EXCEPT_ERR, MB_TIMEOUT_ERR
+from master.pipeline import PipelinedModbusClient
+from shared.metrics import DeviceMetrics, EXCEPTION_FRAME_SIZE
+from shared.bits import PackedBits
+from shared.protocol import (
+    MAX_READ_REGISTERS, MAX_WRITE_REGISTERS, MAX_WRITE_BITS, MBAP_SIZE, ModbusProtocolError,
+    BIT_TABLES, COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS, READ_FUNCTIONS,
+    WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS,
+    read_table_pdu, write_single_coil_pdu, write_multiple_coils_pdu, write_single_register_pdu,
+    write_multiple_registers_pdu, decode_table,
+)
+from shared.utils import log, DEBUG, WARNING
+
+# Función de escritura -> tabla afectada
+_WRITE_TABLES = {
+    WRITE_SINGLE_COIL: COILS, WRITE_MULTIPLE_COILS: COILS,
+    WRITE_SINGLE_REGISTER: HOLDING_REGISTERS, WRITE_MULTIPLE_REGISTERS: HOLDING_REGISTERS,
+}
+_ADDR_COUNT = struct.Struct(">HH")
+
+
+def _iter_intervals(addresses):
+    """Normaliza direcciones sueltas, range o tuplas (inicio, cantidad) a intervalos [inicio, fin)."""
+    for item in addresses:
+        if isinstance(item, range):
+            if item.step != 1:
+                for addr in item:
+                    yield addr, addr + 1
+            elif len(item):
+                yield item.start, item.stop
+        elif isinstance(item, tuple):
+            start, count = item
+            if count > 0:
+                yield start, start + count
+        else:
+            yield item, item + 1
+
+
+def _merge_intervals(addresses):
+    """Intervalos [inicio, fin) ordenados y sin solapes que cubren las direcciones pedidas."""
+    merged = []
+    for start, end in sorted(_iter_intervals(addresses)):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _collect_scan(intervals, blocks, results):
+    """dict dirección→valor con las direcciones de `intervals` presentes en los bloques leídos.
+
+    `intervals` (de `_merge_intervals`) y `blocks` (de `plan_reads`) están
+    ordenados; un bloque fallido (None) no aporta valores.
+    """
+    values = {}
+    index = 0
+    for (block_start, count), data in zip(blocks, results):
+        block_end = block_start + count
+        while index < len(intervals) and intervals[index][1] <= block_start:
+            index += 1
+        if data is None:
+            continue
+        i = index
+        while i < len(intervals) and intervals[i][0] < block_end:
+            lo, hi = max(intervals[i][0], block_start), min(intervals[i][1], block_end)
+            if isinstance(data, PackedBits):
+                values.update(zip(range(lo, hi), data.slice(lo - block_start, hi - lo)))
+            else:
+                values.update(zip(range(lo, hi), data[lo - block_start:hi - block_start]))
+            i += 1
+    return values
+
+
+def plan_reads(addresses, max_gap=0, max_count=MAX_READ_REGISTERS):
+    """Agrupa direcciones o rangos en el mínimo de bloques (inicio, cantidad) a leer.
+
+    Dos intervalos se leen en la misma petición si el hueco entre ellos no supera
+    `max_gap` registros y el bloque resultante no excede `max_count` registros.
+    """
+    intervals = sorted(_iter_intervals(addresses))
+    for start, end in intervals:
+        if start < 0 or end > 65536:
+            raise ValueError(f"Address out of range: {start}–{end - 1}")
+
+    blocks = []
+    cur_start = cur_end = None
+    for start, end in intervals:
+        # Saltar lo que ya está cubierto por el bloque actual
+        if cur_end is not None and start < cur_end:
+            start = cur_end
+        while start < end:
+            if cur_start is not None and start - cur_end <= max_gap and start < cur_start + max_count:
+                cur_end = min(end, cur_start + max_count)
+            else:
+                if cur_start is not None:
+                    blocks.append((cur_start, cur_end - cur_start))
+                cur_start = start
+                cur_end = min(end, start + max_count)
+            start = cur_end
+    if cur_start is not None:
+        blocks.append((cur_start, cur_end - cur_start))
+    return blocks
+
+
+class BatchWriteResult:
+    """Resultado de una escritura por lotes: bloques enviados y direcciones omitidas."""
+
+    def __init__(self):
+        self.chunks = []      # (inicio, valores, ok) por cada petición FC15/FC16
+        self.skipped = []     # direcciones sin cambios respecto a la última lectura
+
+    @property
+    def succeeded(self):
+        return [start + i for start, values, ok in self.chunks if ok for i in range(len(values))]
+
+    @property
+    def failed(self):
+        return [start + i for start, values, ok in self.chunks if not ok for i in range(len(values))]
+
+    @property
+    def ok(self):
+        return all(ok for _start, _values, ok in self.chunks)
+
+    def __repr__(self):
+        return (f"BatchWriteResult({len(self.chunks)} chunks, {len(self.succeeded)} written, "
+                f"{len(self.failed)} failed, {len(self.skipped)} skipped)")
 
 
 class ModbusMasterClient:
     """Cliente Modbus TCP (solo TCP, sin soporte RTU)."""
 
-    def __init__(self, host="127.0.0.1", port=502, unit_id=1):
+    def __init__(self, host="127.0.0.1", port=502, unit_id=1, max_gap=0, max_in_flight=1, cache=None, pool=None,
+                 capture=None):
         self.host = host
         self.port = port
         self.unit_id = unit_id
+        # Hueco máximo (en registros) que se lee de más para unir dos rangos
+        self.max_gap = max_gap
+        # Peticiones simultáneas en vuelo (>1 activa el modo pipeline)
+        self.max_in_flight = max_in_flight
         self.client = None
+        # Último valor conocido de cada registro (lecturas y escrituras exitosas)
+        self.last_known = {}
+        # RegisterCache opcional (holding registers) o {tabla: RegisterCache}:
+        # las lecturas vigentes no van al dispositivo
+        self.caches = cache if isinstance(cache, dict) else {HOLDING_REGISTERS: cache} if cache else {}
+        self.cache = self.caches.get(HOLDING_REGISTERS)
+        # Serializa el acceso al socket cuando varios hilos comparten el cliente
+        self._io_lock = threading.RLock()
+        # Peticiones enviadas al dispositivo
+        self.request_count = 0
+        # ConnectionPool opcional: socket compartido y reconexión con backoff
+        self.pool = pool
+        self.connection = None
+        # Métricas de rendimiento (peticiones, latencia, errores, bytes)
+        self.metrics = DeviceMetrics("master", f"{host}:{port}/{unit_id}")
+        # TrafficCapture opcional: graba cada transacción enviada al dispositivo
+        self.capture = capture
+
+    @property
+    def available(self):
+        """False mientras la conexión del pool está en backoff (las peticiones fallarían al instante)."""
+        return self.connection is None or self.connection.available
 
     def connect(self):
-        """Conecta al servidor Modbus TCP."""
+        """Conecta al servidor Modbus TCP.
+
+        Con pool, ValueError si la conexión compartida tiene otro `max_in_flight`.
+        """
+        if self.pool is not None and self.connection is None:
+            self.connection = self.pool.acquire(self.host, self.port, self.unit_id, self.max_in_flight)
+            self.client = self.connection.client
+            self._io_lock = self.connection.lock
         try:
-            self.client = ModbusClient(host=self.host, port=self.port, unit_id=self.unit_id, auto_open=True)
+            if self.pool is not None:
+                log(f"Connecting via TCP to {self.host}:{self.port} (pooled)")
+                return self.connection.ensure_open()
+            if self.max_in_flight > 1:
+                self.client = PipelinedModbusClient(host=self.host, port=self.port, unit_id=self.unit_id,
+                                                    auto_open=True, max_in_flight=self.max_in_flight)
+            else:
+                self.client = ModbusClient(host=self.host, port=self.port, unit_id=self.unit_id, auto_open=True)
             log(f"Connecting via TCP to {self.host}:{self.port}")
             return self.client.open()
         except Exception as e:
-            log(f"Connection error: {e}")
+            log("Connection error: %s", e, level=WARNING)
             return False
 
     def disconnect(self):
         """Desconecta del servidor."""
+        if self.connection is not None:
+            # El socket se cierra cuando el último cliente lo libera
+            self.pool.release(self.connection)
+            self.connection = self.client = None
+            log("Released pooled connection.")
+            return
         if self.client:
             try:
                 self.client.close()
@@ -30,30 +207,404 @@ class ModbusMasterClient:
             except Exception as e:
                 log(f"Error during disconnect: {e}")
 
+    def read_table(self, table, start_addr=0, count=10):
+        """Lee un rango contiguo de cualquier tabla; se divide en peticiones del máximo de su función.
+
+        Coils y discrete inputs se devuelven como PackedBits y los registros como
+        lista de enteros; None si alguna petición falló.
+        """
+        blocks = plan_reads([(start_addr, count)], max_count=READ_FUNCTIONS[table][1])
+        results = self.read_blocks(blocks, table)
+        if any(block is None for block in results):
+            return None
+        if len(results) == 1:
+            values = results[0]
+        elif table in BIT_TABLES:
+            values = PackedBits.join(results)
+        else:
+            values = [value for block in results for value in block]
+        log("Read successful: %s %d–%d", table, start_addr, start_addr + count - 1, level=DEBUG)
+        return values
+
     def read_registers(self, start_addr=0, count=10):
-        """Lee registros holding (máximo 125)."""
+        """Lee registros holding; más de 125 se dividen en varias peticiones."""
+        return self.read_table(HOLDING_REGISTERS, start_addr, count)
+
+    def read_input_registers(self, start_addr=0, count=10):
+        """Lee input registers (FC4); más de 125 se dividen en varias peticiones."""
+        return self.read_table(INPUT_REGISTERS, start_addr, count)
+
+    def read_coils(self, start_addr=0, count=1):
+        """Lee coils (FC1) como PackedBits; más de 2000 se dividen en varias peticiones."""
+        return self.read_table(COILS, start_addr, count)
+
+    def read_discrete_inputs(self, start_addr=0, count=1):
+        """Lee discrete inputs (FC2) como PackedBits; más de 2000 se dividen en varias peticiones."""
+        return self.read_table(DISCRETE_INPUTS, start_addr, count)
+
+    def read_scan(self, addresses, max_gap=None, table=HOLDING_REGISTERS):
+        """Lee un conjunto disperso de direcciones/rangos de una tabla con el mínimo de peticiones.
+
+        Devuelve un dict dirección→valor con las direcciones pedidas; las de un
+        bloque que falla no aparecen en el resultado.
+        """
+        return self.read_tables({table: addresses}, max_gap)[table]
+
+    def read_tables(self, scans, max_gap=None):
+        """Lee direcciones/rangos de varias tablas a la vez: {tabla: direcciones} -> {tabla: {dirección: valor}}.
+
+        Los bloques de cada tabla se agrupan por separado (hasta 2000 bits o 125
+        registros por petición) y se envían todos juntos, en pipeline si está
+        activo. Los bits se extraen de la respuesta empaquetada solo para las
+        direcciones pedidas.
+        """
+        gap = self.max_gap if max_gap is None else max_gap
+        planned = {}
+        requests = []
+        for table, addresses in scans.items():
+            addresses = list(addresses)
+            blocks = plan_reads(addresses, max_gap=gap, max_count=READ_FUNCTIONS[table][1])
+            planned[table] = (_merge_intervals(addresses), blocks)
+            requests.extend((table, start, count) for start, count in blocks)
+
+        results = iter(self._read_requests(requests))
+        scanned = {}
+        for table, (intervals, blocks) in planned.items():
+            scanned[table] = _collect_scan(intervals, blocks, [next(results) for _ in blocks])
+        log("Scan read %d/%d values in %d requests", sum(map(len, scanned.values())),
+            sum(end - start for intervals, _blocks in planned.values() for start, end in intervals),
+            len(requests), level=DEBUG)
+        return scanned
+
+    def read_tags(self, tags, max_gap=None, table=HOLDING_REGISTERS):
+        """Lee y decodifica un TagSet; devuelve un dict nombre→valor (None si su bloque falló)."""
+        return tags.decode(self.read_scan(tags.addresses(), max_gap, table))
+
+    def read_blocks(self, blocks, table=HOLDING_REGISTERS):
+        """Lee varios bloques (inicio, cantidad) de una tabla, p. ej. los de `plan_reads`.
+
+        Devuelve un resultado por bloque (PackedBits o lista; None si falló).
+        """
+        return self._read_requests([(table, start, count) for start, count in blocks])
+
+    def _read_requests(self, requests):
+        """Lee bloques (tabla, inicio, cantidad); los vigentes en la caché de su tabla no van al dispositivo."""
+        caches = self.caches
+        if not caches:
+            return self._fetch(requests)
+        stale = set()
+        for table, cache in caches.items():
+            blocks = [(start, count) for t, start, count in requests if t == table]
+            if blocks:
+                stale.update((table, start, count) for start, count in cache.stale_blocks(blocks))
+        fetch, owned, waiting = [], [], []
+        for request in requests:
+            table, start, count = request
+            cache = caches.get(table)
+            if cache is None:
+                fetch.append(request)
+            elif request in stale:
+                event = cache.claim(start, count)
+                if event is None:
+                    owned.append(request)
+                    fetch.append(request)
+                else:
+                    waiting.append((request, event))
         try:
-            if count > 125:
-                count = 125
-            values = self.client.read_holding_registers(start_addr, count)
-            if values:
-                log(f"Read successful: {values}")
-                return values
-            else:
-                log("Read returned no data.")
+            fetched = dict(zip(fetch, self._fetch(fetch)))
+        finally:
+            for table, start, count in owned:
+                caches[table].release(start, count)
+        # Bloques que ya estaba leyendo otro hilo: se usa su resultado
+        for request, event in waiting:
+            event.wait(self.client.timeout if self.client else None)
+            fetched[request] = self._cached(request, fresh=True)
+        return [fetched[request] if request in fetched else self._cached(request) for request in requests]
+
+    def _cached(self, request, fresh=False):
+        """Bloque guardado en la caché (None si `fresh` y ya no está vigente)."""
+        table, start, count = request
+        cache = self.caches[table]
+        values = cache.get(start, count) if fresh else cache.peek(start, count)
+        if values is not None and table in BIT_TABLES:
+            values = PackedBits.from_bools(values)
+        return values
+
+    def _fetch(self, requests):
+        """Lee bloques (tabla, inicio, cantidad) del dispositivo; en modo pipeline comparten el socket en vuelo."""
+        if not requests:
+            return []
+        pdus = [read_table_pdu(table, start, count) for table, start, count in requests]
+        with self._io_lock:
+            if not self._link_ready():
+                return [None] * len(requests)
+            self.request_count += len(requests)
+            responses = self._request_many(pdus)
+            self._link_done()
+        results = []
+        for (table, start, count), response in zip(requests, responses):
+            values = None
+            if response:
+                try:
+                    values = decode_table(table, response, count)
+                except ModbusProtocolError as e:
+                    log("Read error: %s", e, level=WARNING)
+            if values is None:
+                log("Read failed (%s %d, %d).", table, start, count, level=WARNING)
+            else:
+                if table == HOLDING_REGISTERS:
+                    self.last_known.update(zip(range(start, start + count), values))
+                if table in self.caches:
+                    self.caches[table].update(start, values)
+            results.append(values)
+        return results
+
+    def _request_many(self, pdus):
+        """Envía varios PDUs (en pipeline si el cliente lo admite); devuelve las respuestas o None. Requiere `_io_lock`."""
+        if isinstance(self.client, PipelinedModbusClient) and len(pdus) > 1:
+            started = time.perf_counter()
+            responses = self.client.request_many(pdus)
+            for pdu, response in zip(pdus, responses):
+                self._observe(pdu[0], started, len(pdu), len(response) if response else None)
+            if self.capture is not None:
+                self._capture(started, pdus, responses)
+            return responses
+        return [self._request(pdu) for pdu in pdus]
+
+    def _request(self, pdu):
+        """Una transacción con el cliente de pyModbusTCP; devuelve el PDU de respuesta o None."""
+        try:
+            started = time.perf_counter()
+            response = self.client.custom_request(pdu)
+            self._observe(pdu[0], started, len(pdu), len(response) if response else None)
+            if self.capture is not None:
+                self._capture(started, [pdu], [response])
+            return response
         except Exception as e:
-            log(f"Read error: {e}")
-        return None
+            log("Request error: %s", e, level=WARNING)
+            return None
+
+    def forward(self, pdu):
+        """Envía un PDU cualquiera tal cual (p. ej. desde un proxy); devuelve la respuesta o None.
+
+        Las escrituras (FC5/FC6/FC15/FC16) mantienen la caché coherente: si el
+        equipo las confirma se guardan los valores escritos y, si no, el rango
+        queda invalidado.
+        """
+        with self._io_lock:
+            response = None
+            if self._link_ready():
+                self.request_count += 1
+                response = self._request(pdu)
+                self._link_done()
+        if pdu[0] in _WRITE_TABLES:
+            self._track_write(pdu, response is not None and response[:5] == pdu[:5])
+        return response
+
+    def _track_write(self, pdu, ok):
+        """Actualiza caché y `last_known` tras una escritura reenviada con `forward`."""
+        if len(pdu) < 5:
+            return
+        func_code = pdu[0]
+        table = _WRITE_TABLES[func_code]
+        address, value = _ADDR_COUNT.unpack_from(pdu, 1)
+        single = func_code in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER)
+        count = 1 if single else value
+        values = None
+        if ok:
+            try:
+                if func_code == WRITE_SINGLE_COIL:
+                    values = [int(value == 0xFF00)]
+                elif func_code == WRITE_SINGLE_REGISTER:
+                    values = [value]
+                elif func_code == WRITE_MULTIPLE_COILS:
+                    values = PackedBits(pdu[6:], count)
+                else:
+                    values = struct.unpack_from(f">{count}H", pdu, 6)
+            except (ValueError, struct.error):
+                values = None
+        if values is not None and table == HOLDING_REGISTERS:
+            self.last_known.update(zip(range(address, address + count), values))
+        cache = self.caches.get(table)
+        if cache is None or address + count > 0x10000:
+            return
+        if values is not None:
+            cache.update(address, values)
+        else:
+            cache.invalidate(address, count)
+
+    def _capture(self, started, pdus, responses):
+        """Graba las transacciones en la captura (una sesión por dispositivo)."""
+        capture = self.capture
+        elapsed = time.perf_counter() - started
+        session = capture.session((self.host, self.port, self.unit_id))
+        for pdu, response in zip(pdus, responses):
+            capture.record(session, self.unit_id, started, elapsed, pdu, response)
+
+    def _link_ready(self):
+        """False sin cliente; con pool, abre la conexión si toca, sin esperar ningún timeout en backoff."""
+        if self.client is None:
+            return False
+        return self.connection is None or self.connection.ensure_open()
+
+    def _link_done(self):
+        if self.connection is not None:
+            self.connection.check_result()
+
+    def _observe(self, func_code, started, request_size, response_size=None):
+        """Registra una petición en las métricas (tamaños de PDU; `response_size` None si falló)."""
+        metrics = self.metrics
+        if response_size is None:
+            error = getattr(self.client, "last_error", None)
+            if error == MB_EXCEPT_ERR:
+                metrics.exception(self.client.last_except)
+                response_size = EXCEPTION_FRAME_SIZE
+            else:
+                if error == MB_TIMEOUT_ERR:
+                    metrics.timeouts += 1
+                else:
+                    metrics.network_errors += 1
+                response_size = 0
+        else:
+            response_size += MBAP_SIZE
+        metrics.observe(func_code, time.perf_counter() - started, MBAP_SIZE + request_size, response_size)
 
     def write_register(self, address, value):
         """Escribe un valor en un holding register."""
         try:
-            ok = self.client.write_single_register(address, value)
+            pdu = write_single_register_pdu(address, value)
+            with self._io_lock:
+                ok = False
+                if self._link_ready():
+                    self.request_count += 1
+                    ok = self._request(pdu) == pdu
+                    self._link_done()
             if ok:
+                self.last_known[address] = value
+                if self.cache:
+                    self.cache.update(address, [value])
                 log(f"Write successful: Address={address}, Value={value}")
                 return True
             else:
-                log(f"Write failed at address {address}")
+                log("Write failed at address %d", address, level=WARNING)
         except Exception as e:
-            log(f"Write error: {e}")
+            log("Write error: %s", e, level=WARNING)
+        if self.cache:
+            # Estado desconocido tras un fallo: la próxima lectura va al dispositivo
+            self.cache.invalidate(address, 1)
         return False
+
+    def write_many(self, values, skip_unchanged=False, max_gap=None):
+        """Escribe un mapa dirección→valor con peticiones FC16 de hasta 123 registros.
+
+        Con `skip_unchanged` se omiten los valores iguales a la última lectura.
+        Dos rangos separados por un hueco de hasta `max_gap` registros se envían
+        en la misma petición si todos los registros del hueco tienen valor conocido
+        (se reescriben con ese mismo valor).
+        """
+        gap = self.max_gap if max_gap is None else max_gap
+        result = BatchWriteResult()
+        pending = {}
+        for addr, value in values.items():
+            if not (0 <= addr < 65536 and 0 <= value < 65536):
+                raise ValueError(f"Address/value out of range: {addr}={value}")
+            if skip_unchanged and self.last_known.get(addr) == value:
+                result.skipped.append(addr)
+            else:
+                pending[addr] = value
+
+        chunks = []
+        for addr in sorted(pending):
+            if chunks:
+                start, chunk = chunks[-1]
+                end = start + len(chunk)
+                fill = range(end, addr)
+                if len(chunk) + len(fill) < MAX_WRITE_REGISTERS and len(fill) <= gap \
+                        and all(a in self.last_known for a in fill):
+                    chunk.extend(self.last_known[a] for a in fill)
+                    chunk.append(pending[addr])
+                    continue
+            chunks.append((addr, [pending[addr]]))
+
+        if not chunks:
+            return result
+        with self._io_lock:
+            if not self._link_ready():
+                oks = [False] * len(chunks)
+            else:
+                # En pipeline si el cliente lo admite
+                self.request_count += len(chunks)
+                pdus = [write_multiple_registers_pdu(start, chunk) for start, chunk in chunks]
+                responses = self._request_many(pdus)
+                oks = [response is not None and response[:5] == pdu[:5] for pdu, response in zip(pdus, responses)]
+            self._link_done()
+
+        for (start, chunk), ok in zip(chunks, oks):
+            result.chunks.append((start, chunk, ok))
+            if ok:
+                self.last_known.update(zip(range(start, start + len(chunk)), chunk))
+            if self.cache:
+                if ok:
+                    self.cache.update(start, chunk)
+                else:
+                    self.cache.invalidate(start, len(chunk))
+        log("Batch write: %s", result)
+        return result
+
+    # ------------------------------------------------
+    # Coils
+    # ------------------------------------------------
+    def write_coil(self, address, value):
+        """Escribe un coil (FC5)."""
+        pdu = write_single_coil_pdu(address, value)
+        with self._io_lock:
+            ok = False
+            if self._link_ready():
+                self.request_count += 1
+                ok = self._request(pdu) == pdu
+                self._link_done()
+        cache = self.caches.get(COILS)
+        if ok:
+            if cache:
+                cache.update(address, [int(bool(value))])
+            log(f"Coil write successful: Address={address}, Value={int(bool(value))}")
+        else:
+            if cache:
+                cache.invalidate(address, 1)
+            log("Coil write failed at address %d", address, level=WARNING)
+        return ok
+
+    def write_coils(self, start_addr, bits):
+        """Escribe coils consecutivos con peticiones FC15 de hasta 1968 bits.
+
+        `bits` es un PackedBits o una secuencia de bool; los bloques se envían en
+        pipeline si está activo.
+        """
+        if not isinstance(bits, PackedBits):
+            bits = PackedBits.from_bools(bits)
+        if start_addr < 0 or start_addr + len(bits) > 65536:
+            raise ValueError(f"Coil range out of range: {start_addr}+{len(bits)}")
+        result = BatchWriteResult()
+        if not len(bits):
+            return result
+        chunks = [(start, bits.slice(start - start_addr, count))
+                  for start, count in plan_reads([(start_addr, len(bits))], max_count=MAX_WRITE_BITS)]
+        pdus = [write_multiple_coils_pdu(start, chunk) for start, chunk in chunks]
+        with self._io_lock:
+            if not self._link_ready():
+                responses = [None] * len(pdus)
+            else:
+                self.request_count += len(pdus)
+                responses = self._request_many(pdus)
+                self._link_done()
+        cache = self.caches.get(COILS)
+        for (start, chunk), pdu, response in zip(chunks, pdus, responses):
+            ok = response is not None and response[:5] == pdu[:5]
+            result.chunks.append((start, chunk, ok))
+            if cache:
+                if ok:
+                    cache.update(start, chunk)
+                else:
+                    cache.invalidate(start, len(chunk))
+        log("Coil write: %s", result)
+        return result
@@ -0,0 +1,83 @@
+import random
+from pyModbusTCP.client import ModbusClient
+from pyModbusTCP.constants import MB_RECV_ERR
+from shared.protocol import (
+    MBAP_SIZE, ModbusProtocolError, ModbusExceptionResponse, build_frame, parse_mbap, check_response,
+)
+from shared.utils import log, WARNING
+
+# Miembros privados de pyModbusTCP (probados con 0.3.x) de los que depende el pipeline;
+# si una versión futura los cambia, `request_many` envía las peticiones de una en una
+_PRIVATE_API = ("_req_init", "_send", "_recv_all", "_req_except_handler",
+                "_NetworkError", "_InternalError", "_ModbusExcept")
+PIPELINE_SUPPORTED = all(hasattr(ModbusClient, name) for name in _PRIVATE_API)
+
+
+class PipelinedModbusClient(ModbusClient):
+    """ModbusClient que admite varias transacciones en vuelo sobre el mismo socket.
+
+    Las peticiones individuales funcionan igual que en ModbusClient; `request_many`
+    envía hasta `max_in_flight` tramas sin esperar respuesta y empareja cada
+    respuesta con su petición por el transaction ID de la cabecera MBAP.
+    """
+
+    def __init__(self, *args, max_in_flight=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._next_tid = random.randint(0, 0xFFFF)
+        if not PIPELINE_SUPPORTED and self.max_in_flight > 1:
+            log("This pyModbusTCP version does not support pipelining; requests are sent one at a time",
+                level=WARNING)
+
+    def _new_transaction_id(self):
+        self._next_tid = (self._next_tid + 1) & 0xFFFF
+        return self._next_tid
+
+    def request_many(self, pdus):
+        """Ejecuta una lista de PDUs en modo pipeline.
+
+        Devuelve una lista paralela con el PDU de respuesta o None si esa
+        petición falló (excepción Modbus, timeout o error de red).
+        """
+        if not PIPELINE_SUPPORTED:
+            return [self.custom_request(pdu) for pdu in pdus]
+        results = [None] * len(pdus)
+        pending = {}
+        next_index = 0
+        try:
+            self._req_init()
+            if self.auto_open and not self.is_open:
+                self._open()
+            while next_index < len(pdus) or pending:
+                # Llenar la ventana de peticiones en vuelo con un único envío
+                frames = []
+                while next_index < len(pdus) and len(pending) < self.max_in_flight:
+                    tid = self._new_transaction_id()
+                    pending[tid] = next_index
+                    frames.append(build_frame(tid, self.unit_id, pdus[next_index]))
+                    next_index += 1
+                if frames:
+                    self._send(b"".join(frames))
+                # Recibir una respuesta y emparejarla por transaction ID
+                try:
+                    tid, pdu_length, _unit_id = parse_mbap(self._recv_all(MBAP_SIZE))
+                except ModbusProtocolError as e:
+                    self.close()
+                    raise ModbusClient._NetworkError(MB_RECV_ERR, str(e))
+                rx_pdu = self._recv_all(pdu_length)
+                index = pending.pop(tid, None)
+                if index is None:
+                    continue
+                try:
+                    check_response(pdus[index], rx_pdu)
+                    results[index] = rx_pdu
+                except ModbusExceptionResponse as e:
+                    self._req_except_handler(ModbusClient._ModbusExcept(e.exp_code))
+                except ModbusProtocolError:
+                    pass
+        except ModbusClient._InternalError as e:
+            # Error de red: las peticiones pendientes y no enviadas quedan en None
+            self._req_except_handler(e)
+        if self.auto_close:
+            self.close()
+        return results
@@ -0,0 +1,56 @@
+from PySide6.QtCore import QObject, Signal, Slot
+from shared.protocol import COILS
+from shared.utils import log, WARNING
+
+
+class PollWorker(QObject):
+    """Ejecuta las lecturas y escrituras Modbus en un hilo aparte de la GUI.
+
+    Vive en un QThread: las peticiones llegan como señales encoladas y los
+    resultados vuelven a la interfaz también mediante señales. Cada petición
+    lleva la generación (sesión de conexión) de la GUI, que se devuelve con el
+    resultado para descartar las respuestas de una conexión anterior.
+    """
+
+    connect_done = Signal(object, bool)         # client, ok
+    read_done = Signal(int, str, int, int, object)  # generation, table, start_addr, count, values (None si error)
+    write_done = Signal(int, str, int, int, bool)   # generation, table, address, value, ok
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+
+    @Slot(object)
+    def connect_client(self, client):
+        """Conecta `client` en este hilo (puede tardar hasta el timeout) y pasa a usarlo si lo consigue."""
+        try:
+            ok = client.connect()
+        except ValueError as e:
+            log("Connection error: %s", e, level=WARNING)
+            ok = False
+        if ok:
+            self.client = client
+        else:
+            client.disconnect()
+        self.connect_done.emit(client, ok)
+
+    @Slot(int, str, int, int)
+    def poll(self, generation, table, start_addr, count):
+        values = self.client.read_table(table, start_addr, count) if self.client else None
+        self.read_done.emit(generation, table, start_addr, count, values)
+
+    @Slot(int, str, int, int)
+    def write(self, generation, table, address, value):
+        ok = False
+        if self.client:
+            if table == COILS:
+                ok = self.client.write_coil(address, value)
+            else:
+                ok = self.client.write_register(address, value)
+        self.write_done.emit(generation, table, address, value, ok)
+
+    @Slot()
+    def close(self):
+        if self.client:
+            self.client.disconnect()
+            self.client = None
@@ -0,0 +1,275 @@
+import csv
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from shared.bits import PackedBits
+from shared.utils import log
+
+# ------------------------------------------------
+# Formato de grabación (.mbrec)
+# ------------------------------------------------
+# Cabecera: magic, versión, longitud del esquema JSON (grupos, columnas y su tipo)
+# Bloques:  grupo, filas, timestamps en float64 y después una columna por tag
+#           según su tipo:
+#             "d"   float64 (tags decodificados; NaN = sin valor)
+#             "H"   uint16 (registros en crudo) + máscara de validez
+#             "bit" bits empaquetados (coils / discrete inputs) + máscara de validez
+#           Las máscaras van empaquetadas, 1 bit por fila (1 = hay valor).
+# La versión 1 solo tenía columnas "d"; se sigue leyendo y ampliando.
+MAGIC = b"MBREC\x00"
+VERSION = 2
+COLUMN_TYPES = ("d", "H", "bit")
+_HEADER = struct.Struct("<6sHI")
+_BLOCK = struct.Struct("<HI")
+_NAN = float("nan")
+# Los datos se guardan en little-endian
+_BIG_ENDIAN_HOST = sys.byteorder == "big"
+
+
+class Recorder:
+    """Grabación append-only por columnas de muestras con marca de tiempo.
+
+    Cada grupo (por ejemplo un grupo de sondeo) tiene sus columnas; una columna
+    es un nombre (float64) o un par (nombre, tipo) con un tipo de COLUMN_TYPES.
+    Las filas se acumulan en memoria hasta `block_rows` o `flush_interval`
+    segundos y se escriben como un bloque. La memoria queda acotada a un bloque
+    por grupo y, tras un corte, como mucho se pierde el último bloque sin
+    escribir. Si el fichero ya existe con el mismo esquema, se sigue grabando al
+    final.
+    """
+
+    def __init__(self, path, groups, block_rows=512, flush_interval=1.0):
+        self.path = path
+        self.groups = []
+        for name, columns in groups:
+            columns = [(column, "d") if isinstance(column, str) else tuple(column) for column in columns]
+            for column, kind in columns:
+                if kind not in COLUMN_TYPES:
+                    raise ValueError(f"Unknown column type {kind!r} for {name}.{column}")
+            self.groups.append((name, [column for column, _kind in columns], [kind for _column, kind in columns]))
+        self.block_rows = block_rows
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self._index = {name: i for i, (name, _columns, _types) in enumerate(self.groups)}
+        self._buffers = [self._new_buffer(types) for _name, _columns, types in self.groups]
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._file = self._open()
+
+    @staticmethod
+    def _new_buffer(types):
+        # Por columna: (valores, validez); los bits se guardan como bytes 0/1 hasta empaquetarlos
+        return array("d"), [(array(_BUFFER_CODES[kind]), None if kind == "d" else bytearray()) for kind in types]
+
+    def _schema(self):
+        return {"groups": [{"name": name, "columns": columns, "types": types}
+                           for name, columns, types in self.groups]}
+
+    def _open(self):
+        schema = self._schema()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            existing, data_start = read_schema(self.path)
+            if existing["groups"] != schema["groups"]:
+                raise ValueError(f"{self.path} was recorded with a different tag configuration")
+            f = open(self.path, "r+b")
+            # Descartar un bloque final incompleto (corte durante la escritura)
+            f.truncate(_valid_end(f, data_start, [types for _name, _columns, types in self.groups]))
+            f.seek(0, os.SEEK_END)
+            log(f"Appending to recording {self.path}")
+            return f
+        f = open(self.path, "wb")
+        encoded = json.dumps(schema).encode()
+        f.write(_HEADER.pack(MAGIC, VERSION, len(encoded)) + encoded)
+        f.flush()
+        log(f"Recording to {self.path}")
+        return f
+
+    def append(self, group, timestamp, values):
+        """Añade una fila al grupo; `values` es un dict columna→valor (None = sin valor)."""
+        index = self._index[group]
+        columns = self.groups[index][1]
+        with self._lock:
+            stamps, data = self._buffers[index]
+            stamps.append(timestamp)
+            for column, (target, valid) in zip(columns, data):
+                value = values.get(column)
+                if valid is None:
+                    target.append(_NAN if value is None else value)
+                else:
+                    target.append(0 if value is None else value)
+                    valid.append(value is not None)
+            self.rows += 1
+            if len(stamps) >= self.block_rows:
+                self._write_block(index)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _write_block(self, index):
+        stamps, data = self._buffers[index]
+        if not stamps:
+            return
+        types = self.groups[index][2]
+        parts = [_BLOCK.pack(index, len(stamps)), _little_endian(stamps)]
+        for kind, (values, valid) in zip(types, data):
+            if kind == "bit":
+                parts.append(PackedBits.from_bools(values).tobytes())
+            else:
+                parts.append(_little_endian(values))
+            if valid is not None:
+                parts.append(PackedBits.from_bools(valid).tobytes())
+        self._file.write(b"".join(parts))
+        self._buffers[index] = self._new_buffer(types)
+
+    def _flush(self):
+        for index in range(len(self.groups)):
+            self._write_block(index)
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+                log(f"Recording closed: {self.path} ({self.rows} rows)")
+
+
+# Tipo del array en memoria de cada tipo de columna
+_BUFFER_CODES = {"d": "d", "H": "H", "bit": "B"}
+
+
+def _little_endian(values):
+    if _BIG_ENDIAN_HOST:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# ------------------------------------------------
+# Lectura / exportación
+# ------------------------------------------------
+def read_schema(path):
+    """Devuelve (esquema, desplazamiento del primer bloque); los grupos incluyen el tipo de cada columna."""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Not a recording: {path}")
+        magic, version, length = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"Not a recording: {path}")
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported recording version {version}")
+        schema = json.loads(f.read(length))
+        for group in schema["groups"]:
+            # Versión 1: todas las columnas en float64
+            group.setdefault("types", ["d"] * len(group["columns"]))
+        return schema, _HEADER.size + length
+
+
+def _column_sizes(rows, kind):
+    """Bytes de (valores, máscara) de una columna de `rows` filas."""
+    packed = (rows + 7) // 8
+    if kind == "d":
+        return rows * 8, 0
+    if kind == "H":
+        return rows * 2, packed
+    return packed, packed
+
+
+def _block_size(rows, types):
+    return _BLOCK.size + rows * 8 + sum(sum(_column_sizes(rows, kind)) for kind in types)
+
+
+def _valid_end(f, offset, types):
+    """Fin del último bloque completo."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    while offset + _BLOCK.size <= size:
+        f.seek(offset)
+        index, rows = _BLOCK.unpack(f.read(_BLOCK.size))
+        if index >= len(types) or offset + _block_size(rows, types[index]) > size:
+            break
+        offset += _block_size(rows, types[index])
+    return offset
+
+
+def _array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN_HOST:
+        values.byteswap()
+    return values
+
+
+def read_recording(path):
+    """Itera los bloques de una grabación: (grupo, timestamps, {columna: valores}).
+
+    Los valores se devuelven en float64 sea cual sea su tipo en el fichero
+    (NaN = sin valor). Un bloque final incompleto (corte durante la escritura)
+    se ignora.
+    """
+    schema, offset = read_schema(path)
+    groups = [(group["name"], group["columns"], group["types"]) for group in schema["groups"]]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(_BLOCK.size)
+            if len(header) < _BLOCK.size:
+                break
+            index, rows = _BLOCK.unpack(header)
+            if index >= len(groups):
+                break
+            name, columns, types = groups[index]
+            size = _block_size(rows, types) - _BLOCK.size
+            data = memoryview(f.read(size))
+            if len(data) < size:
+                break
+            stamps = _array("d", data[:rows * 8])
+            pos = rows * 8
+            values = {}
+            for column, kind in zip(columns, types):
+                value_size, mask_size = _column_sizes(rows, kind)
+                raw = data[pos:pos + value_size]
+                mask = PackedBits(data[pos + value_size:pos + value_size + mask_size], rows) if mask_size else None
+                pos += value_size + mask_size
+                if kind == "d":
+                    values[column] = _array("d", raw)
+                    continue
+                decoded = PackedBits(raw, rows) if kind == "bit" else _array("H", raw)
+                values[column] = array("d", (float(v) if ok else _NAN for v, ok in zip(decoded, mask)))
+            yield name, stamps, values
+
+
+def export_csv(path, out_path, group=None):
+    """Exporta la grabación a CSV (timestamp, grupo y una columna por tag); devuelve las filas escritas."""
+    schema, _offset = read_schema(path)
+    columns = []
+    for entry in schema["groups"]:
+        if group is None or entry["name"] == group:
+            columns.extend(c for c in entry["columns"] if c not in columns)
+    rows = 0
+    with open(out_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "group"] + columns)
+        for name, stamps, values in read_recording(path):
+            if group is not None and name != group:
+                continue
+            cells = [values.get(column) for column in columns]
+            for i, stamp in enumerate(stamps):
+                row = [f"{stamp:.6f}", name]
+                for column in cells:
+                    value = None if column is None else column[i]
+                    row.append("" if value is None or math.isnan(value) else f"{value:.15g}")
+                writer.writerow(row)
+                rows += 1
+    log(f"Exported {rows} rows to {out_path}")
+    return rows
@@ -0,0 +1,106 @@
+import threading
+import time
+from array import array
+
+
+class RegisterCache:
+    """Caché de lectura de una tabla (registros o bits 0/1) con antigüedad máxima por rango.
+
+    Guarda el último valor y la hora de lectura de cada registro (arrays de
+    65536 posiciones). Un rango está vigente si todos sus registros se leyeron
+    hace menos de su `max_age`. Las lecturas concurrentes del mismo bloque se
+    agrupan: solo la primera va al dispositivo y las demás esperan su resultado.
+    """
+
+    SIZE = 65536
+
+    def __init__(self, max_age=1.0):
+        self.max_age = max_age
+        self._rules = []    # (inicio, fin, max_age)
+        self._values = array("H", bytes(self.SIZE * 2))
+        self._stamps = array("d", [float("-inf")]) * self.SIZE
+        self._lock = threading.Lock()
+        self._inflight = {}     # (inicio, fin) -> threading.Event
+        self.hits = 0
+        self.misses = 0
+
+    def set_max_age(self, start_addr, count, max_age):
+        """Fija la antigüedad máxima (s) de un rango; prevalece la más estricta si se solapan."""
+        with self._lock:
+            self._rules.append((start_addr, start_addr + count, max_age))
+
+    def _max_age(self, start, end):
+        ages = [age for r_start, r_end, age in self._rules if r_start < end and start < r_end]
+        return min(ages) if ages else self.max_age
+
+    # ------------------------------------------------
+    # Consulta / actualización
+    # ------------------------------------------------
+    def get(self, start_addr, count, now=None):
+        """Valores del rango si todos están vigentes; None en caso contrario."""
+        now = time.monotonic() if now is None else now
+        end = start_addr + count
+        with self._lock:
+            if min(self._stamps[start_addr:end]) >= now - self._max_age(start_addr, end):
+                self.hits += 1
+                return self._values[start_addr:end].tolist()
+            self.misses += 1
+            return None
+
+    def stale_blocks(self, blocks, now=None):
+        """Filtra una lista de bloques (inicio, cantidad) dejando los que hay que leer."""
+        now = time.monotonic() if now is None else now
+        stale = []
+        with self._lock:
+            for start, count in blocks:
+                end = start + count
+                if min(self._stamps[start:end]) < now - self._max_age(start, end):
+                    stale.append((start, count))
+        self.hits += len(blocks) - len(stale)
+        self.misses += len(stale)
+        return stale
+
+    def peek(self, start_addr, count):
+        """Valores guardados del rango sin comprobar su vigencia."""
+        with self._lock:
+            return self._values[start_addr:start_addr + count].tolist()
+
+    def update(self, start_addr, values, now=None):
+        """Guarda valores leídos (o escritos con éxito) a partir de `start_addr`."""
+        now = time.monotonic() if now is None else now
+        end = start_addr + len(values)
+        with self._lock:
+            self._values[start_addr:end] = array("H", values)
+            self._stamps[start_addr:end] = array("d", [now]) * len(values)
+
+    def invalidate(self, start_addr=0, count=None):
+        """Marca un rango (por defecto todo) como no vigente."""
+        end = self.SIZE if count is None else start_addr + count
+        with self._lock:
+            self._stamps[start_addr:end] = array("d", [float("-inf")]) * (end - start_addr)
+
+    # ------------------------------------------------
+    # Lecturas en vuelo (single-flight)
+    # ------------------------------------------------
+    def claim(self, start_addr, count):
+        """Reserva la lectura de un bloque.
+
+        Devuelve None si el llamador debe leerlo (y después llamar a `release`)
+        o un Event a esperar si otro hilo ya está leyendo un bloque que lo cubre.
+        """
+        end = start_addr + count
+        with self._lock:
+            for (f_start, f_end), event in self._inflight.items():
+                if f_start <= start_addr and end <= f_end:
+                    return event
+            self._inflight[(start_addr, end)] = threading.Event()
+            return None
+
+    def release(self, start_addr, count):
+        with self._lock:
+            event = self._inflight.pop((start_addr, start_addr + count), None)
+        if event:
+            event.set()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "inflight": len(self._inflight)}
@@ -0,0 +1,220 @@
+import threading
+import time
+from master.modbus_master import _iter_intervals
+from master.tags import TagSet
+from shared.protocol import BIT_TABLES, HOLDING_REGISTERS, READ_FUNCTIONS
+from shared.utils import log, WARNING
+
+
+class ScanGroup:
+    """Grupo de tags (o direcciones) de una tabla con su propio periodo de sondeo."""
+
+    def __init__(self, name, tags, rate, table=HOLDING_REGISTERS):
+        if rate <= 0:
+            raise ValueError(f"Scan rate must be > 0 (group {name})")
+        if table not in READ_FUNCTIONS:
+            raise ValueError(f"Unknown table: {table}")
+        if table in BIT_TABLES and isinstance(tags, TagSet):
+            raise ValueError(f"Tags need a register table (group {name})")
+        self.name = name
+        self.table = table
+        self.tags = tags if isinstance(tags, TagSet) else None
+        self.addresses = tags.addresses() if self.tags else list(tags)
+        self.rate = rate                # periodo pedido (s)
+        self.interval = rate            # periodo efectivo (mayor si hay backoff)
+        self.next_due = 0.0
+        self.last_scan = None
+        # Estadísticas
+        self.scans = 0
+        self.missed = 0                 # ciclos del periodo pedido que no se atendieron
+        self.errors = 0
+        self.max_lateness = 0.0
+        self.last_latency = 0.0
+
+    @property
+    def backoff(self):
+        return self.interval / self.rate
+
+    def stats(self):
+        return {
+            "rate": self.rate, "interval": self.interval, "scans": self.scans, "missed": self.missed,
+            "errors": self.errors, "max_lateness": self.max_lateness, "last_latency": self.last_latency,
+        }
+
+    def __repr__(self):
+        return f"ScanGroup({self.name!r}, {len(self.addresses)} items, every {self.rate:g}s)"
+
+
+class ScanResult:
+    """Valores de un grupo tras un ciclo de sondeo."""
+
+    __slots__ = ("group", "timestamp", "values", "latency", "error")
+
+    def __init__(self, group, timestamp, values, latency, error=None):
+        self.group = group
+        self.timestamp = timestamp
+        self.values = values
+        self.latency = latency
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else self.error
+        return f"ScanResult({self.group!r}, {len(self.values)} values, {self.latency * 1000:.1f} ms, {status})"
+
+
+class ScanScheduler:
+    """Planificador de sondeo por grupos con periodo propio sobre un ModbusMasterClient.
+
+    En cada ciclo se atienden los grupos vencidos y se adelantan los que vencen
+    dentro de `merge_window` (fracción de su periodo), de modo que comparten las
+    mismas peticiones (`read_tables` agrupa sus direcciones por tabla y envía los
+    bloques de todas las tablas en la misma tanda). Si el dispositivo tarda más
+    que el periodo de un grupo, su periodo efectivo se duplica (hasta
+    `max_backoff` veces el pedido) y vuelve a bajar cuando el dispositivo se
+    recupera. Los ciclos no atendidos se cuentan en `missed`.
+    """
+
+    def __init__(self, client, merge_window=0.25, max_backoff=8.0):
+        self.client = client
+        self.merge_window = merge_window
+        self.max_backoff = max_backoff
+        self.groups = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def add_group(self, name, tags, rate, table=HOLDING_REGISTERS):
+        """Registra un grupo: un TagSet o direcciones/rangos de `table`, sondeado cada `rate` segundos."""
+        group = ScanGroup(name, tags, rate, table)
+        with self._lock:
+            self.groups[name] = group
+        return group
+
+    def remove_group(self, name):
+        with self._lock:
+            return self.groups.pop(name, None)
+
+    def next_deadline(self):
+        with self._lock:
+            return min((group.next_due for group in self.groups.values()), default=None)
+
+    def stats(self):
+        """Estadísticas por grupo (periodo efectivo, ciclos perdidos, retraso máximo...)."""
+        with self._lock:
+            return {name: group.stats() for name, group in self.groups.items()}
+
+    # ------------------------------------------------
+    # Ciclo de sondeo
+    # ------------------------------------------------
+    def _select(self, now):
+        due = [g for g in self.groups.values() if g.next_due <= now]
+        if not due:
+            return []
+        # Adelantar los grupos cuyo vencimiento está próximo para compartir peticiones
+        merged = [g for g in self.groups.values()
+                  if g.next_due > now and g.next_due - now <= g.interval * self.merge_window]
+        return due + merged
+
+    def run_pending(self, now=None):
+        """Sondea los grupos vencidos (y los compatibles) y devuelve sus ScanResult."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            groups = self._select(now)
+        if not groups:
+            return []
+
+        scans = {}
+        for group in groups:
+            scans.setdefault(group.table, []).extend(group.addresses)
+        started = time.monotonic()
+        try:
+            tables = self.client.read_tables(scans)
+            error = None
+        except Exception as e:
+            tables, error = {}, str(e)
+        latency = time.monotonic() - started
+        timestamp = time.time()
+
+        results = []
+        for group in groups:
+            values, group_error = self._values(group, tables.get(group.table, {}), error)
+            self._account(group, now, latency, group_error)
+            results.append(ScanResult(group.name, timestamp, values, latency, group_error))
+        return results
+
+    @staticmethod
+    def _values(group, registers, error):
+        if group.tags is not None:
+            values = group.tags.decode(registers)
+            missing = sum(value is None for value in values.values())
+        else:
+            values = {}
+            for start, end in _iter_intervals(group.addresses):
+                for addr in range(start, end):
+                    if addr in registers:
+                        values[addr] = registers[addr]
+            missing = sum(end - start for start, end in _iter_intervals(group.addresses)) - len(values)
+        if error is None and missing:
+            error = f"{missing} values missing"
+        return values, error
+
+    def _account(self, group, now, latency, error):
+        """Actualiza estadísticas, backoff y próximo vencimiento de un grupo."""
+        group.scans += 1
+        group.last_latency = latency
+        if error:
+            group.errors += 1
+        if group.next_due:
+            group.max_lateness = max(group.max_lateness, now - group.next_due)
+        if group.last_scan is not None:
+            # Ciclos del periodo pedido que quedaron sin atender (por retraso o backoff)
+            group.missed += max(int((now - group.last_scan) / group.rate + 0.05) - 1, 0)
+        group.last_scan = now
+
+        if latency > group.interval and group.interval < group.rate * self.max_backoff:
+            group.interval = min(group.interval * 2, group.rate * self.max_backoff)
+            log("Scan group %r backing off to %gs (device answered in %.0f ms)",
+                group.name, group.interval, latency * 1000, level=WARNING)
+        elif group.interval > group.rate and latency < group.interval / 4:
+            group.interval = max(group.interval / 2, group.rate)
+            log(f"Scan group {group.name!r} recovered to {group.interval:g}s")
+
+        finished = time.monotonic()
+        group.next_due = (group.next_due or now) + group.interval
+        if group.next_due < finished:
+            # Vencido de nuevo: no acumular atraso
+            group.next_due = finished
+
+    # ------------------------------------------------
+    # Hilo de sondeo
+    # ------------------------------------------------
+    def start(self, callback):
+        """Sondea en un hilo propio y entrega cada ScanResult a `callback`."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+        log(f"Scan scheduler started with {len(self.groups)} groups.")
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._stop_event.set()
+            self._thread.join(timeout=5)
+            log("Scan scheduler stopped.")
+
+    def _run(self, callback):
+        while not self._stop_event.is_set():
+            for result in self.run_pending():
+                try:
+                    callback(result)
+                except Exception as e:
+                    log("Scan callback error: %s", e, level=WARNING)
+            deadline = self.next_deadline()
+            delay = 0.5 if deadline is None else deadline - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
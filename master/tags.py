@@ -0,0 +1,192 @@
+import csv
+import struct
+from operator import itemgetter
+
+# Tipo -> (formato struct, registros de 16 bits)
+TYPES = {
+    "int16": ("h", 1),
+    "uint16": ("H", 1),
+    "int32": ("i", 2),
+    "uint32": ("I", 2),
+    "int64": ("q", 4),
+    "uint64": ("Q", 4),
+    "float32": ("f", 2),
+    "float64": ("d", 4),
+    "string": (None, None),
+    "bitfield": (None, 1),
+}
+ORDERS = ("big", "little")
+
+
+class Tag:
+    """Variable tipada sobre uno o varios holding registers.
+
+    `word_order` indica qué registro lleva la palabra alta ("big": el primero)
+    y `byte_order` el orden de los bytes dentro de cada registro ("big": estándar
+    Modbus). El valor numérico final es `raw * scale + offset`. Los strings usan
+    `length` caracteres y los bitfield `width` bits a partir de `bit`.
+    """
+
+    __slots__ = ("name", "address", "type", "word_order", "byte_order", "scale", "offset",
+                 "length", "bit", "width")
+
+    def __init__(self, name, address, type="uint16", word_order="big", byte_order="big",
+                 scale=1.0, offset=0.0, length=2, bit=0, width=1):
+        if type not in TYPES:
+            raise ValueError(f"Unknown tag type: {type}")
+        if word_order not in ORDERS or byte_order not in ORDERS:
+            raise ValueError(f"Invalid word/byte order for tag {name}")
+        self.name = name
+        self.address = address
+        self.type = type
+        self.word_order = word_order
+        self.byte_order = byte_order
+        self.scale = scale
+        self.offset = offset
+        self.length = length
+        self.bit = bit
+        self.width = width
+        if type == "bitfield" and not (0 <= bit and 1 <= width and bit + width <= 16):
+            raise ValueError(f"Invalid bitfield for tag {name}: bit={bit}, width={width}")
+        if address < 0 or address + self.count > 65536:
+            raise ValueError(f"Tag {name} out of range: {address}")
+
+    @property
+    def count(self):
+        """Registros que ocupa el tag."""
+        if self.type == "string":
+            return (self.length + 1) // 2
+        return TYPES[self.type][1]
+
+    def registers(self):
+        """Direcciones en el orden en que forman el valor (palabra alta primero)."""
+        addrs = list(range(self.address, self.address + self.count))
+        return addrs[::-1] if self.word_order == "little" and self.type != "string" else addrs
+
+    def __repr__(self):
+        return f"Tag({self.name!r}, {self.address}, {self.type!r})"
+
+
+def _gather(addresses):
+    """itemgetter que siempre devuelve una tupla."""
+    if len(addresses) == 1:
+        address = addresses[0]
+        return lambda registers: (registers[address],)
+    return itemgetter(*addresses)
+
+
+class _DecodeGroup:
+    """Tags con el mismo tipo y orden de bytes: se decodifican en una sola pasada."""
+
+    def __init__(self, type, byte_order, tags):
+        self.type = type
+        self.tags = tags
+        self.names = [tag.name for tag in tags]
+        addresses = [addr for tag in tags for addr in tag.registers()]
+        self.gather = _gather(addresses)
+        n_words = len(addresses)
+        # Empaquetar las palabras ya ordenadas; el orden de bytes se resuelve aquí
+        self.pack = struct.Struct(f"{'>' if byte_order == 'big' else '<'}{n_words}H").pack
+        fmt = TYPES[type][0]
+        self.unpack = struct.Struct(f">{len(tags)}{fmt}").unpack if fmt else None
+        self.scaled = any(tag.scale != 1 or tag.offset != 0 for tag in tags)
+        self.scales = [(tag.scale, tag.offset) for tag in tags]
+
+    def decode(self, registers):
+        raw = self.pack(*self.gather(registers))
+        if self.type == "string":
+            values, pos = [], 0
+            for tag in self.tags:
+                size = tag.count * 2
+                values.append(raw[pos:pos + tag.length].split(b"\x00", 1)[0].decode("latin-1"))
+                pos += size
+            return values
+        if self.type == "bitfield":
+            words = struct.unpack(f">{len(self.tags)}H", raw)
+            values = [(word >> tag.bit) & ((1 << tag.width) - 1) for word, tag in zip(words, self.tags)]
+        else:
+            values = self.unpack(raw)
+        if self.scaled:
+            return [value * scale + offset for value, (scale, offset) in zip(values, self.scales)]
+        return values
+
+
+class TagSet:
+    """Conjunto de tags compilado para decodificar una lectura completa de una vez.
+
+    Los tags se agrupan por tipo y orden de bytes. Para cada grupo se reúnen
+    todas sus palabras con un único `itemgetter`, se empaquetan con un único
+    `struct.pack` y se decodifican con un único `struct.unpack`.
+    """
+
+    def __init__(self, tags):
+        self.tags = list(tags)
+        names = [tag.name for tag in self.tags]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate tag names")
+        groups = {}
+        for tag in self.tags:
+            groups.setdefault((tag.type, tag.byte_order), []).append(tag)
+        self._groups = [_DecodeGroup(type, byte_order, tags) for (type, byte_order), tags in groups.items()]
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __iter__(self):
+        return iter(self.tags)
+
+    def addresses(self):
+        """Rangos (inicio, cantidad) a leer, aptos para `plan_reads`/`read_scan`."""
+        return [(tag.address, tag.count) for tag in self.tags]
+
+    def decode(self, registers, base=0):
+        """Decodifica todos los tags.
+
+        `registers` es un dict dirección→valor (como `read_scan`) o una lista de
+        valores consecutivos que empieza en `base`. Los tags con registros que
+        faltan en la lectura devuelven None.
+        """
+        if not isinstance(registers, dict):
+            registers = dict(zip(range(base, base + len(registers)), registers))
+        result = {}
+        for group in self._groups:
+            try:
+                result.update(zip(group.names, group.decode(registers)))
+            except KeyError:
+                # Lectura incompleta: decodificar tag a tag y marcar los que faltan
+                for tag in group.tags:
+                    try:
+                        single = _DecodeGroup(tag.type, tag.byte_order, [tag])
+                        result[tag.name] = single.decode(registers)[0]
+                    except KeyError:
+                        result[tag.name] = None
+        return result
+
+
+# ------------------------------------------------
+# Carga desde CSV
+# ------------------------------------------------
+_CSV_FIELDS = {
+    "address": int, "scale": float, "offset": float, "length": int, "bit": int, "width": int,
+}
+
+
+def load_tags(path):
+    """Lee tags desde un CSV con cabecera (name,address,type,word_order,byte_order,scale,offset,...)."""
+    tags = []
+    with open(path, newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), 2):
+            options = {}
+            for key, value in row.items():
+                if key is None or value is None or not value.strip():
+                    continue
+                key, value = key.strip(), value.strip()
+                try:
+                    options[key] = _CSV_FIELDS[key](value) if key in _CSV_FIELDS else value
+                except ValueError:
+                    raise ValueError(f"Invalid {key} in tag row {line_no}: {value}")
+            try:
+                tags.append(Tag(**options))
+            except TypeError as e:
+                raise ValueError(f"Invalid tag row {line_no}: {e}")
+    return TagSet(tags)
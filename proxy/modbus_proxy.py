@@ -0,0 +1,202 @@
+import argparse
+import struct
+import time
+from master.modbus_master import ModbusMasterClient
+from master.register_cache import RegisterCache
+from shared.protocol import BIT_TABLES, READ_FUNCTIONS, EXP_DATA_ADDRESS, EXP_DATA_VALUE, EXP_GATEWAY_TARGET
+from shared.metrics import MetricsServer
+from shared.utils import log
+from slave.modbus_slave import ModbusSlaveServer
+from slave.register_store import RegisterStore
+from slave.request_handler import exception_pdu
+
+_ADDR_COUNT = struct.Struct(">HH")
+# Función de lectura (FC1–FC4) -> tabla
+_READ_TABLES = {func_code: table for table, (func_code, _max_count) in READ_FUNCTIONS.items()}
+
+
+class DownstreamDevice:
+    """Dispositivo de campo detrás del proxy: una única conexión compartida.
+
+    Las lecturas de las cuatro tablas (FC1–FC4) pasan por una RegisterCache por
+    tabla con TTL corto (las repetidas y las concurrentes del mismo bloque no
+    llegan al equipo); el resto de peticiones se reenvían tal cual, serializadas
+    en la misma conexión, y las escrituras actualizan o invalidan la caché.
+    """
+
+    def __init__(self, host, port=502, unit_id=1, ttl=0.5, align=1, timeout=3.0):
+        self.caches = {table: RegisterCache(max_age=ttl) for table in READ_FUNCTIONS}
+        self.master = ModbusMasterClient(host, port, unit_id, cache=self.caches)
+        self.timeout = timeout
+        # Alinear las lecturas a múltiplos de `align` direcciones para compartir más bloques
+        self.align = align
+        self.requests = 0       # peticiones recibidas de los maestros
+
+    def connect(self):
+        ok = self.master.connect()
+        if self.master.client:
+            self.master.client.timeout = self.timeout
+        return ok
+
+    def close(self):
+        self.master.disconnect()
+
+    def _failure(self, func_code):
+        """Excepción del dispositivo si la hubo; si no, 0x0B (el equipo no respondió)."""
+        client = self.master.client
+        exp_code = getattr(client, "last_except", 0) if client else 0
+        return exception_pdu(func_code, exp_code or EXP_GATEWAY_TARGET)
+
+    # ------------------------------------------------
+    # Procesamiento
+    # ------------------------------------------------
+    def handle(self, pdu):
+        self.requests += 1
+        table = _READ_TABLES.get(pdu[0])
+        if table is not None:
+            return self._read_table(table, pdu)
+        return self._forward(pdu)
+
+    def _read_table(self, table, pdu):
+        func_code, max_count = READ_FUNCTIONS[table]
+        if len(pdu) < 5:
+            return exception_pdu(func_code, EXP_DATA_VALUE)
+        address, count = _ADDR_COUNT.unpack_from(pdu, 1)
+        if not 1 <= count <= max_count:
+            return exception_pdu(func_code, EXP_DATA_VALUE)
+        if address + count > 0x10000:
+            return exception_pdu(func_code, EXP_DATA_ADDRESS)
+
+        values = None
+        if self.align > 1:
+            start = address - address % self.align
+            end = min(-(-(address + count) // self.align) * self.align, 0x10000)
+            values = self.master.read_table(table, start, end - start)
+            if values is not None:
+                values = values[address - start:address - start + count]
+        if values is None:
+            # Sin alinear (o el equipo rechazó el bloque alineado)
+            values = self.master.read_table(table, address, count)
+        if values is None:
+            return self._failure(func_code)
+        if table in BIT_TABLES:
+            data = values.tobytes()
+            return bytes((func_code, len(data))) + data
+        return bytes((func_code, count * 2)) + struct.pack(f">{count}H", *values)
+
+    def _forward(self, pdu):
+        """Reenvía un PDU sin cachear; las escrituras (FC5/6/15/16) actualizan o invalidan la caché."""
+        response = self.master.forward(pdu)
+        if response is None:
+            return self._failure(pdu[0])
+        return response
+
+    def stats(self):
+        totals = {}
+        for cache in self.caches.values():
+            for key, value in cache.stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return {"requests": self.requests, "forwarded": self.master.request_count, **totals}
+
+
+class ModbusProxy(ModbusSlaveServer):
+    """Proxy/multiplexor Modbus TCP.
+
+    Acepta muchas conexiones de maestros (motor "thread": cada conexión en su
+    hilo, de modo que una petición lenta no bloquea a las demás) y las enruta por
+    unit ID a un DownstreamDevice, que usa una única conexión hacia el equipo.
+    """
+
+    def __init__(self, host="0.0.0.0", port=502):
+        # El databank del servidor no se usa: todas las peticiones van a los dispositivos
+        super().__init__(host, port, engine="thread", store=RegisterStore(sparse=True))
+        self.targets = {}
+
+    def add_target(self, unit_id, host, port=502, target_unit_id=None, ttl=0.5, align=1, timeout=3.0):
+        """Publica en `unit_id` el dispositivo `host:port` (con su propio unit ID si difiere)."""
+        if not 0 <= unit_id <= 255:
+            raise ValueError(f"Invalid unit ID: {unit_id}")
+        device = DownstreamDevice(host, port, unit_id if target_unit_id is None else target_unit_id,
+                                  ttl=ttl, align=align, timeout=timeout)
+        self.targets[unit_id] = device
+        return device
+
+    def start(self):
+        for unit_id, device in self.targets.items():
+            if not device.connect():
+                log(f"Proxy target {unit_id} not reachable yet; will retry on demand.")
+        super().start()
+
+    def stop(self, drain=0.0):
+        super().stop(drain)
+        for device in self.targets.values():
+            device.close()
+
+    def _dispatch(self, unit_id, pdu):
+        device = self.targets.get(unit_id)
+        if device is None:
+            return exception_pdu(pdu[0], EXP_GATEWAY_TARGET)
+        return device.handle(pdu)
+
+    def stats(self):
+        return {unit_id: device.stats() for unit_id, device in self.targets.items()}
+
+
+# ------------------------------------------------
+# Punto de entrada
+# ------------------------------------------------
+def _parse_target(text):
+    """`unit=host:port[:unit_destino]` -> (unit, host, port, unit_destino)."""
+    try:
+        unit, address = text.split("=", 1)
+        parts = address.split(":")
+        host = parts[0]
+        port = int(parts[1]) if len(parts) > 1 else 502
+        target_unit = int(parts[2]) if len(parts) > 2 else None
+        return int(unit), host, port, target_unit
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid target '{text}' (expected unit=host:port[:unit])")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modbus TCP caching proxy / multiplexer")
+    parser.add_argument("--host", default="0.0.0.0", help="listen address")
+    parser.add_argument("--port", type=int, default=502, help="listen port")
+    parser.add_argument("--target", type=_parse_target, action="append", required=True,
+                        help="unit=host:port[:unit] (repeatable)")
+    parser.add_argument("--ttl", type=float, default=0.5, help="read cache TTL in seconds")
+    parser.add_argument("--align", type=int, default=1, help="align downstream reads to N registers")
+    parser.add_argument("--timeout", type=float, default=3.0, help="downstream timeout in seconds")
+    parser.add_argument("--stats", type=float, default=10.0, help="stats log interval in seconds (0 = off)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--capture", help="capture request/response frames to this file (.mbcap)")
+    args = parser.parse_args(argv)
+
+    proxy = ModbusProxy(args.host, args.port)
+    for unit, host, port, target_unit in args.target:
+        proxy.add_target(unit, host, port, target_unit, ttl=args.ttl, align=args.align, timeout=args.timeout)
+    if args.capture:
+        proxy.start_capture(args.capture)
+    proxy.start()
+    if not proxy.running:
+        proxy.stop_capture()
+        return 1
+    metrics = MetricsServer(port=args.metrics_port) if args.metrics_port else None
+    if metrics:
+        metrics.start()
+    try:
+        while True:
+            time.sleep(args.stats or 3600)
+            if args.stats:
+                log(f"Proxy stats: {proxy.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if metrics:
+            metrics.stop()
+        proxy.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
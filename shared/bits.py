@@ -0,0 +1,101 @@
+from itertools import chain, islice
+
+# Tabla de desempaquetado: byte -> 8 bits (LSB primero, como en la trama Modbus)
+BYTE_BITS = [tuple(bool(byte >> i & 1) for i in range(8)) for byte in range(256)]
+
+
+class PackedBits:
+    """Secuencia de bits de solo lectura empaquetada 8 por byte (LSB primero).
+
+    Es el formato de las tramas FC1/FC2/FC15: las lecturas de coils y discrete
+    inputs se devuelven así, sin crear una lista de bool por petición. Se puede
+    indexar e iterar como una lista; `slice` y `join` operan con enteros.
+    """
+
+    __slots__ = ("_data", "_count")
+
+    def __init__(self, data=b"", count=None):
+        data = bytes(data)
+        count = len(data) * 8 if count is None else count
+        if not 0 <= count <= len(data) * 8:
+            raise ValueError(f"{count} bits do not fit in {len(data)} bytes")
+        data = data[:(count + 7) // 8]
+        if count % 8:
+            # Los bits sobrantes del último byte siempre a 0 (comparaciones y FC15)
+            data = data[:-1] + bytes((data[-1] & (1 << count % 8) - 1,))
+        self._data = data
+        self._count = count
+
+    @classmethod
+    def from_bools(cls, bits):
+        bits = list(bits)
+        data = bytearray((len(bits) + 7) // 8)
+        for index, bit in enumerate(bits):
+            if bit:
+                data[index >> 3] |= 1 << (index & 7)
+        return cls(data, len(bits))
+
+    @classmethod
+    def from_int(cls, value, count):
+        """Los `count` bits menos significativos de `value` (bit 0 = primera dirección)."""
+        value &= (1 << count) - 1
+        return cls(value.to_bytes((count + 7) // 8, "little"), count)
+
+    @classmethod
+    def join(cls, parts):
+        """Concatena varios PackedBits (p. ej. los bloques de una lectura de más de 2000 bits)."""
+        value = offset = 0
+        for part in parts:
+            value |= int(part) << offset
+            offset += len(part)
+        return cls.from_int(value, offset)
+
+    def __int__(self):
+        return int.from_bytes(self._data, "little")
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return islice(chain.from_iterable(BYTE_BITS[byte] for byte in self._data), self._count)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step != 1:
+                return self.tolist()[index]
+            return self.slice(start, max(stop - start, 0))
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("bit index out of range")
+        return bool(self._data[index >> 3] >> (index & 7) & 1)
+
+    def __eq__(self, other):
+        if isinstance(other, PackedBits):
+            return self._count == other._count and self._data == other._data
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == [bool(bit) for bit in other]
+        return NotImplemented
+
+    def __repr__(self):
+        if self._count <= 64:
+            return f"PackedBits('{''.join('1' if bit else '0' for bit in self)}')"
+        return f"PackedBits({self._count} bits, {self.ones()} set)"
+
+    def slice(self, start, count):
+        """Subrango de `count` bits a partir de `start`."""
+        if start < 0 or count < 0 or start + count > self._count:
+            raise IndexError("bit range out of range")
+        return PackedBits.from_int(int(self) >> start, count)
+
+    def ones(self):
+        """Número de bits a 1."""
+        return int(self).bit_count()
+
+    def tobytes(self):
+        """Bytes empaquetados, listos para la trama Modbus."""
+        return self._data
+
+    def tolist(self):
+        return list(self)
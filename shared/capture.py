@@ -0,0 +1,146 @@
+import struct
+import threading
+import time
+from shared.utils import log, WARNING
+
+# ------------------------------------------------
+# Formato de captura (.mbcap)
+# ------------------------------------------------
+# Cabecera: magic, versión, hora de inicio (epoch, s)
+# Registros: instante (s desde el inicio), duración (s), sesión, unit ID,
+#            longitudes de petición y respuesta, y después ambos PDUs
+#            (respuesta vacía = sin respuesta: timeout o error de red)
+MAGIC = b"MBCAP\x00"
+VERSION = 1
+_HEADER = struct.Struct("<6sHd")
+_RECORD = struct.Struct("<dfHBBB")
+
+
+class Transaction:
+    """Una transacción capturada."""
+
+    __slots__ = ("time", "duration", "session", "unit_id", "request", "response")
+
+    def __init__(self, time, duration, session, unit_id, request, response):
+        self.time = time
+        self.duration = duration
+        self.session = session
+        self.unit_id = unit_id
+        self.request = request
+        self.response = response
+
+    def __repr__(self):
+        return (f"Transaction({self.time:.6f}s, session {self.session}, unit {self.unit_id}, "
+                f"FC{self.request[0]}, {self.duration * 1000:.3f} ms)")
+
+
+class TrafficCapture:
+    """Captura binaria de las transacciones Modbus de un maestro o un esclavo.
+
+    `record` solo empaqueta la transacción en un buffer en memoria; un hilo la
+    escribe en disco cada `flush_interval` segundos o cuando el buffer supera
+    `buffer_size` bytes. Cada conexión (o cliente) es una sesión numerada, de
+    modo que la reproducción conserva la concurrencia original.
+    """
+
+    def __init__(self, path, flush_interval=1.0, buffer_size=1 << 20):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.records = 0
+        self.bytes = 0
+        self._sessions = {}
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._origin = time.perf_counter()
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+        log(f"Capturing traffic to {path}")
+
+    def session(self, key):
+        """Número de sesión de una conexión (cualquier clave hashable, p. ej. (host, puerto))."""
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.setdefault(key, len(self._sessions) & 0xFFFF)
+        return session
+
+    def record(self, session, unit_id, started, duration, request, response):
+        """Añade una transacción; `started` es un instante de time.perf_counter()."""
+        response = response or b""
+        data = _RECORD.pack(started - self._origin, duration, session, unit_id,
+                            len(request), len(response)) + request + response
+        with self._lock:
+            if self._closed:
+                return
+            self._buffer += data
+            self.records += 1
+            if len(self._buffer) >= self.buffer_size:
+                self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buffer) < self.buffer_size:
+                    self._wake.wait(self.flush_interval)
+                data, self._buffer = self._buffer, bytearray()
+                closed = self._closed
+            if data:
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    self.bytes += len(data)
+                except (OSError, ValueError) as e:
+                    log("Capture write error: %s", e, level=WARNING)
+            if closed:
+                return
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+        self._file.close()
+        log(f"Capture closed: {self.path} ({self.records} transactions)")
+
+
+# ------------------------------------------------
+# Lectura
+# ------------------------------------------------
+def read_capture_header(path):
+    """Devuelve la hora de inicio (epoch) de una captura."""
+    with open(path, "rb") as f:
+        return _read_header(f, path)
+
+
+def _read_header(f, path):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"Not a capture: {path}")
+    magic, version, started = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"Not a capture: {path}")
+    if version != VERSION:
+        raise ValueError(f"Unsupported capture version {version}")
+    return started
+
+
+def read_capture(path):
+    """Itera las transacciones de una captura; un registro final incompleto se ignora."""
+    with open(path, "rb") as f:
+        _read_header(f, path)
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            offset, duration, session, unit_id, request_len, response_len = _RECORD.unpack(header)
+            body = f.read(request_len + response_len)
+            if len(body) < request_len + response_len:
+                return
+            yield Transaction(offset, duration, session, unit_id, body[:request_len], body[request_len:])
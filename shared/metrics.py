@@ -0,0 +1,287 @@
+import json
+import threading
+import weakref
+from bisect import bisect_left
+from shared.protocol import MBAP_SIZE
+from shared.utils import log, WARNING
+
+# Límites superiores de los buckets de latencia (s); el último bucket es +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Tamaño de una respuesta de excepción en el cable (MBAP + código de función + código de excepción)
+EXCEPTION_FRAME_SIZE = MBAP_SIZE + 2
+
+
+class Histogram:
+    """Histograma de buckets fijos; los percentiles se interpolan dentro del bucket."""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Valor aproximado del percentil `q` (0–1); None si no hay muestras."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if bucket and seen + bucket >= rank:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket
+            seen += bucket
+        return self.max
+
+    def merge(self, other):
+        for index, bucket in enumerate(other.counts):
+            self.counts[index] += bucket
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+
+class DeviceMetrics:
+    """Métricas de rendimiento de un extremo Modbus (un dispositivo del maestro o un esclavo).
+
+    `observe` solo incrementa contadores, sin locks: con varios hilos escribiendo
+    a la vez algún incremento puede perderse, a cambio de no añadir contención
+    al camino de cada petición.
+    """
+
+    def __init__(self, role, device, buckets=LATENCY_BUCKETS, register=True):
+        self.role = role            # "master" o "slave"
+        self.device = device        # "host:puerto[/unit]"
+        self.buckets = buckets
+        self.requests = {}          # código de función -> peticiones
+        self.latency = {}           # código de función -> Histogram
+        self.timeouts = 0
+        self.network_errors = 0
+        self.exceptions = {}        # código de excepción -> respuestas
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.gauges = {}            # nombre -> callable (p. ej. conexiones activas)
+        if register:
+            REGISTRY.add(self)
+
+    def observe(self, func_code, latency, sent, received):
+        """Registra una petición completada (bytes en el cable, con cabecera MBAP)."""
+        self.requests[func_code] = self.requests.get(func_code, 0) + 1
+        histogram = self.latency.get(func_code)
+        if histogram is None:
+            histogram = self.latency[func_code] = Histogram(self.buckets)
+        histogram.observe(latency)
+        self.bytes_sent += sent
+        self.bytes_received += received
+
+    def exception(self, exp_code):
+        self.exceptions[exp_code] = self.exceptions.get(exp_code, 0) + 1
+
+    def merge(self, other):
+        for func_code, count in list(other.requests.items()):
+            self.requests[func_code] = self.requests.get(func_code, 0) + count
+        for func_code, histogram in list(other.latency.items()):
+            self.latency.setdefault(func_code, Histogram(self.buckets)).merge(histogram)
+        for exp_code, count in list(other.exceptions.items()):
+            self.exceptions[exp_code] = self.exceptions.get(exp_code, 0) + count
+        self.timeouts += other.timeouts
+        self.network_errors += other.network_errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.gauges = {**other.gauges, **self.gauges}
+
+    def stats(self):
+        all_latency = Histogram(self.buckets)
+        for histogram in list(self.latency.values()):
+            all_latency.merge(histogram)
+        stats = {
+            "requests": dict(self.requests),
+            "latency": {func_code: histogram.stats() for func_code, histogram in list(self.latency.items())},
+            "latency_all": all_latency.stats(),
+            "timeouts": self.timeouts,
+            "network_errors": self.network_errors,
+            "exceptions": dict(self.exceptions),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
+        for name, gauge in self.gauges.items():
+            stats[name] = gauge()
+        return stats
+
+    def __repr__(self):
+        return f"DeviceMetrics({self.role}, {self.device}, {sum(self.requests.values())} requests)"
+
+
+class MetricsRegistry:
+    """Conjunto de DeviceMetrics vivos (referencias débiles: desaparecen con su cliente/servidor)."""
+
+    def __init__(self):
+        self._metrics = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def add(self, metrics):
+        with self._lock:
+            self._metrics.add(metrics)
+
+    def collect(self):
+        """DeviceMetrics agrupados por (rol, dispositivo): varios clientes del mismo equipo se suman."""
+        with self._lock:
+            items = list(self._metrics)
+        grouped = {}
+        for metrics in items:
+            key = (metrics.role, metrics.device)
+            if key not in grouped:
+                grouped[key] = DeviceMetrics(*key, metrics.buckets, register=False)
+            grouped[key].merge(metrics)
+        return grouped
+
+    def stats(self):
+        """{rol: {dispositivo: estadísticas}}."""
+        result = {}
+        for (role, device), metrics in sorted(self.collect().items()):
+            result.setdefault(role, {})[device] = metrics.stats()
+        return result
+
+    def render_prometheus(self):
+        """Todas las métricas en formato de texto de Prometheus."""
+        collected = sorted(self.collect().items())
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        def labels(metrics, **extra):
+            pairs = {"role": metrics.role, "device": metrics.device, **extra}
+            return "{" + ",".join(f'{key}="{value}"' for key, value in pairs.items()) + "}"
+
+        family("modbus_requests_total", "counter", "Requests by function code.", [
+            f"modbus_requests_total{labels(m, fc=fc)} {count}"
+            for _, m in collected for fc, count in sorted(m.requests.items())])
+
+        samples = []
+        for _, m in collected:
+            for fc, histogram in sorted(m.latency.items()):
+                cumulative = 0
+                for bound, bucket in zip(histogram.bounds + ("+Inf",), histogram.counts):
+                    cumulative += bucket
+                    samples.append(f"modbus_request_duration_seconds_bucket{labels(m, fc=fc, le=bound)} {cumulative}")
+                samples.append(f"modbus_request_duration_seconds_sum{labels(m, fc=fc)} {histogram.sum:.6f}")
+                samples.append(f"modbus_request_duration_seconds_count{labels(m, fc=fc)} {histogram.count}")
+        family("modbus_request_duration_seconds", "histogram", "Request latency.", samples)
+
+        family("modbus_timeouts_total", "counter", "Requests that timed out.", [
+            f"modbus_timeouts_total{labels(m)} {m.timeouts}" for _, m in collected])
+        family("modbus_network_errors_total", "counter", "Requests that failed at the network level.", [
+            f"modbus_network_errors_total{labels(m)} {m.network_errors}" for _, m in collected])
+        family("modbus_exceptions_total", "counter", "Modbus exception responses by exception code.", [
+            f"modbus_exceptions_total{labels(m, code=code)} {count}"
+            for _, m in collected for code, count in sorted(m.exceptions.items())])
+        family("modbus_bytes_sent_total", "counter", "Bytes sent on the wire (MBAP + PDU).", [
+            f"modbus_bytes_sent_total{labels(m)} {m.bytes_sent}" for _, m in collected])
+        family("modbus_bytes_received_total", "counter", "Bytes received on the wire (MBAP + PDU).", [
+            f"modbus_bytes_received_total{labels(m)} {m.bytes_received}" for _, m in collected])
+
+        gauges = {}
+        for _, m in collected:
+            for name, gauge in m.gauges.items():
+                value = gauge()
+                if value is not None:
+                    gauges.setdefault(name, []).append(f"modbus_{name}{labels(m)} {value}")
+        for name, samples in sorted(gauges.items()):
+            family(f"modbus_{name}", "gauge", f"Current {name.replace('_', ' ')}.", samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ------------------------------------------------
+# Endpoint HTTP
+# ------------------------------------------------
+def _make_handler():
+    # http.server se importa solo al arrancar el endpoint (tarda ~60 ms)
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            registry = self.server.registry
+            if self.path.split("?")[0] == "/metrics":
+                body = registry.render_prometheus().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.split("?")[0] == "/stats":
+                body = json.dumps(registry.stats(), default=str).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """Servidor HTTP local con `/metrics` (Prometheus) y `/stats` (JSON)."""
+
+    def __init__(self, host="127.0.0.1", port=9502, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        if self._httpd:
+            return True
+        from http.server import ThreadingHTTPServer
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler())
+        except OSError as e:
+            log("Metrics server error: %s", e, level=WARNING)
+            return False
+        self._httpd.daemon_threads = True
+        self._httpd.registry = self.registry
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        log(f"Metrics available at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
@@ -0,0 +1,146 @@
+import struct
+from shared.bits import PackedBits
+
+# ------------------------------------------------
+# Códigos de función Modbus
+# ------------------------------------------------
+READ_COILS = 0x01
+READ_DISCRETE_INPUTS = 0x02
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_COIL = 0x05
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_COILS = 0x0F
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+# Códigos de excepción
+EXP_ILLEGAL_FUNCTION = 0x01
+EXP_DATA_ADDRESS = 0x02
+EXP_DATA_VALUE = 0x03
+EXP_DEVICE_FAILURE = 0x04
+EXP_GATEWAY_TARGET = 0x0B
+
+# Límites por petición
+MAX_READ_REGISTERS = 125
+MAX_WRITE_REGISTERS = 123
+MAX_READ_BITS = 2000
+MAX_WRITE_BITS = 1968
+
+# Tablas de datos Modbus
+COILS = "coils"
+DISCRETE_INPUTS = "discrete_inputs"
+HOLDING_REGISTERS = "holding_registers"
+INPUT_REGISTERS = "input_registers"
+BIT_TABLES = (COILS, DISCRETE_INPUTS)
+
+# Tabla -> (código de función de lectura, máximo por petición)
+READ_FUNCTIONS = {
+    COILS: (READ_COILS, MAX_READ_BITS),
+    DISCRETE_INPUTS: (READ_DISCRETE_INPUTS, MAX_READ_BITS),
+    HOLDING_REGISTERS: (READ_HOLDING_REGISTERS, MAX_READ_REGISTERS),
+    INPUT_REGISTERS: (READ_INPUT_REGISTERS, MAX_READ_REGISTERS),
+}
+
+# Cabecera MBAP: transaction id, protocol id, length, unit id
+MBAP_SIZE = 7
+_MBAP = struct.Struct(">HHHB")
+_ADDR_COUNT = struct.Struct(">BHH")
+
+
+class ModbusProtocolError(Exception):
+    """Trama Modbus TCP mal formada o inesperada."""
+
+
+class ModbusExceptionResponse(Exception):
+    """El esclavo respondió con una excepción Modbus."""
+
+    def __init__(self, func_code, exp_code):
+        super().__init__(f"Modbus exception {exp_code} for function {func_code}")
+        self.func_code = func_code
+        self.exp_code = exp_code
+
+
+# ------------------------------------------------
+# Tramas
+# ------------------------------------------------
+def build_frame(transaction_id, unit_id, pdu):
+    """Antepone la cabecera MBAP a un PDU."""
+    return _MBAP.pack(transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+
+def parse_mbap(header):
+    """Decodifica la cabecera MBAP y devuelve (transaction_id, longitud del PDU, unit_id)."""
+    transaction_id, protocol_id, length, unit_id = _MBAP.unpack(header)
+    if protocol_id != 0:
+        raise ModbusProtocolError("MBAP protocol ID must be 0")
+    if not 2 < length < 256:
+        raise ModbusProtocolError(f"MBAP length out of range: {length}")
+    return transaction_id, length - 1, unit_id
+
+
+def check_response(request_pdu, response_pdu):
+    """Lanza ModbusExceptionResponse si la respuesta es una excepción o no corresponde a la petición."""
+    if len(response_pdu) < 2:
+        raise ModbusProtocolError("PDU too short")
+    func_code = response_pdu[0]
+    if func_code == request_pdu[0] | 0x80:
+        raise ModbusExceptionResponse(request_pdu[0], response_pdu[1])
+    if func_code != request_pdu[0]:
+        raise ModbusProtocolError(f"Unexpected function code {func_code}")
+
+
+# ------------------------------------------------
+# PDUs de petición
+# ------------------------------------------------
+def read_registers_pdu(start_addr, count, func_code=READ_HOLDING_REGISTERS):
+    return _ADDR_COUNT.pack(func_code, start_addr, count)
+
+
+def read_table_pdu(table, start_addr, count):
+    """Petición de lectura (FC1–FC4) de cualquiera de las cuatro tablas."""
+    return _ADDR_COUNT.pack(READ_FUNCTIONS[table][0], start_addr, count)
+
+
+def write_single_coil_pdu(address, value):
+    return _ADDR_COUNT.pack(WRITE_SINGLE_COIL, address, 0xFF00 if value else 0x0000)
+
+
+def write_multiple_coils_pdu(start_addr, bits):
+    """FC15 a partir de un PackedBits (los bits ya van empaquetados como en la trama)."""
+    data = bits.tobytes()
+    return _ADDR_COUNT.pack(WRITE_MULTIPLE_COILS, start_addr, len(bits)) + bytes((len(data),)) + data
+
+
+def write_single_register_pdu(address, value):
+    return _ADDR_COUNT.pack(WRITE_SINGLE_REGISTER, address, value)
+
+
+def write_multiple_registers_pdu(start_addr, values):
+    count = len(values)
+    return _ADDR_COUNT.pack(WRITE_MULTIPLE_REGISTERS, start_addr, count) + struct.pack(f">B{count}H", count * 2, *values)
+
+
+# ------------------------------------------------
+# Decodificación de respuestas
+# ------------------------------------------------
+def decode_registers(response_pdu, count):
+    """Extrae los registros de una respuesta FC3/FC4."""
+    byte_count = response_pdu[1]
+    if byte_count != count * 2 or len(response_pdu) != byte_count + 2:
+        raise ModbusProtocolError("Register byte count mismatch")
+    return list(struct.unpack_from(f">{count}H", response_pdu, 2))
+
+
+def decode_bits(response_pdu, count):
+    """Extrae los bits de una respuesta FC1/FC2 sin desempaquetarlos."""
+    byte_count = response_pdu[1]
+    if byte_count != (count + 7) // 8 or len(response_pdu) != byte_count + 2:
+        raise ModbusProtocolError("Bit byte count mismatch")
+    return PackedBits(response_pdu[2:], count)
+
+
+def decode_table(table, response_pdu, count):
+    """Decodifica una respuesta de lectura: PackedBits para coils/discrete inputs, lista para registros."""
+    if table in BIT_TABLES:
+        return decode_bits(response_pdu, count)
+    return decode_registers(response_pdu, count)
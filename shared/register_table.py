@@ -0,0 +1,146 @@
+from array import array
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+from shared.protocol import COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS
+
+# Opciones del selector de tabla: (tabla, texto)
+TABLE_CHOICES = (
+    (HOLDING_REGISTERS, "Holding Registers"),
+    (INPUT_REGISTERS, "Input Registers"),
+    (COILS, "Coils"),
+    (DISCRETE_INPUTS, "Discrete Inputs"),
+)
+
+
+class RegisterTableModel(QAbstractTableModel):
+    """Modelo virtual de registros: una fila por dirección (0–65535).
+
+    Guarda un espejo compacto de los valores (array de 16 bits) y la vista solo
+    consulta las filas visibles. `update_values` emite dataChanged únicamente
+    para las celdas cuyo valor cambió.
+    """
+
+    value_edited = Signal(int, int)   # address, value
+    edit_rejected = Signal(str)
+
+    HEADERS = ("Address", "Value")
+    VALUE_COLUMN = 1
+
+    def __init__(self, size=65536, editable=False, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.editable = editable
+        # 1 para tablas de bits (coils / discrete inputs)
+        self.max_value = 65535
+        self._values = array("H", bytes(size * 2))
+
+    # ------------------------------------------------
+    # Interfaz QAbstractTableModel
+    # ------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.size
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            row = index.row()
+            return str(self._values[row]) if index.column() == self.VALUE_COLUMN else str(row)
+        if role == Qt.TextAlignmentRole and index.column() == self.VALUE_COLUMN:
+            return Qt.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if self.editable and index.column() == self.VALUE_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        try:
+            new_value = int(value)
+            if not 0 <= new_value <= self.max_value:
+                raise ValueError
+        except (TypeError, ValueError):
+            self.edit_rejected.emit(f"Value must be between 0–{self.max_value}.")
+            return False
+        self.update_values(index.row(), [new_value])
+        self.value_edited.emit(index.row(), new_value)
+        return True
+
+    # ------------------------------------------------
+    # Actualización de valores
+    # ------------------------------------------------
+    def value(self, address):
+        return self._values[address]
+
+    def clear(self, max_value=65535):
+        """Pone todos los valores a 0 (p. ej. al cambiar de tabla) y fija el máximo editable."""
+        self.beginResetModel()
+        self.max_value = max_value
+        self._values = array("H", bytes(self.size * 2))
+        self.endResetModel()
+
+    def update_values(self, start_addr, values):
+        """Copia `values` a partir de `start_addr`; devuelve cuántos registros cambiaron."""
+        new = array("H", values)
+        end = start_addr + len(new)
+        mirror = self._values
+        if mirror[start_addr:end] == new:
+            return 0
+        changed = 0
+        run_start = None
+        for offset, value in enumerate(new):
+            addr = start_addr + offset
+            if mirror[addr] != value:
+                mirror[addr] = value
+                changed += 1
+                if run_start is None:
+                    run_start = addr
+            elif run_start is not None:
+                self._emit_changed(run_start, addr - 1)
+                run_start = None
+        if run_start is not None:
+            self._emit_changed(run_start, end - 1)
+        return changed
+
+    def _emit_changed(self, first_row, last_row):
+        self.dataChanged.emit(self.index(first_row, self.VALUE_COLUMN),
+                              self.index(last_row, self.VALUE_COLUMN), [Qt.DisplayRole])
+
+
+class RegisterTableView(QTableView):
+    """Vista para RegisterTableModel: filas de altura fija y desplazamiento por dirección."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.verticalHeader().setVisible(False)
+        # Altura fija: Qt no necesita medir las 65536 filas
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        # La edición se decide en RegisterTableModel.flags: el modelo puede pasar a editable más tarde
+
+    def visible_range(self):
+        """Devuelve (dirección inicial, cantidad) de las filas visibles."""
+        first = self.rowAt(0)
+        last = self.rowAt(self.viewport().height() - 1)
+        if first < 0:
+            return 0, 0
+        if last < 0:
+            last = self.model().rowCount() - 1
+        return first, last - first + 1
+
+    def scroll_to_address(self, address):
+        self.scrollTo(self.model().index(address, 0), QAbstractItemView.PositionAtTop)
@@ -1,6 +1,197 @@
-import datetime
+import atexit
+import sys
+import threading
+import time
+from collections import deque
 
-def log(message: str):
-    """Registrar mensajes con timestamp en consola."""
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{now}] {message}")
+# ------------------------------------------------
+# Niveles
+# ------------------------------------------------
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# Líneas máximas del registro visual de las GUIs
+LOG_MAX_LINES = 1000
+
+
+class LogRecord:
+    """Mensaje pendiente de escribir; el texto se formatea en el hilo escritor."""
+
+    __slots__ = ("created", "level", "message", "args", "suppressed")
+
+    def __init__(self, created, level, message, args, suppressed=0):
+        self.created = created
+        self.level = level
+        self.message = message
+        self.args = args
+        self.suppressed = suppressed
+
+    def text(self):
+        message = self.message % self.args if self.args else self.message
+        if self.suppressed:
+            message += f" ({self.suppressed} similar messages suppressed)"
+        return message
+
+
+class LogPipeline:
+    """Registro no bloqueante con cola acotada y escritura en segundo plano.
+
+    `log()` solo comprueba el nivel y la limitación, y encola el mensaje con sus
+    argumentos sin formatear (estilo %). Un hilo escribe los mensajes en lote y
+    guarda las últimas líneas en un buffer circular (`recent`). Si la cola se
+    llena se descartan los más antiguos. Un mismo mensaje (misma plantilla) se
+    deja pasar `burst` veces por ventana de `window` segundos; los suprimidos se
+    resumen en el siguiente que pase.
+    """
+
+    def __init__(self, level=INFO, capacity=10000, history=1000, window=10.0, burst=3, stream=None):
+        self.level = level
+        self.window = window
+        self.burst = burst
+        self.stream = stream
+        self.dropped = 0
+        self._queue = deque(maxlen=capacity)
+        self._history = deque(maxlen=history)
+        self._limits = {}       # (nivel, plantilla) -> [inicio de ventana, mensajes, suprimidos]
+        self._sinks = ()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._writing = False
+        self._thread = None
+        self._stamp = (None, "")    # caché del segundo formateado
+
+    def log(self, message, *args, level=INFO):
+        if level < self.level:
+            return
+        now = time.time()
+        with self._lock:
+            suppressed = self._limit((level, message), now)
+            if suppressed is None:
+                return
+            queue = self._queue
+            if not queue:
+                # El escritor solo espera con la cola vacía
+                self._wakeup.notify_all()
+            elif len(queue) == queue.maxlen:
+                self.dropped += 1
+            queue.append(LogRecord(now, level, message, args, suppressed))
+            if self._thread is None:
+                self._start()
+
+    def _limit(self, key, now):
+        """None si el mensaje se suprime; si no, cuántos se suprimieron antes que él."""
+        entry = self._limits.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            suppressed = entry[2] if entry else 0
+            if len(self._limits) > 1024:
+                # Olvidar las ventanas vencidas (mensajes f-string únicos)
+                self._limits = {k: v for k, v in self._limits.items() if now - v[0] < self.window}
+                if len(self._limits) > 1024:
+                    self._limits.clear()
+            self._limits[key] = [now, 1, 0]
+            return suppressed
+        if entry[1] < self.burst:
+            entry[1] += 1
+            return 0
+        entry[2] += 1
+        return None
+
+    # ------------------------------------------------
+    # Salidas
+    # ------------------------------------------------
+    def add_sink(self, callback):
+        """Registra `callback(línea, record)`; se llama desde el hilo escritor."""
+        self._sinks = self._sinks + (callback,)
+        return callback
+
+    def remove_sink(self, callback):
+        self._sinks = tuple(cb for cb in self._sinks if cb is not callback)
+
+    def recent(self, count=None):
+        """Últimas líneas escritas (como máximo el tamaño del historial)."""
+        lines = list(self._history)
+        return lines if count is None else lines[-count:]
+
+    def flush(self, timeout=2.0):
+        """Espera a que se escriban los mensajes encolados."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while (self._queue or self._writing) and self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._wakeup.wait(remaining)
+        return True
+
+    # ------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _format(self, record):
+        second = int(record.created)
+        if second != self._stamp[0]:
+            self._stamp = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+        level = "" if record.level == INFO else f"[{LEVEL_NAMES.get(record.level, record.level)}] "
+        return f"[{self._stamp[1]}] {level}{record.text()}"
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                records = list(self._queue)
+                self._queue.clear()
+                self._writing = True
+            lines = []
+            for record in records:
+                try:
+                    line = self._format(record)
+                except Exception as e:
+                    line = f"[log] Bad message {record.message!r}: {e}"
+                lines.append(line)
+                for sink in self._sinks:
+                    try:
+                        sink(line, record)
+                    except Exception:
+                        pass
+            self._history.extend(lines)
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except Exception:
+                pass
+            with self._lock:
+                self._writing = False
+                self._wakeup.notify_all()
+
+
+# ------------------------------------------------
+# Registro global
+# ------------------------------------------------
+pipeline = LogPipeline()
+atexit.register(pipeline.flush)
+
+
+def log(message: str, *args, level=INFO):
+    """Registrar mensajes con timestamp en consola (sin bloquear; `args` se formatean con %)."""
+    pipeline.log(message, *args, level=level)
+
+
+def configure_logging(level=None, window=None, burst=None, stream=None):
+    """Ajusta el nivel mínimo, la limitación de repetidos o la salida del registro global."""
+    if level is not None:
+        pipeline.level = level
+    if window is not None:
+        pipeline.window = window
+    if burst is not None:
+        pipeline.burst = burst
+    if stream is not None:
+        pipeline.stream = stream
@@ -0,0 +1,70 @@
+from shared.utils import log
+from slave.modbus_slave import ModbusSlaveServer, stop_servers
+from slave.register_store import RegisterStore
+
+
+class DeviceFarm:
+    """Granja de esclavos virtuales en un único proceso.
+
+    Agrupa un ModbusSlaveServer por puerto; cada servidor enruta las peticiones
+    por unit ID hacia el RegisterStore (disperso) de cada dispositivo.
+    """
+
+    def __init__(self, host="127.0.0.1", engine="async"):
+        self.host = host
+        self.engine = engine
+        self.servers = {}   # puerto -> ModbusSlaveServer
+
+    def __len__(self):
+        return sum(len(server.devices) for server in self.servers.values())
+
+    def _server(self, port):
+        server = self.servers.get(port)
+        if server is None:
+            # El databank por defecto no se usa al haber dispositivos: disperso y vacío
+            server = ModbusSlaveServer(self.host, port, engine=self.engine,
+                                       store=RegisterStore(sparse=True))
+            self.servers[port] = server
+        return server
+
+    # ------------------------------------------------
+    # Dispositivos
+    # ------------------------------------------------
+    def add_device(self, port, unit_id, store=None, profile=None):
+        """Añade un dispositivo en `port`/`unit_id` (con su DeviceProfile opcional); devuelve su RegisterStore."""
+        return self._server(port).add_device(unit_id, store, profile)
+
+    def clone_devices(self, template, ports, unit_ids):
+        """Crea un dispositivo por cada combinación puerto/unit ID copiando `template`."""
+        count = 0
+        for port in ports:
+            server = self._server(port)
+            for unit_id in unit_ids:
+                server.add_device(unit_id, template.clone())
+                count += 1
+        return count
+
+    def device(self, port, unit_id):
+        server = self.servers.get(port)
+        return server.devices.get(unit_id) if server else None
+
+    @property
+    def nbytes(self):
+        """Memoria reservada por los registros de todos los dispositivos."""
+        return sum(store.nbytes for server in self.servers.values() for store in server.devices.values())
+
+    @property
+    def request_count(self):
+        return sum(server.request_count for server in self.servers.values())
+
+    # ------------------------------------------------
+    # Control
+    # ------------------------------------------------
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        log(f"Device farm started: {len(self)} devices on {len(self.servers)} ports.")
+
+    def stop(self, drain=0.0):
+        stop_servers(self.servers.values(), drain)
+        log("Device farm stopped.")
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+
+# Silencio entre tramas RTU por encima de 19200 baudios (especificación Modbus serie)
+_T35_FAST = 0.00175
+
+
+class DeviceProfile:
+    """Tiempos de un equipo real para el esclavo simulado.
+
+    - `latency`, `jitter`, `distribution`: tiempo de respuesta en segundos;
+      "fixed", "uniform" (latency ± jitter), "normal" (media latency,
+      desviación jitter) o "exponential" (media latency).
+    - `max_rate`: peticiones por segundo; las que llegan antes se encolan.
+    - `baud_rate`: emula una línea serie (pasarela RTU). Cada transacción ocupa
+      la línea lo que tardan petición y respuesta (`bits_per_char` bits por
+      byte, con dirección, CRC y silencio de 3,5 caracteres); las peticiones
+      concurrentes esperan su turno.
+    - `max_connections`: conexiones TCP simultáneas; solo cuenta en el perfil
+      del servidor y las conexiones de más se cierran al aceptarlas.
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential")
+    OPTIONS = ("latency", "jitter", "distribution", "max_rate", "baud_rate", "bits_per_char",
+               "max_connections", "seed")
+
+    def __init__(self, latency=0.0, jitter=0.0, distribution="fixed", max_rate=None, baud_rate=None,
+                 bits_per_char=11, max_connections=None, seed=None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        if latency < 0 or jitter < 0:
+            raise ValueError("Latency and jitter must be >= 0")
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError(f"Invalid max_rate: {max_rate}")
+        if baud_rate is not None and baud_rate <= 0:
+            raise ValueError(f"Invalid baud_rate: {baud_rate}")
+        if max_connections is not None and max_connections < 1:
+            raise ValueError(f"Invalid max_connections: {max_connections}")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.max_rate = max_rate
+        self.baud_rate = baud_rate
+        self.bits_per_char = bits_per_char
+        self.max_connections = max_connections
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Instante (time.monotonic) en que la línea queda libre para la siguiente petición
+        self._free_at = 0.0
+
+    @classmethod
+    def from_dict(cls, spec):
+        """Crea el perfil desde la configuración ({"latency": 0.02, "baud_rate": 19200, ...})."""
+        unknown = set(spec) - set(cls.OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown profile option: {', '.join(sorted(unknown))}")
+        return cls(**spec)
+
+    def __repr__(self):
+        return (f"DeviceProfile(latency={self.latency}, jitter={self.jitter}, {self.distribution}, "
+                f"max_rate={self.max_rate}, baud_rate={self.baud_rate}, max_connections={self.max_connections})")
+
+    # ------------------------------------------------
+    # Tiempos
+    # ------------------------------------------------
+    def sample_latency(self):
+        """Un tiempo de respuesta (s) según la distribución."""
+        latency, jitter = self.latency, self.jitter
+        if self.distribution == "fixed":
+            return latency
+        if self.distribution == "uniform":
+            return max(0.0, self._random.uniform(latency - jitter, latency + jitter))
+        if self.distribution == "normal":
+            return max(0.0, self._random.gauss(latency, jitter))
+        return self._random.expovariate(1 / latency) if latency else 0.0
+
+    def wire_time(self, request_size, response_size):
+        """Tiempo (s) de una transacción en la línea serie; los tamaños son de PDU."""
+        if not self.baud_rate:
+            return 0.0
+        char = self.bits_per_char / self.baud_rate
+        silence = 3.5 * char if self.baud_rate <= 19200 else _T35_FAST
+        # Trama RTU = dirección + PDU + CRC, en cada sentido
+        return (request_size + response_size + 6) * char + 2 * silence
+
+    def delay(self, request_size, response_size):
+        """Retardo (s) desde ahora hasta enviar la respuesta; reserva la línea para esta transacción."""
+        now = time.monotonic()
+        wire = self.wire_time(request_size, response_size)
+        slot = max(wire, 1 / self.max_rate) if self.max_rate else wire
+        with self._lock:
+            latency = self.sample_latency()
+            start = now
+            if slot:
+                start = max(now, self._free_at)
+                self._free_at = start + slot
+        return start - now + wire + latency
@@ -1,86 +1,501 @@
-from pyModbusTCP.server import ModbusServer, DataBank
+from pyModbusTCP.server import ModbusServer
+import asyncio
 import threading
 import time
-from shared.utils import log
+from collections import deque
+from shared.capture import TrafficCapture
+from shared.metrics import DeviceMetrics
+from shared.protocol import EXP_GATEWAY_TARGET, MBAP_SIZE, ModbusProtocolError, build_frame, parse_mbap
+from shared.utils import log, DEBUG, ERROR
+from slave.register_store import RegisterStore, HOLDING_REGISTERS
+from slave.simulation import SimulationEngine
+from slave.snapshot import PersistentSnapshot, save_snapshot, load_snapshot, import_csv
+from slave.request_handler import exception_pdu, process_pdu
+
+
+class _ModbusTCPProtocol(asyncio.Protocol):
+    """Conexión de un maestro en el motor asyncio: decodifica tramas y responde en orden."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.peer = None
+        self.accepted = False
+        self._buffer = bytearray()
+        # Respuestas retenidas por el perfil del equipo: (instante, trama), en orden
+        self._delayed = deque()
+        self._timer = None
+        self._loop = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        server = self.server
+        if server.max_connections is not None and server.connections >= server.max_connections:
+            # Límite de conexiones del equipo emulado: se cierra sin atenderla
+            server.rejected_connections += 1
+            transport.abort()
+            return
+        self.accepted = True
+        self.peer = transport.get_extra_info("peername")
+        self._loop = asyncio.get_running_loop()
+        server.connections += 1
+        server.protocols.add(self)
+
+    def connection_lost(self, exc):
+        if not self.accepted:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._delayed.clear()
+        self.server.connections -= 1
+        self.server.protocols.discard(self)
+
+    @property
+    def busy(self):
+        """True con una trama a medio recibir o respuestas aún sin enviar."""
+        return bool(self._buffer) or bool(self._delayed) or self.transport.get_write_buffer_size() > 0
+
+    def _delay(self, frame, wait):
+        """Retiene una respuesta `wait` segundos sin adelantar a las anteriores."""
+        due = self._loop.time() + wait
+        delayed = self._delayed
+        if delayed and due < delayed[-1][0]:
+            due = delayed[-1][0]
+        delayed.append((due, frame))
+        if self._timer is None:
+            self._timer = self._loop.call_at(due, self._send_delayed)
+
+    def _send_delayed(self):
+        self._timer = None
+        delayed = self._delayed
+        now = self._loop.time()
+        frames = []
+        while delayed and delayed[0][0] <= now:
+            frames.append(delayed.popleft()[1])
+        if frames and not self.transport.is_closing():
+            self.transport.write(b"".join(frames))
+        if delayed:
+            self._timer = self._loop.call_at(delayed[0][0], self._send_delayed)
+
+    def data_received(self, data):
+        buffer = self._buffer
+        buffer += data
+        server = self.server
+        responses = []
+        # Puede haber varias peticiones (pipeline) o una trama incompleta en el buffer
+        while len(buffer) >= MBAP_SIZE:
+            try:
+                transaction_id, pdu_length, unit_id = parse_mbap(bytes(buffer[:MBAP_SIZE]))
+            except ModbusProtocolError:
+                self.transport.close()
+                return
+            end = MBAP_SIZE + pdu_length
+            if len(buffer) < end:
+                break
+            pdu = bytes(buffer[MBAP_SIZE:end])
+            del buffer[:end]
+            response = server.handler(unit_id, pdu, self.peer)
+            frame = build_frame(transaction_id, unit_id, response)
+            wait = server.delay(unit_id, pdu, response) if server.delay else 0.0
+            if wait > 0 or self._delayed:
+                self._delay(frame, wait)
+            else:
+                responses.append(frame)
+        if responses:
+            self.transport.write(b"".join(responses))
+
+
+class _CountingModbusServer(ModbusServer):
+    """ModbusServer de pyModbusTCP (motor "thread") que cuenta las conexiones activas."""
+
+    class ModbusService(ModbusServer.ModbusService):
+
+        def setup(self):
+            super().setup()
+            # `owner` es el _CountingModbusServer que atiende esta conexión (ver `_serve`)
+            self.accepted = self.server.owner._open_connection()
+
+        def handle(self):
+            if self.accepted:
+                super().handle()
+            else:
+                self.request.close()
+
+        def finish(self):
+            if self.accepted:
+                self.server.owner._close_connection()
+            super().finish()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = 0
+        # Límite de conexiones simultáneas (None = sin límite); las de más se cierran
+        self.max_connections = None
+        self.rejected_connections = 0
+        self._connections_lock = threading.Lock()
+
+    def _serve(self):
+        # El servidor de sockets se crea en start(); se le asigna su dueño antes de
+        # aceptar la primera conexión
+        self._service.owner = self
+        super()._serve()
+
+    def _open_connection(self):
+        with self._connections_lock:
+            if self.max_connections is not None and self.connections >= self.max_connections:
+                self.rejected_connections += 1
+                return False
+            self.connections += 1
+            return True
+
+    def _close_connection(self):
+        with self._connections_lock:
+            self.connections -= 1
+
+    def stop(self, drain=0.0):
+        """Deja de aceptar conexiones; cada hilo termina la petición en curso y cierra su conexión.
+
+        Con `drain` se espera hasta ese tiempo (s) a que todos los hilos hayan respondido y cerrado.
+        """
+        super().stop()
+        deadline = time.monotonic() + drain
+        while self.connections and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+class AsyncModbusServer:
+    """Motor asyncio para el esclavo: todas las conexiones en un único event loop.
+
+    Expone la misma interfaz mínima que pyModbusTCP.ModbusServer (start/stop/is_run).
+    """
+
+    def __init__(self, host, port, handler, backlog=1024, delay=None):
+        self.host = host
+        self.port = port
+        self.handler = handler
+        # delay(unit_id, pdu, respuesta) -> segundos que se retiene la respuesta (perfiles de equipo)
+        self.delay = delay
+        self.backlog = backlog
+        self.connections = 0
+        self.max_connections = None
+        self.rejected_connections = 0
+        self.protocols = set()
+        self._loop = None
+        self._server = None
+        self._stop_event = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def is_run(self):
+        return self._thread is not None and self._thread.is_alive() and self._ready.is_set()
+
+    def start(self):
+        """Arranca el event loop en un hilo propio; lanza OSError si no puede escuchar."""
+        if self.is_run:
+            return
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        try:
+            server = await self._loop.create_server(
+                lambda: _ModbusTCPProtocol(self), self.host, self.port,
+                reuse_address=True, backlog=self.backlog)
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._server = server
+        self._ready.set()
+        async with server:
+            await self._stop_event.wait()
+
+    async def _shutdown(self, server, drain):
+        # Dejar de aceptar; las conexiones abiertas terminan sus tramas y envíos pendientes
+        server.close()
+        deadline = self._loop.time() + drain
+        while any(protocol.busy for protocol in self.protocols) and self._loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        for protocol in list(self.protocols):
+            protocol.transport.close()
+        self._stop_event.set()
+
+    def stop(self, drain=0.0):
+        """Detiene el event loop; con `drain` espera hasta ese tiempo (s) a las peticiones en curso."""
+        if self._loop and self._thread and self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(self._server, drain), self._loop)
+            self._thread.join(timeout=drain + 5)
+
+
+def stop_servers(servers, drain=0.0):
+    """Detiene varios servidores a la vez (el drenaje de todos transcurre en paralelo)."""
+    threads = [threading.Thread(target=server.stop, args=(drain,), daemon=True) for server in servers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
 
 class ModbusSlaveServer:
-    """Servidor Modbus TCP con 65536 registros simulados."""
+    """Servidor Modbus TCP con 65536 registros simulados.
 
-    def __init__(self, host="127.0.0.1", port=502):
-        # Crear el DataBank completo (65536 registros)
-        self.databank = DataBank()
+    `engine` elige el motor de red: "thread" (pyModbusTCP, un hilo por conexión)
+    o "async" (asyncio, un único event loop para miles de conexiones).
 
-        # Inicializar 65_536 registros holding en 0
+    Sin dispositivos registrados, `databank` responde a cualquier unit ID. Con
+    `add_device` el servidor aloja varios esclavos virtuales y enruta cada
+    petición por unit ID; los unit ID desconocidos reciben la excepción 0x0B.
+    """
+
+    ENGINES = ("thread", "async")
+
+    def __init__(self, host="127.0.0.1", port=502, engine="thread", store=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown server engine: {engine}")
+        # DataBank compacto con las 4 tablas completas (65536 direcciones, en 0)
         self.total_registers = 65536
-        self.databank.set_holding_registers(0, [0] * self.total_registers)
+        self.databank = RegisterStore(self.total_registers) if store is None else store
+        # Esclavos virtuales por unit ID
+        self.devices = {}
+        # DeviceProfile por unit ID (None = el del servidor)
+        self.profiles = {}
+        # Snapshot mapeado en memoria (modo persistente)
+        self.persistent = None
+        # Generadores de señales (se arrancan con el servidor si hay alguno)
+        self.simulation = SimulationEngine(self.databank)
 
-        # Crear el servidor TCP con este databank
-        self.server = ModbusServer(host, port, no_block=True, data_bank=self.databank)
+        # Crear el servidor TCP con este databank; ambos motores usan process_pdu
+        self.engine = engine
+        if engine == "async":
+            self.server = AsyncModbusServer(host, port, self._handle_request, delay=self._response_delay)
+        else:
+            self.server = _CountingModbusServer(host, port, no_block=True, data_bank=self.databank,
+                                                ext_engine=self._thread_engine)
 
-        # Ventana activa (rango visible/modificable)
-        self.start_addr = 0
-        self.visible_count = 125
+        # Estadísticas de peticiones
+        self.request_count = 0
+        self._rate_mark = (time.monotonic(), 0)
+        self.metrics = DeviceMetrics("slave", f"{host}:{port}")
+        self.metrics.gauges["connections"] = lambda: self.connections
+        self.metrics.gauges["rejected_connections"] = lambda: self.server.rejected_connections
+        # Captura de tráfico (TrafficCapture) mientras esté activa
+        self.capture = None
 
         self.running = False
-        self._thread = None
 
     # ------------------------------------------------
     # Control del servidor
     # ------------------------------------------------
     def start(self):
-        """Inicia el servidor en hilo separado."""
+        """Inicia el servidor; ambos motores atienden las conexiones en sus propios hilos."""
         if self.running:
             return
+        try:
+            self.server.start()
+        except Exception as e:
+            log("Server error: %s", e, level=ERROR)
+            return
         self.running = True
-        self._thread = threading.Thread(target=self._run_server, daemon=True)
-        self._thread.start()
-        log("Modbus Slave server started.")
+        if self.simulation.generators:
+            self.simulation.start()
+        log(f"Modbus Slave server started ({self.engine} engine).")
 
-    def stop(self):
-        """Detiene el servidor."""
+    def stop(self, drain=0.0):
+        """Detiene el servidor; con `drain` espera hasta ese tiempo (s) a que terminen las peticiones en curso."""
         self.running = False
+        self.simulation.stop()
         try:
-            self.server.stop()
+            self.server.stop(drain)
         except Exception as e:
             log(f"Error stopping server: {e}")
+        if self.persistent:
+            self.persistent.flush()
+        self.stop_capture()
         log("Modbus Slave server stopped.")
 
     # ------------------------------------------------
-    # Loop principal
+    # Captura de tráfico
     # ------------------------------------------------
-    def _run_server(self):
-        """Bucle principal: mantener la coherencia de los registros."""
-        try:
-            self.server.start()
-            while self.running:
-                # Leer ventana visible actual del DataBank (por si el Master modificó algo)
-                window = self.databank.get_holding_registers(self.start_addr, self.visible_count)
-                if window:
-                    # Sincronizar registros activos (se podría expandir en GUI)
-                    pass  # Solo lectura pasiva por ahora
-                time.sleep(0.5)
-        except Exception as e:
-            log(f"Server error: {e}")
-            self.running = False
+    def start_capture(self, path):
+        """Graba cada petición y su respuesta en `path` (.mbcap) hasta `stop_capture`."""
+        self.stop_capture()
+        self.capture = TrafficCapture(path)
+        return self.capture
+
+    def stop_capture(self):
+        capture, self.capture = self.capture, None
+        if capture:
+            capture.close()
+
+    # ------------------------------------------------
+    # Procesamiento de peticiones
+    # ------------------------------------------------
+    def _handle_request(self, unit_id, pdu, peer=None):
+        """Procesa un PDU de petición y devuelve el PDU de respuesta (registrando métricas).
+
+        `peer` identifica la conexión del maestro (host, puerto) para la captura.
+        """
+        self.request_count += 1
+        started = time.perf_counter()
+        response = self._dispatch(unit_id, pdu)
+        elapsed = time.perf_counter() - started
+        metrics = self.metrics
+        metrics.observe(pdu[0], elapsed, MBAP_SIZE + len(response), MBAP_SIZE + len(pdu))
+        if response[0] & 0x80:
+            metrics.exception(response[1])
+        capture = self.capture
+        if capture is not None:
+            capture.record(capture.session(peer), unit_id, started, elapsed, pdu, response)
+        return response
+
+    def _dispatch(self, unit_id, pdu):
+        """Enruta el PDU al RegisterStore del unit ID."""
+        if self.devices:
+            store = self.devices.get(unit_id)
+            if store is None:
+                return exception_pdu(pdu[0], EXP_GATEWAY_TARGET)
+        else:
+            store = self.databank
+        return process_pdu(store, pdu)
+
+    def _thread_engine(self, session_data):
+        """ext_engine de pyModbusTCP: delega en el mismo procesamiento que el motor asyncio."""
+        request = session_data.request
+        client = session_data.client
+        unit_id, pdu = request.mbap.unit_id, request.pdu.raw
+        response = self._handle_request(unit_id, pdu, (client.address, client.port))
+        # Cada conexión tiene su hilo: el retardo del perfil solo la bloquea a ella
+        wait = self._response_delay(unit_id, pdu, response)
+        if wait > 0:
+            time.sleep(wait)
+        session_data.response.pdu.raw = response
+
+    # ------------------------------------------------
+    # Perfiles de equipo (latencia, caudal, línea serie)
+    # ------------------------------------------------
+    def set_profile(self, profile, unit_id=None):
+        """Asigna un DeviceProfile a un esclavo virtual o, sin `unit_id`, al servidor.
+
+        El perfil del servidor se aplica a los unit ID sin perfil propio y fija
+        el límite de conexiones. `profile` None lo quita.
+        """
+        if profile is None:
+            self.profiles.pop(unit_id, None)
+        else:
+            self.profiles[unit_id] = profile
+        if unit_id is None:
+            self.server.max_connections = profile.max_connections if profile else None
+
+    def _response_delay(self, unit_id, pdu, response):
+        """Segundos que se retiene la respuesta según el perfil del unit ID."""
+        profiles = self.profiles
+        if not profiles:
+            return 0.0
+        profile = profiles.get(unit_id) or profiles.get(None)
+        return profile.delay(len(pdu), len(response)) if profile else 0.0
+
+    # ------------------------------------------------
+    # Esclavos virtuales (unit ID)
+    # ------------------------------------------------
+    def add_device(self, unit_id, store=None, profile=None):
+        """Registra un esclavo virtual; por defecto con un RegisterStore disperso."""
+        if not 0 <= unit_id <= 255:
+            raise ValueError(f"Invalid unit ID: {unit_id}")
+        if store is None:
+            store = RegisterStore(self.total_registers, sparse=True)
+        self.devices[unit_id] = store
+        if profile is not None:
+            self.set_profile(profile, unit_id)
+        return store
+
+    def remove_device(self, unit_id):
+        self.profiles.pop(unit_id, None)
+        return self.devices.pop(unit_id, None)
+
+    def device(self, unit_id):
+        """RegisterStore que atiende `unit_id` (None si no hay ninguno)."""
+        if not self.devices:
+            return self.databank
+        return self.devices.get(unit_id)
+
+    def stores(self):
+        """Todos los RegisterStore del servidor: {None: databank, unit ID: store}."""
+        return {None: self.databank, **self.devices}
+
+    # ------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------
+    def save_snapshot(self, path):
+        """Guarda las 4 tablas de todos los dispositivos en un fichero binario."""
+        save_snapshot(path, self.stores())
+
+    def load_snapshot(self, path):
+        """Restaura un snapshot; crea los dispositivos que aún no existan."""
+        for unit_id, saved in load_snapshot(path).items():
+            if unit_id is None:
+                self.databank.restore(saved)
+            elif unit_id in self.devices:
+                self.devices[unit_id].restore(saved)
+            else:
+                self.add_device(unit_id, saved)
+
+    def persist(self, path):
+        """Mantiene los registros sobre `path` mapeado en memoria (se recupera al reiniciar)."""
+        if self.persistent:
+            self.persistent.close()
+        self.persistent = PersistentSnapshot(path, self.stores())
+
+    def import_csv(self, path):
+        """Importa valores desde CSV escribiendo bloques contiguos; devuelve cuántos se escribieron."""
+        return import_csv(path, self.stores())
+
+    def subscribe(self, callback):
+        """Suscribe `callback(tabla, dirección, cantidad)` a los cambios del RegisterStore."""
+        return self.databank.subscribe(callback)
+
+    def unsubscribe(self, callback):
+        self.databank.unsubscribe(callback)
+
+    @property
+    def connections(self):
+        """Conexiones activas de maestros."""
+        return getattr(self.server, "connections", None)
+
+    def request_rate(self):
+        """Peticiones por segundo desde la última llamada."""
+        now = time.monotonic()
+        last_time, last_count = self._rate_mark
+        count = self.request_count
+        self._rate_mark = (now, count)
+        elapsed = now - last_time
+        return (count - last_count) / elapsed if elapsed > 0 else 0.0
 
     # ------------------------------------------------
     # Actualizar registros (desde GUI del Slave)
     # ------------------------------------------------
-    def update_register(self, index, value):
-        """Actualiza un registro específico (en todo el espacio de 0–65535)."""
+    def update_register(self, index, value, table=HOLDING_REGISTERS):
+        """Actualiza un valor de cualquiera de las cuatro tablas (en todo el espacio de 0–65535)."""
         if 0 <= index < self.total_registers:
-            self.databank.set_holding_registers(index, [value])
-            log(f"Register {index} updated to {value}")
+            self.databank.set_values(table, index, [value])
+            log("%s %d updated to %d", table, index, value, level=DEBUG)
 
     # ------------------------------------------------
     # Leer rango
     # ------------------------------------------------
     def read_window(self, start_addr, count):
-        """Obtiene un rango de valores para mostrar en GUI."""
+        """Obtiene un rango de valores para mostrar en GUI (vista sin copia)."""
         if count > 125:
             count = 125
         if start_addr + count > self.total_registers:
             count = self.total_registers - start_addr
-        values = self.databank.get_holding_registers(start_addr, count)
-        return values if values else [0] * count
+        values = self.databank.view_holding_registers(start_addr, count)
+        return values if values is not None else [0] * count
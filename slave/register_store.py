@@ -0,0 +1,471 @@
+import sys
+from array import array
+from threading import Lock
+from pyModbusTCP.server import DataBank
+from shared.bits import BYTE_BITS
+from shared.protocol import BIT_TABLES, COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS
+from shared.utils import log
+
+
+_BIG_ENDIAN_HOST = sys.byteorder == "big"
+
+# Tamaño de bloque de las tablas dispersas
+PAGE_WORDS = 256
+PAGE_BITS = 2048
+
+
+# ------------------------------------------------
+# Tablas de registros de 16 bits
+# ------------------------------------------------
+class _WordTable:
+    """Tabla contigua de registros de 16 bits (bytearray + memoryview)."""
+
+    def __init__(self, size, buf=None):
+        self.size = size
+        self.lock = Lock()
+        self._buf = bytearray(size * 2) if buf is None else buf
+        self._mv = memoryview(self._buf).cast("H")
+
+    @property
+    def nbytes(self):
+        return len(self._buf)
+
+    def read(self, address, number):
+        return array("H", self._mv[address:address + number])
+
+    def write(self, address, words):
+        """Escribe un array('H'); devuelve True si algún valor cambió."""
+        target = self._mv[address:address + len(words)]
+        if target == words:
+            return False
+        target[:] = words
+        return True
+
+    def view(self, address, number):
+        return self._mv[address:address + number].toreadonly()
+
+    def clone(self):
+        return _WordTable(self.size, bytearray(self._buf))
+
+
+class _SparseWordTable:
+    """Tabla de registros de 16 bits que solo reserva los bloques con valores distintos de 0."""
+
+    def __init__(self, size, pages=None):
+        self.size = size
+        self.lock = Lock()
+        self.pages = {} if pages is None else pages
+
+    @property
+    def nbytes(self):
+        return len(self.pages) * PAGE_WORDS * 2
+
+    @staticmethod
+    def _segments(address, number):
+        """Divide [address, address+number) en tramos (página, desde, hasta, desplazamiento)."""
+        offset = 0
+        while offset < number:
+            page, start = divmod(address + offset, PAGE_WORDS)
+            length = min(PAGE_WORDS - start, number - offset)
+            yield page, start, start + length, offset
+            offset += length
+
+    def read(self, address, number):
+        out = array("H", bytes(number * 2))
+        for page_no, start, end, offset in self._segments(address, number):
+            page = self.pages.get(page_no)
+            if page is not None:
+                out[offset:offset + end - start] = page[start:end]
+        return out
+
+    def write(self, address, words):
+        changed = False
+        for page_no, start, end, offset in self._segments(address, len(words)):
+            chunk = words[offset:offset + end - start]
+            page = self.pages.get(page_no)
+            if page is None:
+                if not any(chunk):
+                    continue
+                page = self.pages[page_no] = array("H", bytes(PAGE_WORDS * 2))
+            if page[start:end] != chunk:
+                page[start:end] = chunk
+                changed = True
+        return changed
+
+    def view(self, address, number):
+        return memoryview(self.read(address, number)).toreadonly()
+
+    def clone(self):
+        return _SparseWordTable(self.size, {n: array("H", page) for n, page in self.pages.items()})
+
+
+# ------------------------------------------------
+# Tablas de bits empaquetados
+# ------------------------------------------------
+def _write_packed(table, address, data, count):
+    """Escribe `count` bits empaquetados (LSB primero) con operaciones enteras; devuelve True si algo cambió."""
+    first, shift = divmod(address, 8)
+    last = (address + count + 7) // 8
+    old = int.from_bytes(table.read_bytes(first, last), "little")
+    mask = ((1 << count) - 1) << shift
+    new = old & ~mask | int.from_bytes(data, "little") << shift & mask
+    if new == old:
+        return False
+    table.write_bytes(first, new.to_bytes(last - first, "little"))
+    return True
+
+
+class _BitTable:
+    """Tabla contigua de bits empaquetados, 8 por byte (LSB primero)."""
+
+    def __init__(self, size, buf=None):
+        self.size = size
+        self.lock = Lock()
+        self._buf = bytearray((size + 7) // 8) if buf is None else buf
+
+    @property
+    def nbytes(self):
+        return len(self._buf)
+
+    def read_bytes(self, first, last):
+        return self._buf[first:last]
+
+    def write_bytes(self, first, data):
+        self._buf[first:first + len(data)] = data
+
+    def write_packed(self, address, data, count):
+        return _write_packed(self, address, data, count)
+
+    def write_bits(self, address, bits):
+        """Escribe una lista de bool; devuelve la lista de (dirección, anterior, nuevo) modificados."""
+        buf = self._buf
+        changes = []
+        for offset, value in enumerate(bits):
+            index, bit = divmod(address + offset, 8)
+            old = bool(buf[index] >> bit & 1)
+            if old != value:
+                buf[index] ^= 1 << bit
+                changes.append((address + offset, old, value))
+        return changes
+
+    def clone(self):
+        return _BitTable(self.size, bytearray(self._buf))
+
+
+class _SparseBitTable:
+    """Tabla de bits empaquetados que solo reserva los bloques con algún bit a 1."""
+
+    PAGE_BYTES = PAGE_BITS // 8
+
+    def __init__(self, size, pages=None):
+        self.size = size
+        self.lock = Lock()
+        self.pages = {} if pages is None else pages
+
+    @property
+    def nbytes(self):
+        return len(self.pages) * self.PAGE_BYTES
+
+    def read_bytes(self, first, last):
+        out = bytearray(last - first)
+        index = first
+        while index < last:
+            page_no, start = divmod(index, self.PAGE_BYTES)
+            length = min(self.PAGE_BYTES - start, last - index)
+            page = self.pages.get(page_no)
+            if page is not None:
+                out[index - first:index - first + length] = page[start:start + length]
+            index += length
+        return out
+
+    def write_bytes(self, first, data):
+        index = first
+        last = first + len(data)
+        while index < last:
+            page_no, start = divmod(index, self.PAGE_BYTES)
+            length = min(self.PAGE_BYTES - start, last - index)
+            chunk = data[index - first:index - first + length]
+            page = self.pages.get(page_no)
+            if page is None:
+                if not any(chunk):
+                    index += length
+                    continue
+                page = self.pages[page_no] = bytearray(self.PAGE_BYTES)
+            page[start:start + length] = chunk
+            index += length
+
+    def write_packed(self, address, data, count):
+        return _write_packed(self, address, data, count)
+
+    def write_bits(self, address, bits):
+        changes = []
+        for offset, value in enumerate(bits):
+            page_no, bit_index = divmod(address + offset, PAGE_BITS)
+            page = self.pages.get(page_no)
+            if page is None:
+                if not value:
+                    continue
+                page = self.pages[page_no] = bytearray(self.PAGE_BYTES)
+            index, bit = divmod(bit_index, 8)
+            old = bool(page[index] >> bit & 1)
+            if old != value:
+                page[index] ^= 1 << bit
+                changes.append((address + offset, old, value))
+        return changes
+
+    def clone(self):
+        return _SparseBitTable(self.size, {n: bytearray(page) for n, page in self.pages.items()})
+
+
+class RegisterStore(DataBank):
+    """DataBank compacto para ModbusSlaveServer.
+
+    Holding e input registers viven en buffers de 16 bits y coils/discrete inputs
+    se guardan empaquetados, 8 por byte. Para 65536 direcciones ocupa ~272 KB
+    frente a los ~2 MB de las listas de DataBank. Con `sparse=True` solo se
+    reservan los bloques que contienen valores distintos de 0, lo que permite
+    simular cientos de dispositivos en un proceso.
+    Mantiene la API de DataBank para que ModbusServer lo use sin cambios.
+
+    Cada escritura que modifica valores notifica a los suscriptores con
+    `callback(tabla, dirección, cantidad)`, desde el hilo que escribió.
+    """
+
+    def __init__(self, size=0x10000, sparse=False, _tables=None):
+        # virtual_mode evita que DataBank reserve sus propias listas
+        super().__init__(virtual_mode=True)
+        self.size = size
+        self.sparse = sparse
+        self.coils_size = self.d_inputs_size = self.h_regs_size = self.i_regs_size = size
+        if _tables is None:
+            word_cls, bit_cls = (_SparseWordTable, _SparseBitTable) if sparse else (_WordTable, _BitTable)
+            _tables = {COILS: bit_cls(size), DISCRETE_INPUTS: bit_cls(size),
+                       HOLDING_REGISTERS: word_cls(size), INPUT_REGISTERS: word_cls(size)}
+        self._tables = _tables
+        self._subscribers = ()
+
+    def __repr__(self):
+        return f"RegisterStore(size={self.size}, sparse={self.sparse})"
+
+    def clone(self):
+        """Copia independiente de los valores (sin suscriptores); útil como plantilla de dispositivo."""
+        tables = {name: table.clone() for name, table in self._tables.items()}
+        return RegisterStore(self.size, self.sparse, _tables=tables)
+
+    def restore(self, other):
+        """Adopta las tablas de `other` (mismo tamaño) y notifica el espacio completo a los suscriptores."""
+        if other.size != self.size:
+            raise ValueError(f"Store size mismatch: {other.size} != {self.size}")
+        for name, table in other._tables.items():
+            self._tables[name] = table
+        self.sparse = other.sparse
+        if self._subscribers:
+            for name in self._tables:
+                self._notify(name, 0, self.size)
+
+    @property
+    def nbytes(self):
+        """Memoria reservada por los valores de las cuatro tablas."""
+        return sum(table.nbytes for table in self._tables.values())
+
+    def _in_range(self, address, number):
+        return address >= 0 and number >= 0 and address + number <= self.size
+
+    # ------------------------------------------------
+    # Notificación de cambios
+    # ------------------------------------------------
+    def subscribe(self, callback):
+        """Registra `callback(tabla, dirección, cantidad)` para cada rango modificado."""
+        self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = tuple(cb for cb in self._subscribers if cb is not callback)
+
+    def _notify(self, table, address, number):
+        for callback in self._subscribers:
+            try:
+                callback(table, address, number)
+            except Exception as e:
+                log(f"Change subscriber error: {e}")
+
+    # ------------------------------------------------
+    # Registros de 16 bits
+    # ------------------------------------------------
+    def _get_words(self, name, address, number):
+        table = self._tables[name]
+        with table.lock:
+            if self._in_range(address, number):
+                return table.read(address, number).tolist()
+        return None
+
+    def _set_words(self, name, address, word_list, notify=None):
+        words = array("H", [int(w) & 0xFFFF for w in word_list])
+        return self._write_words(name, address, words, notify)
+
+    def write_words(self, table, address, words):
+        """Escritura en bloque de un array('H') (o buffer de uint16) sin conversión por registro."""
+        if not isinstance(words, array):
+            words = array("H", memoryview(words).cast("B").cast("H"))
+        return self._write_words(table, address, words)
+
+    def _write_words(self, name, address, words, notify=None):
+        table = self._tables[name]
+        changes = []
+        with table.lock:
+            if not self._in_range(address, len(words)):
+                return None
+            if notify:
+                old = table.read(address, len(words))
+                changes = [(address + i, o, n) for i, (o, n) in enumerate(zip(old, words)) if o != n]
+            changed = table.write(address, words)
+        # Notificación tras la actualización atómica, como DataBank
+        if notify:
+            for c_address, from_value, to_value in changes:
+                notify(c_address, from_value, to_value)
+        if changed and self._subscribers:
+            self._notify(name, address, len(words))
+        return True
+
+    def _words_to_bytes(self, name, address, number):
+        table = self._tables[name]
+        with table.lock:
+            if not self._in_range(address, number):
+                return None
+            words = table.read(address, number)
+        if not _BIG_ENDIAN_HOST:
+            words.byteswap()
+        return words.tobytes()
+
+    def _view_words(self, name, address, number):
+        if not self._in_range(address, number):
+            return None
+        return self._tables[name].view(address, number)
+
+    def get_holding_registers(self, address, number=1, srv_info=None):
+        return self._get_words(HOLDING_REGISTERS, address, number)
+
+    def set_holding_registers(self, address, word_list, srv_info=None):
+        notify = None
+        if srv_info and type(self).on_holding_registers_change is not DataBank.on_holding_registers_change:
+            notify = lambda a, f, t: self.on_holding_registers_change(a, f, t, srv_info=srv_info)
+        return self._set_words(HOLDING_REGISTERS, address, word_list, notify)
+
+    def get_input_registers(self, address, number=1, srv_info=None):
+        return self._get_words(INPUT_REGISTERS, address, number)
+
+    def set_input_registers(self, address, word_list):
+        return self._set_words(INPUT_REGISTERS, address, word_list)
+
+    def view_holding_registers(self, address, number):
+        """Vista de solo lectura de un rango de holding registers (sin copia si el store es denso)."""
+        return self._view_words(HOLDING_REGISTERS, address, number)
+
+    def view_input_registers(self, address, number):
+        """Vista de solo lectura de un rango de input registers (sin copia si el store es denso)."""
+        return self._view_words(INPUT_REGISTERS, address, number)
+
+    def get_holding_registers_bytes(self, address, number):
+        """Holding registers en big-endian, listos para la trama Modbus."""
+        return self._words_to_bytes(HOLDING_REGISTERS, address, number)
+
+    def get_input_registers_bytes(self, address, number):
+        """Input registers en big-endian, listos para la trama Modbus."""
+        return self._words_to_bytes(INPUT_REGISTERS, address, number)
+
+    # ------------------------------------------------
+    # Bits empaquetados (coils / discrete inputs)
+    # ------------------------------------------------
+    def _get_packed(self, name, address, number):
+        table = self._tables[name]
+        with table.lock:
+            if not self._in_range(address, number):
+                return None
+            first, shift = divmod(address, 8)
+            chunk = table.read_bytes(first, (address + number + 7) // 8)
+        value = int.from_bytes(chunk, "little") >> shift
+        value &= (1 << number) - 1
+        return value.to_bytes((number + 7) // 8, "little")
+
+    def _get_bits(self, name, address, number):
+        packed = self._get_packed(name, address, number)
+        if packed is None:
+            return None
+        bits = []
+        for byte in packed:
+            bits.extend(BYTE_BITS[byte])
+        del bits[number:]
+        return bits
+
+    def _set_bits(self, name, address, bit_list, notify=None):
+        bit_list = [bool(b) for b in bit_list]
+        table = self._tables[name]
+        with table.lock:
+            if not self._in_range(address, len(bit_list)):
+                return None
+            changes = table.write_bits(address, bit_list)
+        if notify:
+            for c_address, from_value, to_value in changes:
+                notify(c_address, from_value, to_value)
+        if changes and self._subscribers:
+            self._notify(name, address, len(bit_list))
+        return True
+
+    def _set_packed(self, name, address, data, count):
+        table = self._tables[name]
+        with table.lock:
+            if not self._in_range(address, count):
+                return None
+            changed = table.write_packed(address, data, count)
+        if changed and self._subscribers:
+            self._notify(name, address, count)
+        return True
+
+    def get_coils(self, address, number=1, srv_info=None):
+        return self._get_bits(COILS, address, number)
+
+    def set_coils(self, address, bit_list, srv_info=None):
+        notify = None
+        if srv_info and type(self).on_coils_change is not DataBank.on_coils_change:
+            notify = lambda a, f, t: self.on_coils_change(a, f, t, srv_info)
+        return self._set_bits(COILS, address, bit_list, notify)
+
+    def get_discrete_inputs(self, address, number=1, srv_info=None):
+        return self._get_bits(DISCRETE_INPUTS, address, number)
+
+    def set_discrete_inputs(self, address, bit_list):
+        return self._set_bits(DISCRETE_INPUTS, address, bit_list)
+
+    def get_coils_packed(self, address, number):
+        """Coils empaquetados en bytes (LSB primero), formato de la trama Modbus."""
+        return self._get_packed(COILS, address, number)
+
+    def get_discrete_inputs_packed(self, address, number):
+        """Discrete inputs empaquetados en bytes (LSB primero), formato de la trama Modbus."""
+        return self._get_packed(DISCRETE_INPUTS, address, number)
+
+    def set_coils_packed(self, address, data, count):
+        """Escribe `count` coils desde bytes empaquetados (LSB primero), como llegan en FC15."""
+        return self._set_packed(COILS, address, data, count)
+
+    def set_discrete_inputs_packed(self, address, data, count):
+        return self._set_packed(DISCRETE_INPUTS, address, data, count)
+
+    def set_values_packed(self, table, address, bits):
+        """Escribe un PackedBits en coils o discrete inputs; None si el rango no es válido."""
+        return self._set_packed(table, address, bits.tobytes(), len(bits))
+
+    # ------------------------------------------------
+    # Acceso genérico por tabla
+    # ------------------------------------------------
+    def get_values(self, table, address, number):
+        """Valores de cualquiera de las cuatro tablas (bool para coils/discrete inputs)."""
+        if table in BIT_TABLES:
+            return self._get_bits(table, address, number)
+        return self._get_words(table, address, number)
+
+    def set_values(self, table, address, values):
+        """Escribe en cualquiera de las cuatro tablas; None si el rango no es válido."""
+        if table in BIT_TABLES:
+            return self._set_bits(table, address, values)
+        return self._set_words(table, address, values)
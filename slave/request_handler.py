@@ -0,0 +1,100 @@
+import struct
+from shared.protocol import (
+    READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS,
+    WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS,
+    EXP_ILLEGAL_FUNCTION, EXP_DATA_ADDRESS, EXP_DATA_VALUE,
+)
+
+_ADDR_COUNT = struct.Struct(">HH")
+_FC_ADDR_COUNT = struct.Struct(">BHH")
+
+
+def exception_pdu(func_code, exp_code):
+    return bytes((func_code | 0x80, exp_code))
+
+
+def _read_bits(store, func_code, pdu):
+    address, count = _ADDR_COUNT.unpack_from(pdu, 1)
+    if not 1 <= count <= 2000:
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    if func_code == READ_COILS:
+        packed = store.get_coils_packed(address, count)
+    else:
+        packed = store.get_discrete_inputs_packed(address, count)
+    if packed is None:
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return bytes((func_code, len(packed))) + packed
+
+
+def _read_words(store, func_code, pdu):
+    address, count = _ADDR_COUNT.unpack_from(pdu, 1)
+    if not 1 <= count <= 125:
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    if func_code == READ_HOLDING_REGISTERS:
+        data = store.get_holding_registers_bytes(address, count)
+    else:
+        data = store.get_input_registers_bytes(address, count)
+    if data is None:
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return bytes((func_code, len(data))) + data
+
+
+def _write_single_coil(store, func_code, pdu):
+    address, value = _ADDR_COUNT.unpack_from(pdu, 1)
+    if value not in (0x0000, 0xFF00):
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    if not store.set_coils(address, [value == 0xFF00]):
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return pdu[:5]
+
+
+def _write_single_register(store, func_code, pdu):
+    address, value = _ADDR_COUNT.unpack_from(pdu, 1)
+    if not store.set_holding_registers(address, [value]):
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return pdu[:5]
+
+
+def _write_multiple_coils(store, func_code, pdu):
+    address, count = _ADDR_COUNT.unpack_from(pdu, 1)
+    byte_count = pdu[5]
+    if not 1 <= count <= 1968 or byte_count != (count + 7) // 8 or len(pdu) < 6 + byte_count:
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    # Los bits ya vienen empaquetados como los guarda el RegisterStore
+    if not store.set_coils_packed(address, pdu[6:6 + byte_count], count):
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return pdu[:5]
+
+
+def _write_multiple_registers(store, func_code, pdu):
+    address, count = _ADDR_COUNT.unpack_from(pdu, 1)
+    byte_count = pdu[5]
+    if not 1 <= count <= 123 or byte_count != count * 2 or len(pdu) < 6 + byte_count:
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    values = struct.unpack_from(f">{count}H", pdu, 6)
+    if not store.set_holding_registers(address, values):
+        return exception_pdu(func_code, EXP_DATA_ADDRESS)
+    return pdu[:5]
+
+
+_HANDLERS = {
+    READ_COILS: _read_bits,
+    READ_DISCRETE_INPUTS: _read_bits,
+    READ_HOLDING_REGISTERS: _read_words,
+    READ_INPUT_REGISTERS: _read_words,
+    WRITE_SINGLE_COIL: _write_single_coil,
+    WRITE_SINGLE_REGISTER: _write_single_register,
+    WRITE_MULTIPLE_COILS: _write_multiple_coils,
+    WRITE_MULTIPLE_REGISTERS: _write_multiple_registers,
+}
+
+
+def process_pdu(store, pdu):
+    """Procesa un PDU de petición contra un RegisterStore y devuelve el PDU de respuesta."""
+    func_code = pdu[0]
+    handler = _HANDLERS.get(func_code)
+    if handler is None:
+        return exception_pdu(func_code, EXP_ILLEGAL_FUNCTION)
+    if len(pdu) < 5 or (func_code in (WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS) and len(pdu) < 6):
+        return exception_pdu(func_code, EXP_DATA_VALUE)
+    return handler(store, func_code, pdu)
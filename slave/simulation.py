@@ -0,0 +1,314 @@
+import bisect
+import csv
+import math
+import random
+import threading
+import time
+from array import array
+from shared.utils import log, WARNING
+from slave.register_store import HOLDING_REGISTERS, INPUT_REGISTERS
+
+try:
+    import numpy as np
+except ImportError:     # NumPy es opcional: sin él se usan tablas array('H') precalculadas
+    np = None
+
+MAX_RATE = 100.0
+# Sin NumPy: muestras mínimas por periodo de las formas de onda precalculadas
+TABLE_SIZE = 4096
+# Sin NumPy: separación (en ticks) entre registros que recorren el mismo paseo aleatorio
+WALK_STRIDE = 61
+MAX_WALK_SIZE = 1 << 20
+
+
+def _to_words(values):
+    """Valores (float, NumPy) -> bloque uint16 redondeado y recortado a 0–65535."""
+    return np.clip(np.rint(values), 0, 0xFFFF).astype(np.uint16)
+
+
+def _word(value):
+    return 0 if value < 0 else 0xFFFF if value > 0xFFFF else int(round(value))
+
+
+def _phases(count, spread):
+    """Desfase de cada registro del bloque (fracción de periodo)."""
+    return np.arange(count) / count if spread else np.zeros(count)
+
+
+class _WaveTable:
+    """Un periodo de una forma de onda precalculado en uint16 (sin NumPy).
+
+    La tabla tiene un múltiplo de `count` muestras: con `spread` el registro i
+    va desfasado i/count de periodo, de modo que el bloque de cada tick es un
+    slice con paso de la tabla duplicada (se copia en C, sin bucle por registro).
+    """
+
+    def __init__(self, waveform, count, spread):
+        self.count = count
+        self.spread = spread
+        self.stride = -(-TABLE_SIZE // count) if spread else 1
+        self.size = count * self.stride if spread else TABLE_SIZE
+        self._table = array("H", [_word(waveform(k / self.size)) for k in range(self.size)]) * 2
+
+    def block(self, phase):
+        """Bloque para la fase `phase` (periodos transcurridos)."""
+        start = int((phase % 1.0) * self.size + 0.5) % self.size
+        if not self.spread:
+            return self._table[start:start + 1] * self.count
+        return self._table[start:start + self.size:self.stride]
+
+
+# ------------------------------------------------
+# Generadores
+# ------------------------------------------------
+class Generator:
+    """Genera los valores de un bloque contiguo de registros en cada tick."""
+
+    def __init__(self, address, count=1, table=HOLDING_REGISTERS):
+        if count < 1:
+            raise ValueError("Generator count must be >= 1")
+        self.address = address
+        self.count = count
+        self.table = table
+
+    def values(self, t):
+        """Devuelve el bloque (uint16) para el instante `t` en segundos."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.table}, {self.address}, count={self.count})"
+
+
+class Ramp(Generator):
+    """Diente de sierra de `low` a `high` cada `period` segundos (desfasado por registro si `spread`)."""
+
+    def __init__(self, address, count=1, low=0, high=0xFFFF, period=10.0, spread=True, table=HOLDING_REGISTERS):
+        super().__init__(address, count, table)
+        self.low, self.span, self.period = low, high - low, period
+        if np is not None:
+            self._phase = _phases(count, spread)
+        else:
+            self._table = _WaveTable(lambda x: low + self.span * x, count, spread)
+
+    def values(self, t):
+        base = t / self.period
+        if np is not None:
+            return _to_words(self.low + self.span * ((base + self._phase) % 1.0))
+        return self._table.block(base)
+
+
+class Sine(Generator):
+    """Senoidal `offset ± amplitude` con periodo `period` segundos."""
+
+    def __init__(self, address, count=1, amplitude=1000, offset=0x8000, period=10.0, spread=True,
+                 table=HOLDING_REGISTERS):
+        super().__init__(address, count, table)
+        self.amplitude, self.offset, self.period = amplitude, offset, period
+        if np is not None:
+            self._phase = _phases(count, spread)
+        else:
+            self._table = _WaveTable(lambda x: offset + amplitude * math.sin(2 * math.pi * x), count, spread)
+
+    def values(self, t):
+        base = t / self.period
+        if np is not None:
+            return _to_words(self.offset + self.amplitude * np.sin(2 * np.pi * (base + self._phase)))
+        return self._table.block(base)
+
+
+class RandomWalk(Generator):
+    """Paseo aleatorio por registro, con paso máximo `step` y límites `low`/`high`.
+
+    Con NumPy cada registro es independiente. Sin NumPy se precalcula un único
+    paseo (ida y vuelta, para que el bucle no salte) y cada registro lo recorre
+    desfasado WALK_STRIDE ticks: el bloque de cada tick es un slice con paso.
+    """
+
+    def __init__(self, address, count=1, step=10, low=0, high=0xFFFF, start=None, seed=None,
+                 table=HOLDING_REGISTERS):
+        super().__init__(address, count, table)
+        self.step, self.low, self.high = step, low, high
+        start = (low + high) / 2 if start is None else start
+        if np is not None:
+            self._rng = np.random.default_rng(seed)
+            self._state = np.full(count, float(start))
+            return
+        rng = random.Random(seed)
+        self._stride = max(1, min(WALK_STRIDE, MAX_WALK_SIZE // count))
+        size = max(TABLE_SIZE, count * self._stride)
+        walk = array("H", bytes(2 * size))
+        value = float(start)
+        for k in range(size):
+            value = min(max(value + rng.uniform(-step, step), low), high)
+            walk[k] = _word(value)
+        walk.extend(reversed(walk))
+        self._size = len(walk)
+        self._walk = walk * 2
+        self._tick = 0
+
+    def values(self, t):
+        if np is not None:
+            self._state = np.clip(self._state + self._rng.uniform(-self.step, self.step, self.count),
+                                  self.low, self.high)
+            return _to_words(self._state)
+        start = self._tick
+        self._tick = (start + 1) % self._size
+        return self._walk[start:start + self.count * self._stride:self._stride]
+
+
+class Counter(Generator):
+    """Contador que avanza `step` en cada tick (módulo 65536), igual en todo el bloque."""
+
+    def __init__(self, address, count=1, step=1, start=0, table=HOLDING_REGISTERS):
+        super().__init__(address, count, table)
+        self.step = step
+        self._value = start
+
+    def values(self, t):
+        self._value = (self._value + self.step) & 0xFFFF
+        return array("H", (self._value,)) * self.count
+
+
+class StepProfile(Generator):
+    """Perfil escalonado leído de un CSV `tiempo,valor[,valor...]` (se repite si `loop`).
+
+    Cada fila fija los valores desde su instante hasta la siguiente; si tiene
+    menos valores que registros el bloque, se repiten cíclicamente.
+    """
+
+    def __init__(self, address, count, path, loop=True, table=HOLDING_REGISTERS):
+        super().__init__(address, count, table)
+        self.path = path
+        self.loop = loop
+        self._times = []
+        self._rows = []
+        with open(path, newline="") as f:
+            for line_no, row in enumerate(csv.reader(f), 1):
+                if not row or row[0].strip().startswith("#"):
+                    continue
+                try:
+                    moment = float(row[0])
+                    numbers = [float(v) for v in row[1:] if v.strip()]
+                except ValueError:
+                    if line_no == 1:
+                        continue    # cabecera
+                    raise ValueError(f"Invalid profile row {line_no}: {row}")
+                # Sin recorte silencioso: enteros 0–65535
+                if not all(n.is_integer() and 0 <= n <= 0xFFFF for n in numbers):
+                    raise ValueError(f"Invalid profile row {line_no}: {row}")
+                values = [int(n) for n in numbers]
+                if not values:
+                    raise ValueError(f"Profile row {line_no} has no values")
+                # El bloque completo se precalcula: en cada tick solo se elige la fila
+                block = array("H", values) * (count // len(values) + 1)
+                self._times.append(moment)
+                self._rows.append(block[:count])
+        if not self._rows:
+            raise ValueError(f"Empty step profile: {path}")
+        self.duration = self._times[-1]
+
+    def values(self, t):
+        if self.loop and self.duration > 0:
+            t %= self.duration
+        index = bisect.bisect_right(self._times, t) - 1
+        return self._rows[max(index, 0)]
+
+
+# ------------------------------------------------
+# Motor
+# ------------------------------------------------
+class SimulationEngine:
+    """Actualiza periódicamente los registros de uno o varios RegisterStore.
+
+    En cada tick cada generador produce su bloque completo, que se escribe con
+    una sola llamada (`write_words`) y una sola notificación de cambio.
+    """
+
+    def __init__(self, store, rate=10.0):
+        self.store = store
+        self.rate = rate
+        self.generators = []    # (store, generador)
+        self.ticks = 0
+        self.overruns = 0
+        self.last_tick_time = 0.0
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, value):
+        if not 0 < value <= MAX_RATE:
+            raise ValueError(f"Simulation rate must be between 0 and {MAX_RATE:g} Hz")
+        self._rate = float(value)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add(self, generator, store=None):
+        """Añade un generador; por defecto escribe en el store del motor."""
+        target = self.store if store is None else store
+        if generator.table not in (HOLDING_REGISTERS, INPUT_REGISTERS):
+            raise ValueError(f"Generators only write holding or input registers: {generator!r}")
+        if generator.address < 0 or generator.address + generator.count > target.size:
+            raise ValueError(f"Generator out of range: {generator!r}")
+        with self._lock:
+            self.generators.append((target, generator))
+        return generator
+
+    def remove(self, generator):
+        with self._lock:
+            self.generators = [(s, g) for s, g in self.generators if g is not generator]
+
+    def clear(self):
+        with self._lock:
+            self.generators = []
+
+    def tick(self, t):
+        """Calcula y escribe todos los generadores para el instante `t`."""
+        with self._lock:
+            generators = list(self.generators)
+        for store, generator in generators:
+            store.write_words(generator.table, generator.address, generator.values(t))
+        self.ticks += 1
+
+    # ------------------------------------------------
+    # Hilo de simulación
+    # ------------------------------------------------
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        log(f"Simulation started: {len(self.generators)} generators at {self.rate:g} Hz "
+            f"({'numpy' if np is not None else 'array'} backend).")
+
+    def stop(self):
+        if self.running:
+            self._stop_event.set()
+            self._thread.join(timeout=5)
+            log("Simulation stopped.")
+
+    def _run(self):
+        started = time.monotonic()
+        next_tick = started
+        while not self._stop_event.is_set():
+            tick_start = time.monotonic()
+            try:
+                self.tick(tick_start - started)
+            except Exception as e:
+                log("Simulation error: %s", e, level=WARNING)
+            self.last_tick_time = time.monotonic() - tick_start
+            next_tick += 1.0 / self._rate
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Tick vencido: no acumular atraso
+                self.overruns += 1
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
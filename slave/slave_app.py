@@ -1,18 +1,24 @@
 import sys
 import re
+import threading
 from datetime import datetime
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton,
-    QTableWidget, QTableWidgetItem, QLineEdit, QHBoxLayout,
-    QMessageBox, QTextEdit, QFrame
+    QLineEdit, QHBoxLayout, QMessageBox, QTextEdit, QFrame, QFileDialog, QComboBox
 )
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import Signal
 from slave.modbus_slave import ModbusSlaveServer
+from slave.register_store import BIT_TABLES, HOLDING_REGISTERS
+from shared.register_table import RegisterTableModel, RegisterTableView, TABLE_CHOICES
+from shared.utils import LOG_MAX_LINES
 
 
 class SlaveApp(QWidget):
     """Servidor Modbus TCP con IP configurable, LED de estado y panel de mensajes."""
 
+    # Emitida desde los hilos del servidor cuando hay registros modificados pendientes
+    registers_changed = Signal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Modbus Hub - Slave Server")
@@ -20,16 +26,21 @@ class SlaveApp(QWidget):
 
         # Servidor
         self.server = None
-        self.start_addr = 0
-        self.quantity = 10
 
         # Campos de configuración
         self.ip_input = QLineEdit("0.0.0.0")
         self.port_input = QLineEdit("502")
         self.start_input = QLineEdit("0")
-        self.qty_input = QLineEdit("10")
+        # Tabla mostrada y editable (las cuatro tablas del RegisterStore)
+        self.table_select = QComboBox()
+        for table, label in TABLE_CHOICES:
+            self.table_select.addItem(label, table)
+        self.current_table = HOLDING_REGISTERS
 
         self.start_button = QPushButton("Start Server")
+        self.save_button = QPushButton("Save Snapshot")
+        self.load_button = QPushButton("Load Snapshot")
+        self.import_button = QPushButton("Import CSV")
 
         # LED indicador
         self.status_label = QLabel("Status: Stopped")
@@ -42,22 +53,30 @@ class SlaveApp(QWidget):
         status_layout.addWidget(self.status_led)
         status_layout.addStretch()
 
-        # Tabla
-        self.table = QTableWidget()
-        self.refresh_table_layout()
+        # Tabla virtual (0–65535), editable mientras el servidor está activo
+        self.model = RegisterTableModel()
+        self.table = RegisterTableView(self.model)
 
         # Cuadro de mensajes
         self.log_box = QTextEdit()
         self.log_box.setReadOnly(True)
+        # Registro acotado: las líneas más antiguas se descartan
+        self.log_box.document().setMaximumBlockCount(LOG_MAX_LINES)
         self.log_box.setMinimumHeight(120)
         self.log_box.setStyleSheet("background-color: #111; color: #0f0; font-family: monospace;")
 
         # Layout de rango
         range_layout = QHBoxLayout()
-        range_layout.addWidget(QLabel("Start:"))
+        range_layout.addWidget(QLabel("Table:"))
+        range_layout.addWidget(self.table_select)
+        range_layout.addWidget(QLabel("Go to address:"))
         range_layout.addWidget(self.start_input)
-        range_layout.addWidget(QLabel("Quantity:"))
-        range_layout.addWidget(self.qty_input)
+
+        # Layout de snapshots
+        snapshot_layout = QHBoxLayout()
+        snapshot_layout.addWidget(self.save_button)
+        snapshot_layout.addWidget(self.load_button)
+        snapshot_layout.addWidget(self.import_button)
 
         # Layout principal
         layout = QVBoxLayout()
@@ -67,6 +86,7 @@ class SlaveApp(QWidget):
         layout.addWidget(self.port_input)
         layout.addLayout(range_layout)
         layout.addWidget(self.start_button)
+        layout.addLayout(snapshot_layout)
         layout.addLayout(status_layout)
         layout.addWidget(self.table)
         layout.addWidget(QLabel("Messages:"))
@@ -75,18 +95,18 @@ class SlaveApp(QWidget):
 
         # Conexiones
         self.start_button.clicked.connect(self.toggle_server)
-        self.table.cellChanged.connect(self.handle_cell_change)
+        self.model.value_edited.connect(self.handle_value_edit)
+        self.model.edit_rejected.connect(self.reject_edit)
         self.start_input.editingFinished.connect(self.update_range)
-        self.qty_input.editingFinished.connect(self.update_range)
-        self.table.cellClicked.connect(self.pause_refresh)
+        self.table_select.currentIndexChanged.connect(self.change_table)
+        self.save_button.clicked.connect(self.save_snapshot)
+        self.load_button.clicked.connect(self.load_snapshot)
+        self.import_button.clicked.connect(self.import_csv)
+        self.registers_changed.connect(self.apply_changes)
 
-        # Timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.refresh_table)
-        self.timer.start(1000)
-
-        self._updating = False
-        self._editing = False
+        # Rango modificado pendiente de pintar (se amplía hasta que la GUI lo procesa)
+        self._dirty_lock = threading.Lock()
+        self._dirty = None
 
     # ------------------------------------------------
     # Logging interno
@@ -113,44 +133,31 @@ class SlaveApp(QWidget):
     def update_range(self):
         try:
             start = int(self.start_input.text())
-            qty = int(self.qty_input.text())
-            if start < 0 or start >= 65536 or qty < 1 or qty > 125:
+            if start < 0 or start >= 65536:
                 raise ValueError
-            if start + qty > 65536:
-                qty = 65536 - start
-            self.start_addr = start
-            self.quantity = qty
-            self.refresh_table_layout()
-            self.log(f"Range updated: start={start}, qty={qty}")
+            self.table.scroll_to_address(start)
+            self.log(f"Showing registers from {start}")
         except ValueError:
             QMessageBox.warning(self, "Invalid Input", "Please enter valid numeric values.")
 
-    def refresh_table_layout(self):
-        """Reconstruye la tabla de registros."""
-        self._updating = True
-        cols_needed = ((self.quantity - 1) // 10 + 1) * 2
-        self.table.setColumnCount(cols_needed)
-        self.table.setRowCount(10)
-        headers = []
-        for i in range(0, cols_needed, 2):
-            block = i // 2
-            headers.extend([f"Address {block+1}", f"Value {block+1}"])
-        self.table.setHorizontalHeaderLabels(headers)
-
+    def reload_table(self):
+        """Sincroniza el modelo con la tabla del RegisterStore (solo cambian las celdas distintas)."""
         if self.server:
-            values = self.server.read_window(self.start_addr, self.quantity)
-        else:
-            values = [0] * self.quantity
+            self.model.update_values(0, self._table_values(0, self.model.size))
+
+    def _table_values(self, start, count):
+        databank = self.server.databank
+        if self.current_table == HOLDING_REGISTERS:
+            # Vista sin copia del buffer de registros
+            return databank.view_holding_registers(start, count)
+        return databank.get_values(self.current_table, start, count)
 
-        for i in range(self.quantity):
-            addr = self.start_addr + i
-            col_block = (i // 10) * 2
-            row = i % 10
-            self.table.setItem(row, col_block, QTableWidgetItem(str(addr)))
-            val_item = QTableWidgetItem(str(values[i]))
-            val_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, col_block + 1, val_item)
-        self._updating = False
+    def change_table(self):
+        self.current_table = self.table_select.currentData()
+        with self._dirty_lock:
+            self._dirty = None
+        self.model.clear(1 if self.current_table in BIT_TABLES else 65535)
+        self.reload_table()
 
     # ------------------------------------------------
     # LED indicador
@@ -176,58 +183,103 @@ class SlaveApp(QWidget):
                 return
 
             self.server = ModbusSlaveServer(host=ip, port=port)
+            self.server.subscribe(self.on_registers_changed)
             self.server.start()
             self.status_label.setText("Status: Running")
             self.set_led("green")
             self.start_button.setText("Stop Server")
-            self.refresh_table_layout()
+            self.model.editable = True
+            self.reload_table()
             self.log(f"Server started at {ip}:{port}.")
         else:
             self.server.stop()
+            self.server.unsubscribe(self.on_registers_changed)
             self.status_label.setText("Status: Stopped")
             self.set_led("red")
             self.start_button.setText("Start Server")
-            self.refresh_table_layout()
+            self.model.editable = False
             self.log("Server stopped.")
 
     # ------------------------------------------------
-    # Actualización periódica
+    # Actualización por eventos
     # ------------------------------------------------
-    def refresh_table(self):
-        if not self.server or not getattr(self.server, "running", False) or self._editing:
+    def on_registers_changed(self, table, address, count):
+        """Llamada desde el hilo del servidor: acumula el rango y avisa una sola vez a la GUI."""
+        if table != self.current_table:
+            return
+        with self._dirty_lock:
+            if self._dirty is not None:
+                lo, hi = self._dirty
+                self._dirty = (min(lo, address), max(hi, address + count))
+                return
+            self._dirty = (address, address + count)
+        self.registers_changed.emit()
+
+    def apply_changes(self):
+        """Pasa al modelo el rango modificado; la vista solo repinta las celdas que cambiaron."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, None
+        if dirty is None or not self.server:
             return
-        self._updating = True
-        values = self.server.read_window(self.start_addr, self.quantity)
-        for i in range(self.quantity):
-            col_block = (i // 10) * 2
-            row = i % 10
-            val_item = QTableWidgetItem(str(values[i]))
-            val_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, col_block + 1, val_item)
-        self._updating = False
+        start, end = dirty
+        self.model.update_values(start, self._table_values(start, end - start))
 
     # ------------------------------------------------
-    # Edición manual
+    # Snapshots
     # ------------------------------------------------
-    def pause_refresh(self):
-        self._editing = True
-        self.timer.stop()
+    def _require_running(self):
+        if not self.server or not getattr(self.server, "running", False):
+            QMessageBox.warning(self, "Server Stopped", "Start the server first.")
+            return False
+        return True
 
-    def handle_cell_change(self, row, column):
-        if self._updating or not self.server or not getattr(self.server, "running", False):
+    def save_snapshot(self):
+        if not self._require_running():
             return
-        if column % 2 == 1:
-            try:
-                new_value = int(self.table.item(row, column).text())
-                if new_value < 0 or new_value > 65535:
-                    raise ValueError
-                addr = self.start_addr + (column // 2) * 10 + row
-                self.server.update_register(addr, new_value)
-                self.log(f"Register {addr} updated -> {new_value}")
-            except ValueError:
-                QMessageBox.warning(self, "Invalid Value", "Register value must be between 0–65535.")
-        self._editing = False
-        self.timer.start(1000)
+        path, _ = QFileDialog.getSaveFileName(self, "Save Snapshot", "registers.snap", "Snapshots (*.snap)")
+        if not path:
+            return
+        try:
+            self.server.save_snapshot(path)
+            self.log(f"Snapshot saved to {path}")
+        except OSError as e:
+            QMessageBox.warning(self, "Snapshot Error", str(e))
+
+    def load_snapshot(self):
+        if not self._require_running():
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Load Snapshot", "", "Snapshots (*.snap)")
+        if not path:
+            return
+        try:
+            self.server.load_snapshot(path)
+            self.log(f"Snapshot loaded from {path}")
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Snapshot Error", str(e))
+
+    def import_csv(self):
+        if not self._require_running():
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import CSV", "", "CSV files (*.csv)")
+        if not path:
+            return
+        try:
+            count = self.server.import_csv(path)
+            self.log(f"Imported {count} values from {path}")
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import Error", str(e))
+
+    # ------------------------------------------------
+    # Edición manual
+    # ------------------------------------------------
+    def handle_value_edit(self, addr, new_value):
+        if not self.server or not getattr(self.server, "running", False):
+            return
+        self.server.update_register(addr, new_value, self.current_table)
+        self.log(f"{self.table_select.currentText()} {addr} updated -> {new_value}")
+
+    def reject_edit(self, message):
+        QMessageBox.warning(self, "Invalid Value", message)
 
 
 if __name__ == "__main__":
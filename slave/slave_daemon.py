@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+import tomllib
+from array import array
+from shared.bits import PackedBits
+from shared.protocol import BIT_TABLES
+from shared.utils import log, WARNING
+from slave.device_profile import DeviceProfile
+from slave.modbus_slave import ModbusSlaveServer, stop_servers
+from slave.register_store import RegisterStore
+from slave.simulation import SimulationEngine, Ramp, Sine, RandomWalk, Counter, StepProfile
+from slave.snapshot import TABLE_ALIASES, import_csv
+
+try:
+    import resource
+except ImportError:     # Windows: sin getrusage, el arranque no informa de la memoria
+    resource = None
+
+GENERATORS = {
+    "ramp": Ramp, "sine": Sine, "random_walk": RandomWalk, "counter": Counter, "step_profile": StepProfile,
+}
+
+
+# ------------------------------------------------
+# Configuración
+# ------------------------------------------------
+def load_config(path):
+    """Lee la configuración del demonio (.toml o .json).
+
+    {"engine": "async", "drain_timeout": 5,
+     "servers": [{"host": "0.0.0.0", "port": 1502,
+                  "devices": [{"unit_id": 1, "registers": "mapa.csv",
+                               "values": {"holding_registers": {"100": [1, 2, 3]}},
+                               "simulation": [{"type": "sine", "address": 0, "count": 10, "period": 5}]}]},
+                 {"ports": [2000, 2099], "devices": [{"unit_ids": [1, 10], "registers": "mapa.csv"}]}]}
+
+    `ports` y `unit_ids` son rangos inclusivos: el dispositivo se replica en cada
+    combinación (copias de un mismo RegisterStore disperso). Sin `devices`, el
+    servidor responde a cualquier unit ID con su databank (mismas claves
+    `registers`/`values`/`simulation`). Las rutas son relativas al fichero.
+
+    `profile` (en un servidor o en un dispositivo) emula los tiempos del equipo
+    real con las opciones de DeviceProfile, p. ej. {"latency": 0.02,
+    "jitter": 0.005, "distribution": "normal", "max_rate": 50,
+    "baud_rate": 19200, "max_connections": 4}; cada réplica tiene el suyo.
+    """
+    with open(path, "rb") as f:
+        config = tomllib.load(f) if path.endswith(".toml") else json.load(f)
+    config["base_dir"] = os.path.dirname(os.path.abspath(path))
+    return config
+
+
+def _range(spec, single, plural):
+    if plural in spec:
+        first, last = spec[plural]
+        return range(first, last + 1)
+    return range(spec[single], spec[single] + 1) if single in spec else None
+
+
+def _table(name):
+    try:
+        return TABLE_ALIASES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown table: {name}")
+
+
+class _DeviceSpec:
+    """Mapa de registros de un dispositivo: se construye una vez y se copia por cada réplica."""
+
+    def __init__(self, spec, base_dir):
+        self.template = RegisterStore(sparse=True)
+        if "registers" in spec:
+            import_csv(os.path.join(base_dir, spec["registers"]), self.template)
+        for table, blocks in spec.get("values", {}).items():
+            for address, values in blocks.items():
+                self._write_values(table, address, values if isinstance(values, list) else [values])
+        self.generators = []
+        for generator in spec.get("simulation", []):
+            options = dict(generator)
+            kind = options.pop("type", None)
+            if kind not in GENERATORS:
+                raise ValueError(f"Unknown generator type: {kind}")
+            if "table" in options:
+                options["table"] = _table(options["table"])
+            if "path" in options:
+                options["path"] = os.path.join(base_dir, options["path"])
+            self.generators.append((GENERATORS[kind], options))
+        self.profile = spec.get("profile")
+        # Se valida al leer la configuración
+        self.build_profile()
+
+    def _write_values(self, table_name, address, values):
+        """Escribe un bloque de `values`; ValueError con la entrada si no cabe o un valor no es válido."""
+        entry = f"values.{table_name}.{address}"
+        table = _table(table_name)
+        try:
+            start = int(address, 0)
+            if table in BIT_TABLES:
+                if any(value not in (0, 1) for value in values):
+                    raise ValueError
+                ok = self.template.set_values_packed(table, start, PackedBits.from_bools(values))
+            else:
+                ok = self.template.write_words(table, start, array("H", values))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"Invalid value in {entry} (expected {'0/1' if table in BIT_TABLES else '0–65535'})")
+        if not ok:
+            raise ValueError(f"Block {entry} does not fit in 0–65535 ({len(values)} values)")
+
+    def build_profile(self):
+        return DeviceProfile.from_dict(self.profile) if self.profile else None
+
+    def build(self, simulation):
+        """Nueva réplica del dispositivo con sus propios generadores."""
+        store = self.template.clone()
+        for cls, options in self.generators:
+            simulation.add(cls(**options), store)
+        return store
+
+
+# ------------------------------------------------
+# Demonio
+# ------------------------------------------------
+class SlaveDaemon:
+    """Varios ModbusSlaveServer sin GUI construidos desde un fichero de configuración.
+
+    Todos los generadores de señales comparten un único SimulationEngine (un
+    hilo para todo el proceso). La parada deja de aceptar conexiones y espera
+    hasta `drain_timeout` segundos a que terminen las peticiones en curso.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.drain_timeout = config.get("drain_timeout", 5.0)
+        self.servers = []
+        self.devices = 0
+        self.simulation = SimulationEngine(None, config.get("simulation_rate", 10.0))
+        self._stop_event = threading.Event()
+        self._build()
+
+    def _build(self):
+        base_dir = self.config.get("base_dir", ".")
+        default_engine = self.config.get("engine", "async")
+        for spec in self.config.get("servers", []):
+            ports = _range(spec, "port", "ports")
+            if ports is None:
+                raise ValueError("Server entry needs 'port' or 'ports'")
+            devices = [(_range(device, "unit_id", "unit_ids"), _DeviceSpec(device, base_dir))
+                       for device in spec.get("devices", [])]
+            databank = None if devices else _DeviceSpec(spec, base_dir)
+            for port in ports:
+                store = databank.build(self.simulation) if databank else RegisterStore(sparse=True)
+                server = ModbusSlaveServer(spec.get("host", "127.0.0.1"), port,
+                                           engine=spec.get("engine", default_engine), store=store)
+                if "profile" in spec:
+                    server.set_profile(DeviceProfile.from_dict(spec["profile"]))
+                for unit_ids, device in devices:
+                    if unit_ids is None:
+                        raise ValueError("Device entry needs 'unit_id' or 'unit_ids'")
+                    for unit_id in unit_ids:
+                        server.add_device(unit_id, device.build(self.simulation), device.build_profile())
+                        self.devices += 1
+                if "snapshot" in spec:
+                    server.load_snapshot(os.path.join(base_dir, spec["snapshot"]))
+                self.servers.append(server)
+
+    def start(self):
+        """Arranca todos los servidores; devuelve False si alguno no pudo escuchar."""
+        started = time.perf_counter()
+        for server in self.servers:
+            server.start()
+        failed = [server for server in self.servers if not server.running]
+        if self.simulation.generators:
+            self.simulation.start()
+        memory = ""
+        if resource is not None:
+            memory = f" (RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB)"
+        log(f"Slave daemon started: {len(self.servers) - len(failed)} servers, {self.devices} devices "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms{memory}")
+        for server in failed:
+            log("Server %s:%d failed to start", server.server.host, server.server.port, level=WARNING)
+        return not failed
+
+    def stop(self, drain=None):
+        drain = self.drain_timeout if drain is None else drain
+        self.simulation.stop()
+        stop_servers([server for server in self.servers if server.running], drain)
+        log("Slave daemon stopped.")
+
+    def request_stop(self, *_args):
+        self._stop_event.set()
+
+    def run(self):
+        """Arranca y espera a SIGTERM/SIGINT; después detiene con drenaje."""
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        if not self.start():
+            self.stop(0)
+            return 1
+        while not self._stop_event.wait(3600):
+            pass
+        self.stop()
+        return 0
+
+    def stats(self):
+        return {f"{server.server.host}:{server.server.port}": {
+            "devices": len(server.devices), "requests": server.request_count, "connections": server.connections,
+        } for server in self.servers}
+
+
+# ------------------------------------------------
+# Punto de entrada
+# ------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Modbus TCP slave daemon")
+    parser.add_argument("config", help="daemon configuration (.toml or .json)")
+    parser.add_argument("--drain", type=float, help="seconds to drain in-flight requests on stop")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--check", action="store_true", help="validate the configuration and exit")
+    args = parser.parse_args(argv)
+
+    daemon = SlaveDaemon(load_config(args.config))
+    if args.drain is not None:
+        daemon.drain_timeout = args.drain
+    if args.check:
+        print(f"{len(daemon.servers)} servers, {daemon.devices} devices, "
+              f"{len(daemon.simulation.generators)} generators")
+        return 0
+    metrics = None
+    if args.metrics_port:
+        from shared.metrics import MetricsServer
+        metrics = MetricsServer(port=args.metrics_port)
+        metrics.start()
+    try:
+        return daemon.run()
+    finally:
+        if metrics:
+            metrics.stop()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,366 @@
+import csv
+import mmap
+from array import array
+import os
+import struct
+from itertools import groupby
+from shared.utils import log
+from slave.register_store import (
+    RegisterStore, _WordTable, _BitTable, _SparseWordTable, _SparseBitTable, _BIG_ENDIAN_HOST,
+    COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS, PAGE_WORDS,
+)
+
+# ------------------------------------------------
+# Formato del fichero (little-endian)
+# ------------------------------------------------
+# Cabecera: magic, versión, direcciones por tabla, número de dispositivos
+# Directorio: por dispositivo (unit ID o -1 para el databank, formato, offset)
+# Datos densos: las 4 tablas en crudo, alineadas a 8 bytes (se pueden mapear)
+# Datos paginados: por tabla, nº de páginas y (nº de página, contenido) de cada una
+_MAGIC = b"MBSNAP"
+_VERSION = 1
+_HEADER = struct.Struct("<6sHII")
+_ENTRY = struct.Struct("<hBxQ")
+_COUNT = struct.Struct("<I")
+
+DENSE = 0
+PAGED = 1
+
+_BIT_TABLES = (COILS, DISCRETE_INPUTS)
+_WORD_TABLES = (HOLDING_REGISTERS, INPUT_REGISTERS)
+_TABLE_ORDER = (COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS)
+
+# Alias aceptados en la columna `table` del CSV
+TABLE_ALIASES = {
+    "co": COILS, "coil": COILS, COILS: COILS,
+    "di": DISCRETE_INPUTS, DISCRETE_INPUTS: DISCRETE_INPUTS,
+    "hr": HOLDING_REGISTERS, "holding": HOLDING_REGISTERS, HOLDING_REGISTERS: HOLDING_REGISTERS,
+    "ir": INPUT_REGISTERS, "input": INPUT_REGISTERS, INPUT_REGISTERS: INPUT_REGISTERS,
+}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _section_sizes(size):
+    bits = (size + 7) // 8
+    words = size * 2
+    return {COILS: bits, DISCRETE_INPUTS: bits, HOLDING_REGISTERS: words, INPUT_REGISTERS: words}
+
+
+def _dense_length(size):
+    return sum(_align(n) for n in _section_sizes(size).values())
+
+
+def _words_le(words):
+    """array('H') -> bytes little-endian."""
+    if _BIG_ENDIAN_HOST:
+        words = array("H", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+# ------------------------------------------------
+# Serialización de un RegisterStore
+# ------------------------------------------------
+def _dense_bytes(store):
+    sizes = _section_sizes(store.size)
+    out = bytearray()
+    for name in _TABLE_ORDER:
+        table = store._tables[name]
+        with table.lock:
+            if name in _BIT_TABLES:
+                data = bytes(table.read_bytes(0, sizes[name]))
+            else:
+                data = _words_le(table.read(0, store.size))
+        out += data
+        out += bytes(_align(len(data)) - len(data))
+    return out
+
+
+def _paged_bytes(store):
+    out = bytearray()
+    for name in _TABLE_ORDER:
+        table = store._tables[name]
+        with table.lock:
+            if isinstance(table, (_SparseWordTable, _SparseBitTable)):
+                pages = sorted(table.pages.items())
+            else:
+                pages = _dense_pages(name, table, store.size)
+            out += _COUNT.pack(len(pages))
+            for page_no, page in pages:
+                out += _COUNT.pack(page_no)
+                out += _words_le(page) if name in _WORD_TABLES else bytes(page)
+    return out
+
+
+def _dense_pages(name, table, size):
+    """Páginas no nulas de una tabla densa (para guardarla en formato paginado)."""
+    pages = []
+    if name in _WORD_TABLES:
+        for page_no in range((size + PAGE_WORDS - 1) // PAGE_WORDS):
+            page = table.read(page_no * PAGE_WORDS, PAGE_WORDS)
+            if any(page):
+                page.extend([0] * (PAGE_WORDS - len(page)))
+                pages.append((page_no, page))
+    else:
+        page_bytes = _SparseBitTable.PAGE_BYTES
+        total = (size + 7) // 8
+        for page_no in range((total + page_bytes - 1) // page_bytes):
+            page = bytes(table.read_bytes(page_no * page_bytes, (page_no + 1) * page_bytes))
+            if any(page):
+                pages.append((page_no, page.ljust(page_bytes, b"\x00")))
+    return pages
+
+
+def save_snapshot(path, stores, dense=False):
+    """Guarda {unit ID o None: RegisterStore} en un fichero binario compacto.
+
+    Los stores dispersos se guardan paginados (solo bloques usados) salvo con
+    `dense=True`, que escribe las tablas completas para poder mapearlas.
+    La escritura es atómica: se usa un fichero temporal y se renombra.
+    """
+    if isinstance(stores, RegisterStore):
+        stores = {None: stores}
+    sizes = {store.size for store in stores.values()}
+    if len(sizes) > 1:
+        raise ValueError("All stores in a snapshot must have the same size")
+    size = sizes.pop() if sizes else 0x10000
+
+    entries = []
+    blobs = []
+    offset = _align(_HEADER.size + _ENTRY.size * len(stores))
+    for unit_id, store in stores.items():
+        layout = PAGED if store.sparse and not dense else DENSE
+        blob = _paged_bytes(store) if layout == PAGED else _dense_bytes(store)
+        entries.append(_ENTRY.pack(-1 if unit_id is None else unit_id, layout, offset))
+        blobs.append(blob)
+        offset = _align(offset + len(blob))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, size, len(stores)))
+        f.write(b"".join(entries))
+        for blob in blobs:
+            f.seek(_align(f.tell()))
+            f.write(blob)
+        f.write(bytes(_align(f.tell()) - f.tell()))
+    os.replace(tmp_path, path)
+    log(f"Snapshot saved: {path} ({len(stores)} devices, {offset} bytes)")
+
+
+# ------------------------------------------------
+# Lectura
+# ------------------------------------------------
+def _read_directory(buf):
+    magic, version, size, count = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a register snapshot file")
+    entries = []
+    for i in range(count):
+        unit_id, layout, offset = _ENTRY.unpack_from(buf, _HEADER.size + i * _ENTRY.size)
+        entries.append((None if unit_id < 0 else unit_id, layout, offset))
+    return size, entries
+
+
+def _dense_store(buf, offset, size, copy):
+    """RegisterStore denso sobre `buf` (copia o vista directa del fichero mapeado)."""
+    tables = {}
+    for name, length in _section_sizes(size).items():
+        section = buf[offset:offset + length]
+        if copy:
+            section = bytearray(section)
+        if name in _BIT_TABLES:
+            tables[name] = _BitTable(size, section)
+        else:
+            if _BIG_ENDIAN_HOST:
+                words = array("H")
+                words.frombytes(section)
+                words.byteswap()
+                section = bytearray(words.tobytes())
+            tables[name] = _WordTable(size, section)
+        offset += _align(length)
+    return RegisterStore(size, _tables=tables)
+
+
+def _paged_store(buf, offset, size):
+    tables = {}
+    for name in _TABLE_ORDER:
+        (count,) = _COUNT.unpack_from(buf, offset)
+        offset += _COUNT.size
+        pages = {}
+        if name in _WORD_TABLES:
+            for _ in range(count):
+                (page_no,) = _COUNT.unpack_from(buf, offset)
+                page = array("H")
+                page.frombytes(buf[offset + 4:offset + 4 + PAGE_WORDS * 2])
+                if _BIG_ENDIAN_HOST:
+                    page.byteswap()
+                pages[page_no] = page
+                offset += 4 + PAGE_WORDS * 2
+            tables[name] = _SparseWordTable(size, pages)
+        else:
+            page_bytes = _SparseBitTable.PAGE_BYTES
+            for _ in range(count):
+                (page_no,) = _COUNT.unpack_from(buf, offset)
+                pages[page_no] = bytearray(buf[offset + 4:offset + 4 + page_bytes])
+                offset += 4 + page_bytes
+            tables[name] = _SparseBitTable(size, pages)
+    return RegisterStore(size, sparse=True, _tables=tables)
+
+
+def load_snapshot(path):
+    """Carga un snapshot y devuelve {unit ID o None: RegisterStore} (copias en memoria)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        buf = memoryview(mapped)
+        try:
+            size, entries = _read_directory(buf)
+            stores = {}
+            for unit_id, layout, offset in entries:
+                if layout == DENSE:
+                    stores[unit_id] = _dense_store(buf, offset, size, copy=True)
+                else:
+                    stores[unit_id] = _paged_store(buf, offset, size)
+        finally:
+            buf.release()
+    log(f"Snapshot loaded: {path} ({len(stores)} devices)")
+    return stores
+
+
+class PersistentSnapshot:
+    """Registros respaldados directamente por un fichero mapeado en memoria.
+
+    Los stores recibidos pasan a usar tablas densas sobre el mmap: cada escritura
+    queda en el fichero sin guardar explícitamente (`flush` fuerza la escritura a
+    disco). Si el fichero ya existe se recupera su contenido, de modo que un
+    reinicio continúa con el estado anterior casi al instante.
+    """
+
+    def __init__(self, path, stores):
+        if _BIG_ENDIAN_HOST:
+            raise ValueError("Persistent snapshots require a little-endian host")
+        if isinstance(stores, RegisterStore):
+            stores = {None: stores}
+        self.path = path
+        self.stores = stores
+        if not self._reusable(path, stores):
+            if os.path.exists(path):
+                # Recuperar el estado previo de los dispositivos que siguen existiendo
+                for unit_id, saved in load_snapshot(path).items():
+                    if unit_id in stores and saved.size == stores[unit_id].size:
+                        stores[unit_id].restore(saved)
+            save_snapshot(path, stores, dense=True)
+        self._file = open(path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        buf = memoryview(self._mmap)
+        size, entries = _read_directory(buf)
+        for unit_id, _layout, offset in entries:
+            stores[unit_id].restore(_dense_store(buf, offset, size, copy=False))
+        buf.release()
+        log(f"Persistent snapshot opened: {path}")
+
+    @staticmethod
+    def _reusable(path, stores):
+        """El fichero tiene exactamente la disposición que escribiría save_snapshot(dense=True).
+
+        Se comprueba el directorio completo: mismos dispositivos, todos densos,
+        del mismo tamaño y con los offsets y la longitud de fichero esperados.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            try:
+                count = _HEADER.unpack(header)[3]
+                size, entries = _read_directory(header + f.read(_ENTRY.size * count))
+            except (ValueError, struct.error):
+                return False
+        if len(entries) != len(stores) or {unit_id for unit_id, _, _ in entries} != set(stores):
+            return False
+        if any(store.size != size for store in stores.values()):
+            return False
+        offset = _align(_HEADER.size + _ENTRY.size * count)
+        for _unit_id, layout, entry_offset in entries:
+            if layout != DENSE or entry_offset != offset:
+                return False
+            offset += _dense_length(size)
+        return os.path.getsize(path) == offset
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self):
+        """Vuelca a disco y desacopla los stores del fichero (pasan a copias en memoria)."""
+        if self._mmap is None:
+            return
+        self.flush()
+        for store in self.stores.values():
+            store.restore(store.clone())
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Quedan vistas vivas sobre el mmap: se libera al recolectarlas
+            pass
+        self._file.close()
+        self._mmap = None
+        log(f"Persistent snapshot closed: {self.path}")
+
+
+# ------------------------------------------------
+# Importación CSV
+# ------------------------------------------------
+def import_csv(path, stores):
+    """Importa valores desde un CSV y los escribe por bloques contiguos.
+
+    Columnas admitidas (cabecera opcional): `address,value` (holding registers),
+    `table,address,value` o `unit,table,address,value`. Devuelve cuántos valores
+    se escribieron.
+    """
+    if isinstance(stores, RegisterStore):
+        stores = {None: stores}
+    pending = {}
+    with open(path, newline="") as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            row = [cell.strip() for cell in row]
+            if not row or not any(row) or row[0].startswith("#"):
+                continue
+            try:
+                if len(row) == 2:
+                    unit_id, table, address, value = None, HOLDING_REGISTERS, row[0], row[1]
+                elif len(row) == 3:
+                    unit_id, (table, address, value) = None, row
+                else:
+                    unit_id, table, address, value = row[:4]
+                    unit_id = int(unit_id) if unit_id else None
+                table = TABLE_ALIASES[table.lower()]
+                address, value = int(address, 0), int(value, 0)
+            except (KeyError, ValueError):
+                if line_no == 1:
+                    continue    # cabecera
+                raise ValueError(f"Invalid CSV row {line_no}: {row}")
+            # Sin recorte silencioso: 0/1 en coils y discrete inputs, 0–65535 en registros
+            if not 0 <= value <= (1 if table in _BIT_TABLES else 0xFFFF):
+                raise ValueError(f"Invalid CSV row {line_no}: {row}")
+            pending.setdefault((unit_id, table), {})[address] = value
+
+    written = 0
+    for (unit_id, table), values in pending.items():
+        store = stores.get(unit_id)
+        if store is None:
+            log(f"CSV import: unknown unit {unit_id}, {len(values)} values skipped")
+            continue
+        setter = {
+            COILS: store.set_coils, DISCRETE_INPUTS: store.set_discrete_inputs,
+            HOLDING_REGISTERS: store.set_holding_registers, INPUT_REGISTERS: store.set_input_registers,
+        }[table]
+        # Agrupar direcciones consecutivas: una escritura por bloque
+        addresses = sorted(values)
+        for _, run in groupby(enumerate(addresses), lambda item: item[1] - item[0]):
+            run = [address for _, address in run]
+            if setter(run[0], [values[address] for address in run]) is None:
+                raise ValueError(f"CSV block out of range: {table} {run[0]}..{run[-1]}")
+            written += len(run)
+    log(f"CSV imported: {path} ({written} values)")
+    return written
@@ -0,0 +1,44 @@
+import os
+import socket
+import time
+import pytest
+
+# Las pruebas de la GUI usan Qt sin pantalla
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from shared.utils import configure_logging, WARNING
+
+configure_logging(level=WARNING)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def slave_server():
+    """Fábrica de ModbusSlaveServer arrancados en un puerto libre; se detienen al terminar."""
+    from slave.modbus_slave import ModbusSlaveServer
+    servers = []
+
+    def start(engine="thread", **kwargs):
+        server = ModbusSlaveServer("127.0.0.1", free_port(), engine=engine, **kwargs)
+        server.start()
+        assert server.running
+        # El motor "thread" de pyModbusTCP acepta conexiones justo después de start()
+        time.sleep(0.05)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    pytest.importorskip("PySide6")
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,62 @@
+import asyncio
+
+from master.async_master import AsyncDeviceSession, AsyncMasterEngine
+from shared.protocol import COILS
+from tests.conftest import free_port
+
+
+def test_session_reads_scans_and_writes(slave_server):
+    slave = slave_server(engine="async")
+    slave.databank.set_holding_registers(0, list(range(200)))
+    slave.databank.set_coils(10, [1, 0, 1])
+
+    async def run():
+        session = AsyncDeviceSession("127.0.0.1", slave.server.port, timeout=1.0)
+        try:
+            assert await session.read_registers(0, 200) == list(range(200))
+            assert await session.read_scan([1, 5, (150, 2)], max_gap=10) == {1: 1, 5: 5, 150: 150, 151: 151}
+            assert await session.read_scan([10, 12], table=COILS) == {10: True, 12: True}
+            assert await session.write_register(3, 999)
+        finally:
+            await session.close()
+
+    asyncio.run(run())
+    assert slave.databank.get_holding_registers(3, 1) == [999]
+
+
+def test_bad_address_set_does_not_stop_the_engine(slave_server):
+    slave = slave_server(engine="async")
+    slave.databank.set_holding_registers(0, [7])
+
+    async def run():
+        engine = AsyncMasterEngine()
+        engine.add_device("bad", "127.0.0.1", slave.server.port, addresses=[(65530, 10)], interval=0.01)
+        engine.add_device("good", "127.0.0.1", slave.server.port, addresses=[(0, 1)], interval=0.01)
+        results = {"bad": [], "good": []}
+
+        async def collect():
+            async for result in engine.stream():
+                results[result.device].append(result)
+                if min(len(r) for r in results.values()) >= 3:
+                    return
+
+        try:
+            await asyncio.wait_for(collect(), 5)
+            assert not any(task.done() for task in engine._tasks)
+        finally:
+            await engine.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert all("out of range" in result.error for result in results["bad"])
+    assert all(result.ok and result.values == {0: 7} for result in results["good"])
+
+
+def test_unreachable_device_reports_no_data():
+    async def run():
+        engine = AsyncMasterEngine()
+        engine.add_device("down", "127.0.0.1", free_port(), timeout=0.2)
+        return [result async for result in engine.poll_all()]
+
+    (result,) = asyncio.run(run())
+    assert not result.ok and result.values == {}
@@ -0,0 +1,57 @@
+import pytest
+
+from master.modbus_master import ModbusMasterClient
+from shared.bits import PackedBits
+
+
+def test_packing_is_lsb_first():
+    bits = PackedBits.from_bools([1, 0, 1, 1, 0, 0, 0, 0, 1])
+    assert bits.tobytes() == bytes((0b1101, 0b1))
+    assert len(bits) == 9 and int(bits) == 0b1_0000_1101
+    assert bits.tolist() == [True, False, True, True, False, False, False, False, True]
+    assert bits == [1, 0, 1, 1, 0, 0, 0, 0, 1]
+    assert bits.ones() == 4
+    assert repr(bits) == "PackedBits('101100001')"
+
+
+def test_unused_bits_of_the_last_byte_are_cleared():
+    assert PackedBits(b"\xff", 3).tobytes() == b"\x07"
+    assert PackedBits(b"\xff", 3) == PackedBits.from_int(0b111, 3)
+    with pytest.raises(ValueError, match="do not fit"):
+        PackedBits(b"\xff", 9)
+
+
+def test_indexing_and_slicing():
+    bits = PackedBits.from_int(0b1011_0110, 8)
+    assert bits[1] and not bits[0] and bits[-1]
+    with pytest.raises(IndexError):
+        bits[8]
+    assert bits[2:6] == PackedBits.from_int(0b1101, 4)
+    assert bits[::2] == [False, True, True, False]
+    with pytest.raises(IndexError):
+        bits.slice(6, 3)
+
+
+def test_join_concatenates_blocks():
+    joined = PackedBits.join([PackedBits.from_bools([1, 0, 1]), PackedBits.from_bools([1] * 6)])
+    assert joined == [1, 0, 1] + [1] * 6
+    assert PackedBits.join([]) == PackedBits()
+
+
+def test_master_reads_bits_packed(slave_server):
+    slave = slave_server()
+    slave.databank.set_coils(1990, [1, 0, 1] * 10)
+    slave.databank.set_discrete_inputs(5, [1])
+    client = ModbusMasterClient("127.0.0.1", slave.server.port)
+    assert client.connect()
+    try:
+        # Más de 2000 bits: dos peticiones unidas en un PackedBits
+        coils = client.read_coils(0, 2020)
+        assert isinstance(coils, PackedBits) and len(coils) == 2020
+        assert client.request_count == 2
+        assert coils[1990:2020] == [1, 0, 1] * 10 and coils.ones() == 20
+        assert client.read_discrete_inputs(4, 3) == [False, True, False]
+        assert client.write_coils(100, PackedBits.from_bools([1, 1, 0, 1]))
+        assert slave.databank.get_coils(100, 4) == [True, True, False, True]
+    finally:
+        client.disconnect()
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from benchmarks import replay
+from master.modbus_master import ModbusMasterClient
+from shared.capture import TrafficCapture, read_capture, read_capture_header
+
+
+def test_round_trip_and_torn_tail(tmp_path):
+    path = tmp_path / "traffic.mbcap"
+    capture = TrafficCapture(str(path))
+    first, second = capture.session(("10.0.0.1", 5000)), capture.session(("10.0.0.2", 5000))
+    assert (first, second) == (0, 1) and capture.session(("10.0.0.1", 5000)) == 0
+    started = time.perf_counter()
+    capture.record(first, 1, started, 0.002, bytes.fromhex("03 0000 0001"), bytes.fromhex("03 02 0007"))
+    capture.record(second, 2, started + 0.1, 0.5, bytes.fromhex("06 0001 0002"), None)
+    capture.close()
+    assert capture.records == 2
+    assert read_capture_header(str(path)) == pytest.approx(time.time(), abs=60)
+
+    transactions = list(read_capture(str(path)))
+    assert [(t.session, t.unit_id, t.request.hex(), t.response.hex()) for t in transactions] == [
+        (0, 1, "0300000001", "03020007"), (1, 2, "0600010002", "")]
+    assert transactions[1].time - transactions[0].time == pytest.approx(0.1)
+    assert transactions[0].duration == pytest.approx(0.002)
+
+    # Registro final incompleto (corte durante la escritura)
+    path.write_bytes(path.read_bytes()[:-3])
+    assert len(list(read_capture(str(path)))) == 1
+    path.write_bytes(b"garbage")
+    with pytest.raises(ValueError, match="Not a capture"):
+        list(read_capture(str(path)))
+
+
+def test_master_and_slave_capture_the_same_traffic(slave_server, tmp_path):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [1, 2, 3])
+    slave.start_capture(str(tmp_path / "slave.mbcap"))
+    capture = TrafficCapture(str(tmp_path / "master.mbcap"))
+    client = ModbusMasterClient("127.0.0.1", slave.server.port, capture=capture)
+    assert client.connect()
+    client.read_registers(0, 3)
+    client.write_register(1, 20)
+    client.disconnect()
+    capture.close()
+    slave.stop_capture()
+    captured = {side: [(t.request, t.response) for t in read_capture(str(tmp_path / f"{side}.mbcap"))]
+                for side in ("master", "slave")}
+    assert captured["master"] == captured["slave"]
+    assert captured["master"][0] == (bytes.fromhex("03 0000 0003"), bytes.fromhex("03 06 0001 0002 0003"))
+    assert captured["master"][1][0] == bytes.fromhex("06 0001 0014")
+
+
+def test_replay_against_a_local_slave(slave_server, tmp_path):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [1, 2])
+    path = str(tmp_path / "traffic.mbcap")
+    slave.start_capture(path)
+    # Una sesión escribe y otra lee direcciones distintas (orden irrelevante al reproducir)
+    writer, reader = (ModbusMasterClient("127.0.0.1", slave.server.port) for _ in range(2))
+    assert writer.connect() and reader.connect()
+    writer.write_register(100, 7)
+    reader.read_registers(0, 2)
+    reader.read_registers(0, 1)
+    writer.disconnect()
+    reader.disconnect()
+    slave.stop_capture()
+    assert sorted(len(session) for session in replay.load_sessions(path).values()) == [1, 2]
+
+    config = {"capture": path, "speed": "max", "engine": "async", "snapshot": None,
+              "target": f"127.0.0.1:{slave.server.port}", "timeout": 2.0}
+    report = replay.run(config)
+    assert report["capture"]["transactions"] == 3 and report["capture"]["sessions"] == 2
+    assert report["errors"] == 0 and report["mismatches"] == 0
+    assert report["latency_ms"]["read"]["count"] == 2 and report["latency_ms"]["write"]["count"] == 1
+    # El esclavo parte de otro estado: las lecturas responden distinto de lo capturado
+    slave.databank.set_holding_registers(1, [0])
+    report = replay.run(config)
+    assert report["errors"] == 0 and report["mismatches"] == 1
+
+    with pytest.raises(ValueError, match="Only local targets"):
+        replay.run({**config, "target": "10.0.0.1:502"})
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from master.connection_pool import ConnectionPool, BACKOFF, CLOSED, CONNECTED
+from master.modbus_master import ModbusMasterClient
+from tests.conftest import free_port
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(timeout=0.5, base_delay=0.2, max_delay=1.0)
+    yield pool
+    pool.close()
+
+
+def test_clients_of_a_device_share_one_connection(pool, slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [5])
+    first = ModbusMasterClient("127.0.0.1", slave.server.port, pool=pool)
+    second = ModbusMasterClient("127.0.0.1", slave.server.port, pool=pool)
+    assert first.connect() and second.connect()
+    assert first.connection is second.connection
+    assert first.read_registers(0, 1) == second.read_registers(0, 1) == [5]
+
+    connection = first.connection
+    first.disconnect()
+    assert connection.state == CONNECTED
+    second.disconnect()
+    assert connection.state == CLOSED
+    assert pool.connections == {}
+
+
+def test_mismatched_max_in_flight_is_rejected(pool, slave_server):
+    slave = slave_server()
+    plain = ModbusMasterClient("127.0.0.1", slave.server.port, pool=pool)
+    pipelined = ModbusMasterClient("127.0.0.1", slave.server.port, max_in_flight=4, pool=pool)
+    assert plain.connect()
+    with pytest.raises(ValueError, match="max_in_flight=1, not 4"):
+        pipelined.connect()
+    # Otro unit ID es otra conexión: puede ir en pipeline
+    other = ModbusMasterClient("127.0.0.1", slave.server.port, unit_id=2, max_in_flight=4, pool=pool)
+    assert other.connect()
+    assert other.connection is not plain.connection
+    assert pool.connections[("127.0.0.1", slave.server.port, 1)].users == 1
+
+
+def test_down_device_fails_fast_during_backoff(pool):
+    states = []
+    pool.subscribe(lambda key, state: states.append(state))
+    client = ModbusMasterClient("127.0.0.1", free_port(), pool=pool)
+    assert not client.connect()
+    assert client.connection.state == BACKOFF
+    assert not client.available
+
+    started = time.perf_counter()
+    assert client.read_registers(0, 1) is None
+    assert time.perf_counter() - started < 0.1
+    assert BACKOFF in states
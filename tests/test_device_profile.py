@@ -0,0 +1,92 @@
+import socket
+import statistics
+import time
+
+import pytest
+from pyModbusTCP.client import ModbusClient
+
+from slave.device_profile import DeviceProfile
+
+
+def test_wire_time_counts_both_frames_and_silences():
+    assert DeviceProfile().wire_time(5, 22) == 0.0
+    char = 11 / 9600
+    # FC3 de 10 registros: petición 5 + respuesta 22 bytes de PDU, más dirección y CRC en cada sentido
+    assert DeviceProfile(baud_rate=9600).wire_time(5, 22) == pytest.approx(33 * char + 7 * char)
+    fast = DeviceProfile(baud_rate=115200, bits_per_char=10)
+    assert fast.wire_time(5, 22) == pytest.approx(33 * 10 / 115200 + 2 * 0.00175)
+
+
+def test_line_is_shared_by_concurrent_requests():
+    profile = DeviceProfile(baud_rate=9600)
+    wire = profile.wire_time(5, 7)
+    delays = [profile.delay(5, 7) for _ in range(3)]
+    # Cada transacción espera a que termine la anterior
+    assert delays == pytest.approx([wire, 2 * wire, 3 * wire], abs=0.005)
+
+
+def test_max_rate_spaces_requests():
+    profile = DeviceProfile(latency=0.01, max_rate=10)
+    delays = [profile.delay(5, 7) for _ in range(3)]
+    assert delays == pytest.approx([0.01, 0.11, 0.21], abs=0.005)
+
+
+@pytest.mark.parametrize("distribution, check", [
+    ("fixed", lambda samples: set(samples) == {0.05}),
+    ("uniform", lambda samples: 0.04 <= min(samples) and max(samples) <= 0.06),
+    ("normal", lambda samples: statistics.mean(samples) == pytest.approx(0.05, abs=0.002)),
+    ("exponential", lambda samples: statistics.mean(samples) == pytest.approx(0.05, rel=0.1)),
+])
+def test_latency_distributions(distribution, check):
+    profile = DeviceProfile(latency=0.05, jitter=0.01, distribution=distribution, seed=1)
+    samples = [profile.sample_latency() for _ in range(2000)]
+    assert min(samples) >= 0 and check(samples)
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"distribution": "gamma"}, "Unknown latency distribution"),
+    ({"latency": -1}, "must be >= 0"),
+    ({"max_rate": 0}, "Invalid max_rate"),
+    ({"baud_rate": 0}, "Invalid baud_rate"),
+    ({"max_connections": 0}, "Invalid max_connections"),
+    ({"latency": 0.1, "delay": 1}, "Unknown profile option: delay"),
+])
+def test_invalid_options(options, message):
+    with pytest.raises(ValueError, match=message):
+        DeviceProfile.from_dict(options)
+
+
+# ------------------------------------------------
+# Perfiles en el esclavo
+# ------------------------------------------------
+def _timed_read(client):
+    started = time.perf_counter()
+    assert client.read_holding_registers(0, 1) == [0]
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_profiles_per_unit_id(slave_server, engine):
+    slave = slave_server(engine=engine)
+    slave.add_device(1)
+    slave.add_device(2)
+    slave.set_profile(DeviceProfile(latency=0.2), unit_id=2)
+    client = ModbusClient("127.0.0.1", slave.server.port, auto_open=True, timeout=2)
+    assert _timed_read(client) < 0.1
+    client.unit_id = 2
+    assert _timed_read(client) >= 0.2
+    client.close()
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_server_profile_limits_connections(slave_server, engine):
+    slave = slave_server(engine=engine)
+    slave.set_profile(DeviceProfile(max_connections=1))
+    first = ModbusClient("127.0.0.1", slave.server.port, auto_open=True, timeout=2)
+    assert first.read_holding_registers(0, 1) == [0]
+    with socket.create_connection(("127.0.0.1", slave.server.port), timeout=2) as extra:
+        # La conexión de más se cierra al aceptarla
+        assert extra.recv(16) == b""
+    assert first.read_holding_registers(0, 1) == [0]
+    assert slave.connections == 1 and slave.server.rejected_connections == 1
+    first.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks import load_test
+from benchmarks.load_test import compare, percentiles
+
+
+def test_percentiles_are_exact():
+    stats = percentiles([i / 1000 for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert stats["p50"] == 51.0 and stats["p99"] == 100.0 and stats["max"] == 100.0
+    assert stats["mean"] == pytest.approx(50.5)
+    assert percentiles([]) is None
+
+
+def _report(ops, p99):
+    return {"config": {"clients": 4, "seed": 1}, "throughput": {"operations_per_s": ops},
+            "latency_ms": {"read": {"p50": 1.0, "p99": p99}, "write": None}}
+
+
+def test_compare_flags_regressions_beyond_tolerance(capsys):
+    baseline = _report(1000, 2.0)
+    assert compare(_report(950, 2.1), baseline, 0.10) == []
+    assert compare(_report(800, 3.0), baseline, 0.10) == ["throughput", "read p99"]
+    assert "throughput: 1000 -> 800" in capsys.readouterr().out
+
+
+def test_compare_with_zero_baseline(capsys):
+    # Base de una ejecución en la que fallaron todas las operaciones
+    baseline = _report(0, 0.0)
+    assert compare(_report(500, 1.0), baseline, 0.10) == ["read p99"]
+    out = capsys.readouterr().out
+    assert "throughput: 0 -> 500 ops/s (n/a)" in out and "read p99: 0.000 -> 1.000 ms (n/a)" in out
+
+
+def test_usage_without_resource_module(monkeypatch):
+    monkeypatch.setattr(load_test, "resource", None)
+    usage = load_test._usage()
+    assert usage["max_rss_kb"] is None
+    assert usage["user"] >= 0 and usage["system"] >= 0
+
+
+def test_run_against_local_target(slave_server):
+    slave = slave_server()
+    config = {"engine": "thread", "target": f"127.0.0.1:{slave.server.port}", "clients": 2, "processes": 1,
+              "duration": 0.3, "warmup": 0.1, "read_size": 10, "write_size": 1, "write_ratio": 0.5,
+              "in_flight": 1, "seed": 1}
+    report = load_test.run(config)
+    assert report["errors"] == 0
+    assert report["throughput"]["operations_per_s"] > 0
+    assert report["latency_ms"]["read"]["count"] > 0
+    assert report["clients"]["max_rss_kb"] > 0
+    assert "server" not in report
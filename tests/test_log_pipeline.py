@@ -0,0 +1,89 @@
+import io
+import threading
+import time
+
+import pytest
+
+from shared.utils import DEBUG, WARNING, LogPipeline
+
+
+@pytest.fixture
+def stream():
+    return io.StringIO()
+
+
+def _lines(stream):
+    # Sin la marca de tiempo "[AAAA-MM-DD HH:MM:SS] "
+    return [line[22:] for line in stream.getvalue().splitlines()]
+
+
+def test_levels_and_formatting(stream):
+    pipeline = LogPipeline(stream=stream)
+    pipeline.log("hidden", level=DEBUG)
+    pipeline.log("value %d of %s", 3, "x")
+    pipeline.log("careful", level=WARNING)
+    pipeline.log("bad %d", "x")
+    assert pipeline.flush()
+    lines = stream.getvalue().splitlines()
+    assert [line[22:] for line in lines[:2]] == ["value 3 of x", "[WARNING] careful"]
+    # Un mensaje mal formado no detiene al escritor
+    assert lines[2].startswith("[log] Bad message 'bad %d'")
+    assert pipeline.recent(1) == stream.getvalue().splitlines()[-1:]
+
+
+def test_arguments_are_formatted_in_the_writer_thread(stream):
+    threads = []
+
+    class Arg:
+        def __str__(self):
+            threads.append(threading.current_thread())
+            return "arg"
+
+    pipeline = LogPipeline(stream=stream)
+    pipeline.log("lazy %s", Arg())
+    assert pipeline.flush()
+    assert threads and threads[0] is not threading.current_thread()
+    assert _lines(stream) == ["lazy arg"]
+
+
+def test_repeated_messages_are_rate_limited(stream):
+    pipeline = LogPipeline(stream=stream, window=0.1, burst=2)
+    for i in range(5):
+        pipeline.log("retry %d", i)
+    pipeline.log("other")
+    time.sleep(0.15)
+    pipeline.log("retry %d", 5)
+    assert pipeline.flush()
+    assert _lines(stream) == ["retry 0", "retry 1", "other", "retry 5 (3 similar messages suppressed)"]
+
+
+def test_full_queue_drops_oldest_without_blocking(stream):
+    release = threading.Event()
+    pipeline = LogPipeline(stream=stream, capacity=10, burst=1000)
+    pipeline.add_sink(lambda line, record: release.wait(5))
+    pipeline.log("first")
+    # Esperar a que el escritor tome el primero y quede bloqueado en la salida
+    while pipeline._queue:
+        time.sleep(0.01)
+    started = time.monotonic()
+    for i in range(25):
+        pipeline.log("message %d", i)
+    assert time.monotonic() - started < 0.5
+    release.set()
+    assert pipeline.flush()
+    assert pipeline.dropped == 15
+    assert _lines(stream) == ["first"] + [f"message {i}" for i in range(15, 25)]
+
+
+def test_sinks_receive_lines_and_records(stream):
+    pipeline = LogPipeline(stream=stream)
+    seen = []
+    sink = pipeline.add_sink(lambda line, record: seen.append((line[22:], record.level)))
+    pipeline.add_sink(lambda line, record: 1 / 0)
+    pipeline.log("one", level=WARNING)
+    assert pipeline.flush()
+    pipeline.remove_sink(sink)
+    pipeline.log("two")
+    assert pipeline.flush()
+    assert seen == [("[WARNING] one", WARNING)]
+    assert _lines(stream) == ["[WARNING] one", "two"]
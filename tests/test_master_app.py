@@ -0,0 +1,92 @@
+import gc
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QMessageBox
+
+from master.master_app import MasterApp
+from master.modbus_master import ModbusMasterClient
+from tests.conftest import free_port
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met")
+        QTest.qWait(10)
+
+
+@pytest.fixture
+def app(qapp):
+    window = MasterApp()
+    yield window
+    window.close()
+    # Destruir la ventana en el hilo de la GUI (no en una recolección desde otro hilo)
+    window.deleteLater()
+    QTest.qWait(0)
+    del window
+    gc.collect()
+
+
+def test_connect_runs_in_the_poll_thread(app, slave_server, monkeypatch):
+    slave = slave_server()
+    threads = []
+    connect = ModbusMasterClient.connect
+    monkeypatch.setattr(ModbusMasterClient, "connect",
+                        lambda self: threads.append(threading.current_thread()) or connect(self))
+    app.port_input.setText(str(slave.server.port))
+    app.connect_to_server()
+    # La GUI no espera a la conexión
+    assert not app.connected and not app.connect_button.isEnabled()
+    _wait_for(lambda: app.connected)
+    assert threads and threads[0] is not threading.main_thread()
+    assert app.connect_button.isEnabled() and app.connect_button.text() == "Disconnect"
+    assert app.worker.client is app.client
+
+
+def test_failed_connect_resets_the_ui(app, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(QMessageBox, "warning", lambda *args: warnings.append(args[1]))
+    app.port_input.setText(str(free_port()))
+    app.connect_to_server()
+    _wait_for(lambda: app.connect_button.isEnabled())
+    assert not app.connected and app.client is None
+    assert warnings == ["Connection Failed"]
+
+
+def test_replies_from_a_previous_connection_are_ignored(app, slave_server):
+    slave = slave_server()
+    app.port_input.setText(str(slave.server.port))
+    app.connect_to_server()
+    _wait_for(lambda: app.connected)
+    old = app._generation
+    app.disconnect_from_server()
+    app.connect_to_server()
+    _wait_for(lambda: app.connected)
+    assert app._generation != old
+
+    app._poll_pending = True
+    app.on_read_done(old, app.current_table, 0, 1, [1234])
+    assert app._poll_pending
+    assert app.model.value(0) != 1234
+    app.on_read_done(app._generation, app.current_table, 0, 1, [1234])
+    assert not app._poll_pending
+    assert app.model.value(0) == 1234
+
+
+def test_poll_reads_the_visible_rows(app, slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [11, 22])
+    app.port_input.setText(str(slave.server.port))
+    app.connect_to_server()
+    _wait_for(lambda: app.connected)
+    app.show()
+    app.update_table()
+    _wait_for(lambda: app.model.value(1) == 22)
+    assert app.model.value(0) == 11
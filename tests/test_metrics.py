@@ -0,0 +1,103 @@
+import gc
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from master.modbus_master import ModbusMasterClient
+from shared.metrics import REGISTRY, DeviceMetrics, Histogram, MetricsRegistry, MetricsServer
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.2) == pytest.approx(1.0)
+    assert histogram.quantile(0.4) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == 10.0
+    stats = histogram.stats()
+    assert stats["count"] == 5 and stats["mean"] == pytest.approx(3.3) and stats["max"] == 10.0
+    assert Histogram().stats()["p50"] is None
+
+
+def _metrics(registry, device="10.0.0.1:502/1"):
+    metrics = DeviceMetrics("master", device, register=False)
+    registry.add(metrics)
+    return metrics
+
+
+def test_registry_merges_clients_of_the_same_device():
+    registry = MetricsRegistry()
+    first, second = _metrics(registry), _metrics(registry)
+    first.observe(3, 0.002, 12, 11)
+    second.observe(3, 0.004, 12, 11)
+    second.observe(16, 0.003, 19, 12)
+    second.exception(2)
+    second.timeouts += 1
+    stats = registry.stats()["master"]["10.0.0.1:502/1"]
+    assert stats["requests"] == {3: 2, 16: 1}
+    assert stats["latency"][3]["count"] == 2 and stats["latency_all"]["count"] == 3
+    assert stats["exceptions"] == {2: 1} and stats["timeouts"] == 1
+    assert (stats["bytes_sent"], stats["bytes_received"]) == (43, 34)
+    # Referencias débiles: un cliente destruido deja de contar
+    del second
+    gc.collect()
+    assert registry.stats()["master"]["10.0.0.1:502/1"]["requests"] == {3: 1}
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    metrics = _metrics(registry)
+    metrics.gauges["connections"] = lambda: 4
+    metrics.observe(3, 0.003, 12, 11)
+    metrics.exception(2)
+    text = registry.render_prometheus()
+    labels = 'role="master",device="10.0.0.1:502/1"'
+    assert "# TYPE modbus_requests_total counter" in text
+    assert f"modbus_requests_total{{{labels},fc=\"3\"}} 1" in text
+    assert f"modbus_request_duration_seconds_bucket{{{labels},fc=\"3\",le=\"0.0025\"}} 0" in text
+    assert f"modbus_request_duration_seconds_bucket{{{labels},fc=\"3\",le=\"0.005\"}} 1" in text
+    assert f"modbus_request_duration_seconds_bucket{{{labels},fc=\"3\",le=\"+Inf\"}} 1" in text
+    assert f"modbus_exceptions_total{{{labels},code=\"2\"}} 1" in text
+    assert f"modbus_connections{{{labels}}} 4" in text
+    assert text.endswith("\n")
+
+
+def test_http_endpoint():
+    registry = MetricsRegistry()
+    metrics = _metrics(registry)
+    metrics.observe(4, 0.001, 12, 11)
+    server = MetricsServer(port=0, registry=registry)
+    assert server.start()
+    base = f"http://127.0.0.1:{server.port}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=2) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "modbus_requests_total" in response.read().decode()
+        with urllib.request.urlopen(f"{base}/stats", timeout=2) as response:
+            assert json.load(response)["master"]["10.0.0.1:502/1"]["requests"] == {"4": 1}
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=2)
+    finally:
+        server.stop()
+
+
+def test_master_and_slave_record_requests(slave_server):
+    slave = slave_server()
+    slave.add_device(1)
+    client = ModbusMasterClient("127.0.0.1", slave.server.port)
+    assert client.connect()
+    assert client.read_registers(0, 10) is not None
+    # Unidad inexistente: excepción 0x0B
+    client.client.unit_id = 2
+    assert client.read_registers(0, 10) is None
+    client.disconnect()
+    master = client.metrics.stats()
+    assert master["requests"] == {3: 2} and master["exceptions"] == {0x0B: 1}
+    # Petición FC3: MBAP + 5 bytes; respuesta: MBAP + 2 + 20 bytes; excepción: MBAP + 2
+    assert master["bytes_sent"] == 2 * 12
+    assert master["bytes_received"] == 7 + 22 + 9
+    served = REGISTRY.stats()["slave"][f"127.0.0.1:{slave.server.port}"]
+    assert served["requests"] == {3: 2} and served["exceptions"] == {0x0B: 1}
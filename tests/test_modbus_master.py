@@ -0,0 +1,79 @@
+import pytest
+
+from master.modbus_master import ModbusMasterClient, plan_reads
+
+
+# ------------------------------------------------
+# Planificación de lecturas
+# ------------------------------------------------
+@pytest.mark.parametrize("addresses, max_gap, max_count, expected", [
+    ([], 0, 125, []),
+    ([5, 6, 7, 3], 0, 125, [(3, 1), (5, 3)]),
+    ([5, 6, 7, 3], 1, 125, [(3, 5)]),
+    ([(0, 10), range(5, 15), 20], 5, 125, [(0, 21)]),
+    ([(0, 10), 20], 9, 125, [(0, 10), (20, 1)]),
+    ([(0, 300)], 0, 125, [(0, 125), (125, 125), (250, 50)]),
+    ([0, 124, 125], 200, 125, [(0, 125), (125, 1)]),
+    ([range(0, 10, 3)], 0, 125, [(0, 1), (3, 1), (6, 1), (9, 1)]),
+    ([(65530, 6)], 0, 2000, [(65530, 6)]),
+])
+def test_plan_reads(addresses, max_gap, max_count, expected):
+    assert plan_reads(addresses, max_gap=max_gap, max_count=max_count) == expected
+
+
+@pytest.mark.parametrize("addresses", [[-1], [(65535, 2)], [65536]])
+def test_plan_reads_rejects_out_of_range(addresses):
+    with pytest.raises(ValueError, match="Address out of range"):
+        plan_reads(addresses)
+
+
+# ------------------------------------------------
+# Lecturas contra un esclavo
+# ------------------------------------------------
+@pytest.fixture
+def client(slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, list(range(1000)))
+    client = ModbusMasterClient("127.0.0.1", slave.server.port)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def test_read_registers_splits_large_ranges(client):
+    assert client.read_registers(0, 300) == list(range(300))
+    assert client.request_count == 3
+
+
+def test_read_scan_coalesces_within_max_gap(client):
+    scan = client.read_scan([1, 3, (10, 2), 500], max_gap=10)
+    assert scan == {1: 1, 3: 3, 10: 10, 11: 11, 500: 500}
+    assert client.request_count == 2
+    assert client.last_known[2] == 2
+
+
+# ------------------------------------------------
+# Escrituras por lotes
+# ------------------------------------------------
+def test_write_many_splits_into_fc16_chunks(client):
+    values = {address: address + 1 for address in range(2000, 2300)}
+    result = client.write_many(values)
+    assert result.ok and len(result.chunks) == 3
+    assert [len(chunk) for _start, chunk, _ok in result.chunks] == [123, 123, 54]
+    assert client.read_registers(2000, 300) == [address + 1 for address in range(2000, 2300)]
+
+
+def test_write_many_fills_known_gaps_and_skips_unchanged(client):
+    client.read_registers(0, 20)
+    result = client.write_many({0: 100, 3: 103, 10: 110}, max_gap=2)
+    # 0 y 3 van juntos (hueco 1–2 conocido); 10 queda fuera del hueco máximo
+    assert [(start, chunk) for start, chunk, _ok in result.chunks] == [(0, [100, 1, 2, 103]), (10, [110])]
+    result = client.write_many({0: 100, 3: 999}, skip_unchanged=True)
+    assert result.skipped == [0]
+    assert result.succeeded == [3]
+
+
+def test_write_many_rejects_out_of_range_values(client):
+    with pytest.raises(ValueError, match="out of range"):
+        client.write_many({1: 65536})
+    assert client.request_count == 0
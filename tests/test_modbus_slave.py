@@ -0,0 +1,113 @@
+import socket
+import struct
+import threading
+
+import pytest
+from pyModbusTCP.client import ModbusClient
+
+from shared.protocol import MBAP_SIZE, build_frame, parse_mbap, read_registers_pdu
+from slave.modbus_slave import ModbusSlaveServer
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("closed")
+        data += chunk
+    return data
+
+
+def _recv_frame(sock):
+    transaction_id, length, unit_id = parse_mbap(_recv_exact(sock, MBAP_SIZE))
+    return transaction_id, _recv_exact(sock, length)
+
+
+@pytest.mark.parametrize("engine", ModbusSlaveServer.ENGINES)
+def test_engines_serve_reads_and_writes(slave_server, engine):
+    slave = slave_server(engine=engine)
+    client = ModbusClient("127.0.0.1", slave.server.port, auto_open=True, timeout=2)
+    assert client.write_multiple_registers(10, [1, 2, 3])
+    assert client.read_holding_registers(10, 3) == [1, 2, 3]
+    assert slave.databank.get_holding_registers(10, 3) == [1, 2, 3]
+    assert slave.request_count == 2
+    client.close()
+
+
+def test_async_engine_answers_pipelined_and_split_frames(slave_server):
+    slave = slave_server(engine="async")
+    slave.databank.set_holding_registers(0, [10, 20, 30])
+    with socket.create_connection(("127.0.0.1", slave.server.port), timeout=2) as sock:
+        frames = b"".join(build_frame(tid, 1, read_registers_pdu(tid, 1)) for tid in range(3))
+        # Tres peticiones en un envío, la última partida en dos
+        sock.sendall(frames[:-3])
+        sock.sendall(frames[-3:])
+        for tid in range(3):
+            assert _recv_frame(sock) == (tid, bytes((3, 2)) + struct.pack(">H", (tid + 1) * 10))
+
+
+def test_async_engine_closes_on_bad_protocol_id(slave_server):
+    slave = slave_server(engine="async")
+    with socket.create_connection(("127.0.0.1", slave.server.port), timeout=2) as sock:
+        sock.sendall(struct.pack(">HHHB", 1, 7, 6, 1) + read_registers_pdu(0, 1))
+        assert sock.recv(16) == b""
+
+
+def test_async_engine_serves_many_connections(slave_server):
+    slave = slave_server(engine="async")
+    slave.databank.set_input_registers(0, [42])
+    results = []
+
+    def worker():
+        client = ModbusClient("127.0.0.1", slave.server.port, auto_open=True, timeout=3)
+        results.append(all(client.read_input_registers(0, 1) == [42] for _ in range(5)))
+        client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 50
+    assert slave.request_count == 250
+
+
+def test_port_in_use_does_not_start(slave_server):
+    slave = slave_server(engine="async")
+    other = ModbusSlaveServer("127.0.0.1", slave.server.port, engine="async")
+    other.start()
+    assert not other.running
+
+
+# ------------------------------------------------
+# Granja de esclavos virtuales
+# ------------------------------------------------
+@pytest.mark.parametrize("engine", ModbusSlaveServer.ENGINES)
+def test_requests_are_routed_by_unit_id(slave_server, engine):
+    slave = slave_server(engine=engine)
+    for unit_id in range(1, 201):
+        slave.add_device(unit_id).set_holding_registers(0, [unit_id])
+    # 200 dispositivos dispersos con un valor cada uno ocupan muy poco
+    assert sum(store.nbytes for store in slave.devices.values()) < 200 * 4096
+    client = ModbusClient("127.0.0.1", slave.server.port, auto_open=True, timeout=2)
+    for unit_id in (1, 100, 200):
+        client.unit_id = unit_id
+        assert client.read_holding_registers(0, 1) == [unit_id]
+    client.unit_id = 201
+    assert client.read_holding_registers(0, 1) is None
+    assert client.last_except == 0x0B
+    client.close()
+
+
+def test_device_management():
+    server = ModbusSlaveServer("127.0.0.1", 0)
+    with pytest.raises(ValueError, match="Invalid unit ID"):
+        server.add_device(256)
+    assert server.device(7) is server.databank
+    store = server.add_device(7)
+    assert store.sparse and server.device(7) is store
+    assert server.device(8) is None
+    assert server.stores() == {None: server.databank, 7: store}
+    assert server.remove_device(7) is store
+    assert server.device(8) is server.databank
@@ -0,0 +1,88 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from master.modbus_master import ModbusMasterClient
+from master.pipeline import PipelinedModbusClient
+from shared.protocol import MBAP_SIZE, build_frame, parse_mbap, read_registers_pdu
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        data += sock.recv(size - len(data))
+    return data
+
+
+@pytest.fixture
+def reversing_server():
+    """Esclavo mínimo: lee `batch` peticiones FC3 y responde en orden inverso (la dirección como valor)."""
+    listener = socket.create_server(("127.0.0.1", 0))
+    batch = []
+
+    def serve(count):
+        conn, _ = listener.accept()
+        with conn:
+            requests = []
+            for _ in range(count):
+                tid, length, unit_id = parse_mbap(_recv_exact(conn, MBAP_SIZE))
+                requests.append((tid, unit_id, _recv_exact(conn, length)))
+            for tid, unit_id, pdu in reversed(requests):
+                address, quantity = struct.unpack_from(">HH", pdu, 1)
+                if address == 666:
+                    response = bytes((0x83, 0x02))
+                else:
+                    response = bytes((3, quantity * 2)) + struct.pack(f">{quantity}H", *([address] * quantity))
+                conn.sendall(build_frame(tid, unit_id, response))
+
+    def start(count):
+        thread = threading.Thread(target=serve, args=(count,), daemon=True)
+        thread.start()
+        batch.append(thread)
+        return listener.getsockname()[1]
+
+    yield start
+    listener.close()
+    for thread in batch:
+        thread.join(timeout=2)
+
+
+def test_responses_are_matched_by_transaction_id(reversing_server):
+    port = reversing_server(4)
+    client = PipelinedModbusClient(host="127.0.0.1", port=port, auto_open=True, timeout=2, max_in_flight=4)
+    responses = client.request_many([read_registers_pdu(address, 1) for address in (10, 20, 666, 40)])
+    client.close()
+    assert responses[0] == bytes((3, 2, 0, 10))
+    assert responses[1] == bytes((3, 2, 0, 20))
+    assert responses[2] is None
+    assert responses[3] == bytes((3, 2, 0, 40))
+
+
+def test_master_reads_large_ranges_in_pipeline(slave_server):
+    slave = slave_server(engine="async")
+    slave.databank.set_holding_registers(0, list(range(1000)))
+    client = ModbusMasterClient("127.0.0.1", slave.server.port, max_in_flight=4)
+    assert client.connect()
+    try:
+        assert isinstance(client.client, PipelinedModbusClient)
+        assert client.read_registers(0, 1000) == list(range(1000))
+        assert client.request_count == 8
+        scan = client.read_scan([0, (500, 3), 999])
+        assert scan == {0: 0, 500: 500, 501: 501, 502: 502, 999: 999}
+    finally:
+        client.disconnect()
+
+
+def test_falls_back_to_one_request_at_a_time(slave_server, monkeypatch):
+    from master import pipeline
+    # Una versión de pyModbusTCP sin los miembros privados que usa el pipeline
+    monkeypatch.setattr(pipeline, "PIPELINE_SUPPORTED", False)
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [5, 6])
+    client = PipelinedModbusClient(host="127.0.0.1", port=slave.server.port, auto_open=True, timeout=2,
+                                   max_in_flight=4)
+    responses = client.request_many([read_registers_pdu(0, 2), read_registers_pdu(65535, 2)])
+    client.close()
+    assert responses == [bytes((3, 4, 0, 5, 0, 6)), None]
@@ -0,0 +1,121 @@
+import struct
+import time
+
+import pytest
+from pyModbusTCP.client import ModbusClient
+
+from proxy.modbus_proxy import DownstreamDevice, ModbusProxy
+from shared.protocol import (
+    COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS, EXP_DATA_VALUE, EXP_GATEWAY_TARGET,
+    read_table_pdu, write_single_coil_pdu, write_multiple_coils_pdu, write_single_register_pdu,
+    write_multiple_registers_pdu,
+)
+from shared.bits import PackedBits
+from tests.conftest import free_port
+
+
+@pytest.fixture
+def device(slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(10, [1, 2, 3, 4])
+    slave.databank.set_input_registers(20, [7, 8])
+    slave.databank.set_coils(0, [1, 0, 1, 1])
+    slave.databank.set_discrete_inputs(5, [0, 1])
+    device = DownstreamDevice("127.0.0.1", slave.server.port, unit_id=1, ttl=60)
+    assert device.connect()
+    yield slave, device
+    device.close()
+
+
+@pytest.mark.parametrize("table, address, count, expected", [
+    (HOLDING_REGISTERS, 10, 4, bytes((3, 8)) + struct.pack(">4H", 1, 2, 3, 4)),
+    (INPUT_REGISTERS, 20, 2, bytes((4, 4)) + struct.pack(">2H", 7, 8)),
+    (COILS, 0, 4, bytes((1, 1, 0b1101))),
+    (DISCRETE_INPUTS, 5, 2, bytes((2, 1, 0b10))),
+])
+def test_reads_of_every_table_are_cached(device, table, address, count, expected):
+    slave, device = device
+    pdu = read_table_pdu(table, address, count)
+    assert device.handle(pdu) == expected
+    forwarded = device.master.request_count
+    # Repetida dentro del TTL: no llega al equipo aunque el valor haya cambiado
+    slave.databank.set_values(table, address, [0] * count)
+    assert device.handle(pdu) == expected
+    assert device.master.request_count == forwarded
+    assert device.stats()["hits"] >= 1
+
+
+def test_aligned_reads_share_blocks(device):
+    _slave, device = device
+    device.align = 8
+    assert device.handle(read_table_pdu(COILS, 1, 2)) == bytes((1, 1, 0b10))
+    forwarded = device.master.request_count
+    assert device.handle(read_table_pdu(COILS, 2, 3)) == bytes((1, 1, 0b011))
+    assert device.master.request_count == forwarded
+
+
+@pytest.mark.parametrize("pdu", [
+    write_single_register_pdu(11, 99),
+    write_multiple_registers_pdu(10, [5, 6]),
+])
+def test_register_writes_update_the_cache(device, pdu):
+    slave, device = device
+    read = read_table_pdu(HOLDING_REGISTERS, 10, 4)
+    device.handle(read)
+    assert device.handle(pdu) == pdu[:5]
+    expected = slave.databank.get_holding_registers(10, 4)
+    forwarded = device.master.request_count
+    assert device.handle(read) == bytes((3, 8)) + struct.pack(">4H", *expected)
+    assert device.master.request_count == forwarded
+
+
+@pytest.mark.parametrize("pdu, bits", [
+    (write_single_coil_pdu(1, True), 0b1111),
+    (write_multiple_coils_pdu(2, PackedBits.from_bools([0, 0])), 0b0001),
+])
+def test_coil_writes_update_the_cache(device, pdu, bits):
+    _slave, device = device
+    read = read_table_pdu(COILS, 0, 4)
+    device.handle(read)
+    assert device.handle(pdu) == pdu[:5]
+    forwarded = device.master.request_count
+    assert device.handle(read) == bytes((1, 1, bits))
+    assert device.master.request_count == forwarded
+
+
+def test_failed_coil_write_invalidates_the_cache(device):
+    slave, device = device
+    read = read_table_pdu(COILS, 0, 4)
+    device.handle(read)
+    # Trama FC15 incompleta: el equipo responde con una excepción
+    slave.databank.set_coils(0, [0, 0, 0, 0])
+    bad = write_multiple_coils_pdu(0, PackedBits.from_bools([1, 1]))[:-1]
+    assert device.handle(bad)[0] == 0x8F
+    assert device.handle(read) == bytes((1, 1, 0))
+
+
+def test_invalid_requests_and_unreachable_device():
+    device = DownstreamDevice("127.0.0.1", free_port(), timeout=0.2)
+    assert device.handle(read_table_pdu(COILS, 0, 2001)) == bytes((0x81, EXP_DATA_VALUE))
+    assert device.handle(read_table_pdu(HOLDING_REGISTERS, 0, 1)) == bytes((0x83, EXP_GATEWAY_TARGET))
+    assert device.handle(write_single_coil_pdu(0, True)) == bytes((0x85, EXP_GATEWAY_TARGET))
+
+
+def test_proxy_routes_by_unit_id(slave_server):
+    slave = slave_server()
+    slave.databank.set_input_registers(0, [42])
+    proxy = ModbusProxy("127.0.0.1", free_port())
+    proxy.add_target(5, "127.0.0.1", slave.server.port, target_unit_id=1)
+    proxy.start()
+    time.sleep(0.05)
+    try:
+        client = ModbusClient("127.0.0.1", proxy.server.port, unit_id=5, auto_open=True, timeout=2)
+        assert client.read_input_registers(0, 1) == [42]
+        assert client.write_single_coil(3, True)
+        assert slave.databank.get_coils(3, 1) == [1]
+        client.unit_id = 9
+        assert client.read_holding_registers(0, 1) is None
+        assert client.last_except == EXP_GATEWAY_TARGET
+        client.close()
+    finally:
+        proxy.stop()
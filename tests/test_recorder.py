@@ -0,0 +1,133 @@
+import csv
+import json
+import math
+
+import pytest
+
+from master import daq_cli, recorder
+from master.recorder import Recorder, export_csv, read_recording, read_schema
+
+GROUPS = [("fast", ["a", "b"]), ("slow", ["c"])]
+
+
+def _record(path, rows, **kwargs):
+    recorder = Recorder(str(path), GROUPS, **kwargs)
+    for group, timestamp, values in rows:
+        recorder.append(group, timestamp, values)
+    recorder.close()
+    return recorder
+
+
+def _blocks(path):
+    return [(name, list(stamps), {column: list(values) for column, values in data.items()})
+            for name, stamps, data in read_recording(str(path))]
+
+
+def test_round_trip_by_blocks(tmp_path):
+    path = tmp_path / "data.mbrec"
+    recorder = _record(path, [
+        ("fast", 1.0, {"a": 1, "b": 2}),
+        ("slow", 1.5, {"c": 3}),
+        ("fast", 2.0, {"a": 4, "b": 5}),
+        ("fast", 3.0, {"a": 6}),
+    ], block_rows=2, flush_interval=60)
+    assert recorder.rows == 4
+    blocks = _blocks(path)
+    # Bloque lleno de "fast" y después lo que quedaba en memoria al cerrar
+    assert blocks[:2] == [("fast", [1.0, 2.0], {"a": [1.0, 4.0], "b": [2.0, 5.0]}),
+                          ("fast", [3.0], {"a": [6.0], "b": [pytest.approx(math.nan, nan_ok=True)]})]
+    assert blocks[2] == ("slow", [1.5], {"c": [3.0]})
+    assert read_schema(str(path))[0] == {"groups": [{"name": "fast", "columns": ["a", "b"], "types": ["d", "d"]},
+                                                     {"name": "slow", "columns": ["c"], "types": ["d"]}]}
+
+
+def test_compact_column_types(tmp_path):
+    path = tmp_path / "data.mbrec"
+    recorder = Recorder(str(path), [("regs", [("r", "H"), ("coil", "bit"), ("temp", "d")])], flush_interval=60)
+    for i in range(100):
+        recorder.append("regs", float(i), {"r": 65535 - i, "coil": i % 3 == 0, "temp": i / 4} if i != 7 else {})
+    recorder.close()
+    [(name, stamps, data)] = _blocks(path)
+    assert stamps == [float(i) for i in range(100)]
+    assert data["r"][:3] == [65535.0, 65534.0, 65533.0] and data["coil"][:4] == [1.0, 0.0, 0.0, 1.0]
+    assert data["temp"][99] == 24.75
+    # Fila sin valores: NaN en todos los tipos
+    assert all(math.isnan(values[7]) for values in data.values())
+    # Por fila: timestamp 8 + uint16 2 + float64 8 bytes; bits y máscaras de validez empaquetados
+    _schema, data_start = read_schema(str(path))
+    assert path.stat().st_size - data_start == 6 + 100 * 18 + 3 * 13
+
+
+def test_unknown_column_type(tmp_path):
+    with pytest.raises(ValueError, match="Unknown column type 'f'"):
+        Recorder(str(tmp_path / "data.mbrec"), [("regs", [("r", "f")])])
+
+
+def test_reads_and_extends_version_1_files(tmp_path):
+    path = tmp_path / "data.mbrec"
+    _record(path, [("fast", 1.0, {"a": 1, "b": 2})])
+    # La versión 1 solo tenía columnas float64 y el esquema sin tipos
+    schema = json.dumps({"groups": [{"name": name, "columns": columns} for name, columns in GROUPS]}).encode()
+    _schema, data_start = read_schema(str(path))
+    blocks = path.read_bytes()[data_start:]
+    path.write_bytes(recorder._HEADER.pack(recorder.MAGIC, 1, len(schema)) + schema + blocks)
+    _record(path, [("fast", 2.0, {"a": 3, "b": 4})])
+    assert [(stamps, data["a"]) for _name, stamps, data in _blocks(path)] == [([1.0], [1.0]), ([2.0], [3.0])]
+
+
+def test_torn_tail_is_ignored_and_truncated_on_append(tmp_path):
+    path = tmp_path / "data.mbrec"
+    _record(path, [("fast", 1.0, {"a": 1, "b": 2}), ("slow", 2.0, {"c": 3})])
+    intact = path.stat().st_size
+    # Corte a mitad de escribir el último bloque
+    with open(path, "r+b") as f:
+        f.truncate(intact - 5)
+    assert [name for name, _stamps, _data in _blocks(path)] == ["fast"]
+
+    _record(path, [("slow", 5.0, {"c": 7})])
+    assert [(name, stamps) for name, stamps, _data in _blocks(path)] == [("fast", [1.0]), ("slow", [5.0])]
+
+
+def test_append_requires_the_same_schema(tmp_path):
+    path = tmp_path / "data.mbrec"
+    _record(path, [])
+    with pytest.raises(ValueError, match="different tag configuration"):
+        Recorder(str(path), [("fast", ["a"])])
+    other = tmp_path / "other.mbrec"
+    other.write_bytes(b"not a recording")
+    with pytest.raises(ValueError, match="Not a recording"):
+        read_schema(str(other))
+
+
+def test_export_csv(tmp_path):
+    path = tmp_path / "data.mbrec"
+    _record(path, [("fast", 1.0, {"a": 1.5, "b": None}), ("slow", 2.0, {"c": 3})])
+    out = tmp_path / "data.csv"
+    assert export_csv(str(path), str(out)) == 2
+    with open(out, newline="") as f:
+        assert list(csv.reader(f)) == [["timestamp", "group", "a", "b", "c"],
+                                       ["1.000000", "fast", "1.5", "", ""],
+                                       ["2.000000", "slow", "", "", "3"]]
+    assert export_csv(str(path), str(out), group="slow") == 1
+
+
+def test_daq_cli_records_exports_and_summarizes(slave_server, tmp_path, capsys, monkeypatch):
+    # No dejar instalado el manejador de SIGTERM de `record`
+    monkeypatch.setattr(daq_cli.signal, "signal", lambda *args: None)
+    slave = slave_server()
+    slave.databank.set_holding_registers(10, [7, 8])
+    path = tmp_path / "plc.mbrec"
+    assert daq_cli.main(["record", "--port", str(slave.server.port), "--name", "plc", "--registers", "10:2",
+                         "--rate", "0.05", "--duration", "0.5", "--stats", "0", "-o", str(path)]) == 0
+    blocks = _blocks(path)
+    assert blocks and {name for name, _stamps, _data in blocks} == {"plc.scan"}
+    assert all(set(data["10"]) == {7.0} for _name, _stamps, data in blocks)
+    assert read_schema(str(path))[0]["groups"][0]["types"] == ["H", "H"]
+
+    assert daq_cli.main(["info", str(path)]) == 0
+    assert "plc.scan:" in capsys.readouterr().out
+    out = tmp_path / "plc.csv"
+    assert daq_cli.main(["export", str(path), "-o", str(out)]) == 0
+    with open(out, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["timestamp", "group", "10", "11"] and rows[1][2:] == ["7", "8"]
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from master.modbus_master import ModbusMasterClient
+from master.register_cache import RegisterCache
+from shared.protocol import COILS, HOLDING_REGISTERS
+
+
+def test_ranges_expire_after_max_age():
+    cache = RegisterCache(max_age=1.0)
+    assert cache.get(0, 2, now=0) is None
+    cache.update(0, [1, 2], now=10)
+    assert cache.get(0, 2, now=10.5) == [1, 2]
+    assert cache.get(0, 2, now=11.5) is None
+    # Un registro sin leer invalida todo el rango
+    assert cache.get(0, 3, now=10.5) is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "inflight": 0}
+
+
+def test_strictest_rule_wins_on_overlap():
+    cache = RegisterCache(max_age=10.0)
+    cache.set_max_age(100, 10, 0.5)
+    cache.update(95, list(range(10)), now=0)
+    assert cache.get(95, 5, now=2) is not None
+    assert cache.get(95, 6, now=2) is None
+    assert cache.stale_blocks([(95, 5), (100, 5), (95, 10)], now=2) == [(100, 5), (95, 10)]
+
+
+def test_invalidate_and_peek():
+    cache = RegisterCache()
+    cache.update(10, [7, 8, 9])
+    cache.invalidate(11, 1)
+    assert cache.get(10, 1) == [7]
+    assert cache.get(10, 3) is None
+    assert cache.peek(10, 3) == [7, 8, 9]
+    cache.invalidate()
+    assert cache.get(10, 1) is None
+
+
+def test_claim_is_single_flight_for_covered_blocks():
+    cache = RegisterCache()
+    assert cache.claim(0, 100) is None
+    event = cache.claim(10, 20)
+    assert event is not None and not event.is_set()
+    # Un bloque no cubierto se lee aparte
+    assert cache.claim(50, 100) is None
+    cache.release(0, 100)
+    assert event.is_set()
+    assert cache.stats()["inflight"] == 1
+
+
+# ------------------------------------------------
+# Caché en el cliente maestro
+# ------------------------------------------------
+@pytest.fixture
+def slave(slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, list(range(100)))
+    slave.databank.set_coils(0, [1, 0, 1])
+    return slave
+
+
+@pytest.fixture
+def client(slave):
+    client = ModbusMasterClient("127.0.0.1", slave.server.port,
+                                cache={HOLDING_REGISTERS: RegisterCache(60), COILS: RegisterCache(60)})
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def test_fresh_blocks_are_served_from_cache(client, slave):
+    assert client.read_registers(0, 10) == list(range(10))
+    slave.databank.set_holding_registers(0, [99])
+    assert client.read_registers(0, 10) == list(range(10))
+    assert client.read_scan([2, 5]) == {2: 2, 5: 5}
+    assert client.request_count == 1
+    client.cache.invalidate()
+    assert client.read_registers(0, 1) == [99]
+    assert client.request_count == 2
+
+
+def test_writes_update_the_cache(client):
+    client.read_registers(0, 10)
+    assert client.write_register(3, 333)
+    assert client.write_many({5: 555, 6: 666}).ok
+    client.read_tables({COILS: [(0, 3)]})
+    assert client.write_coil(1, True)
+    count = client.request_count
+    assert client.read_registers(0, 10) == [0, 1, 2, 333, 4, 555, 666, 7, 8, 9]
+    assert client.read_tables({COILS: [(0, 3)]}) == {COILS: {0: True, 1: True, 2: True}}
+    assert client.request_count == count
+
+
+def test_concurrent_reads_of_a_block_share_one_request(client, monkeypatch):
+    fetch = client._fetch
+    calls = []
+
+    def slow_fetch(requests):
+        calls.append(requests)
+        time.sleep(0.2)
+        return fetch(requests)
+
+    monkeypatch.setattr(client, "_fetch", slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.read_registers(0, 50))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [list(range(50))] * 4
+    assert sum(map(len, calls)) == 1
@@ -0,0 +1,77 @@
+from array import array
+
+import pytest
+
+from shared.bits import PackedBits
+from slave.register_store import RegisterStore
+
+
+@pytest.fixture(params=[False, True], ids=["dense", "sparse"])
+def store(request):
+    return RegisterStore(sparse=request.param)
+
+
+def test_words_round_trip_and_range_checks(store):
+    assert store.set_holding_registers(65534, [1, 0x1FFFF])
+    assert store.get_holding_registers(65534, 2) == [1, 0xFFFF]
+    assert store.get_holding_registers(65535, 2) is None
+    assert store.set_input_registers(65535, [1, 2]) is None
+    assert store.get_input_registers(-1, 1) is None
+    assert store.write_words("input_registers", 10, array("H", [7, 8]))
+    assert store.get_input_registers_bytes(10, 2) == b"\x00\x07\x00\x08"
+
+
+def test_bits_round_trip_and_packed_access(store):
+    assert store.set_coils(7, [1, 1, 0, 1])
+    assert store.get_coils(7, 4) == [True, True, False, True]
+    assert store.get_coils_packed(7, 4) == bytes((0b1011,))
+    assert store.set_values_packed("discrete_inputs", 65530, PackedBits.from_bools([1] * 6))
+    assert store.get_discrete_inputs(65530, 6) == [True] * 6
+    assert store.set_values_packed("discrete_inputs", 65531, PackedBits.from_bools([1] * 6)) is None
+
+
+def test_clone_is_independent(store):
+    store.set_holding_registers(100, [5])
+    copy = store.clone()
+    store.set_holding_registers(100, [6])
+    assert copy.get_holding_registers(100, 1) == [5]
+    assert copy.sparse == store.sparse
+
+
+def test_memory_footprint():
+    dense = RegisterStore()
+    # 2 tablas de 65536 palabras + 2 de 65536 bits
+    assert dense.nbytes == 2 * 65536 * 2 + 2 * 65536 // 8
+    sparse = RegisterStore(sparse=True)
+    assert sparse.nbytes == 0
+    sparse.set_holding_registers(40000, [1])
+    assert 0 < sparse.nbytes < 4096
+
+
+def test_restore_requires_same_size():
+    with pytest.raises(ValueError, match="size mismatch"):
+        RegisterStore(16).restore(RegisterStore(32))
+
+
+# ------------------------------------------------
+# Notificación de cambios
+# ------------------------------------------------
+def test_subscribers_see_only_real_changes(store):
+    changes = []
+    callback = store.subscribe(lambda *change: changes.append(change))
+    store.set_holding_registers(10, [1, 2])
+    store.set_holding_registers(10, [1, 2])
+    store.set_coils(3, [1])
+    store.set_coils(3, [1])
+    assert changes == [("holding_registers", 10, 2), ("coils", 3, 1)]
+    store.unsubscribe(callback)
+    store.set_holding_registers(10, [5])
+    assert len(changes) == 2
+
+
+def test_failing_subscriber_does_not_block_writes(store):
+    seen = []
+    store.subscribe(lambda *change: 1 / 0)
+    store.subscribe(lambda *change: seen.append(change))
+    assert store.set_input_registers(0, [9])
+    assert seen == [("input_registers", 0, 1)]
@@ -0,0 +1,85 @@
+import gc
+
+import pytest
+from PySide6.QtCore import Qt
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QAbstractItemView
+
+
+def _dispose(widget):
+    """Destruye el widget en el hilo de la GUI (no en una recolección desde otro hilo)."""
+    widget.close()
+    widget.deleteLater()
+    QTest.qWait(0)
+    gc.collect()
+
+
+@pytest.fixture
+def model(qapp):
+    from shared.register_table import RegisterTableModel
+    return RegisterTableModel()
+
+
+def test_update_values_emits_only_changed_runs(model):
+    model.update_values(0, [1, 2, 3, 4])
+    changed = []
+    model.dataChanged.connect(lambda top, bottom, _roles: changed.append((top.row(), bottom.row())))
+    assert model.update_values(0, [1, 9, 9, 4, 5]) == 3
+    assert changed == [(1, 2), (4, 4)]
+    assert model.update_values(0, [1, 9, 9, 4, 5]) == 0
+
+
+def test_set_data_validates_against_max_value(model):
+    model.editable = True
+    rejected, edited = [], []
+    model.edit_rejected.connect(rejected.append)
+    model.value_edited.connect(lambda addr, value: edited.append((addr, value)))
+    index = model.index(10, model.VALUE_COLUMN)
+    assert model.setData(index, "70000") is False
+    assert model.setData(index, "42") is True
+    assert edited == [(10, 42)] and model.value(10) == 42
+    model.clear(max_value=1)
+    assert model.value(10) == 0
+    assert model.setData(index, "2") is False
+    assert rejected == ["Value must be between 0–65535.", "Value must be between 0–1."]
+
+
+def test_view_becomes_editable_when_model_does(model):
+    from shared.register_table import RegisterTableView
+    view = RegisterTableView(model)
+    view.resize(300, 300)
+    view.show()
+    try:
+        index = model.index(0, model.VALUE_COLUMN)
+        assert not model.flags(index) & Qt.ItemIsEditable
+        assert view.editTriggers() != QAbstractItemView.NoEditTriggers
+
+        model.editable = True
+        view.setCurrentIndex(index)
+        QTest.keyClick(view, Qt.Key_F2)
+        assert view.state() == QAbstractItemView.EditingState
+    finally:
+        _dispose(view)
+
+
+def test_slave_app_cells_are_editable_while_running(qapp, monkeypatch):
+    from slave.slave_app import SlaveApp
+    from tests.conftest import free_port
+    app = SlaveApp()
+    app.ip_input.setText("127.0.0.1")
+    app.port_input.setText(str(free_port()))
+    app.show()
+    try:
+        app.toggle_server()
+        assert app.server.running
+        index = app.model.index(5, app.model.VALUE_COLUMN)
+        app.table.setCurrentIndex(index)
+        # Como el usuario: F2 sobre la celda (edit(index) ignoraría los disparadores de edición)
+        QTest.keyClick(app.table, Qt.Key_F2)
+        assert app.table.state() == QAbstractItemView.EditingState
+        assert app.model.setData(index, "123")
+        assert app.server.databank.get_values("holding_registers", 5, 1) == [123]
+    finally:
+        if app.server and app.server.running:
+            app.toggle_server()
+        _dispose(app)
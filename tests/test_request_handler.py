@@ -0,0 +1,74 @@
+import struct
+
+import pytest
+
+from slave.register_store import RegisterStore
+from slave.request_handler import process_pdu
+
+
+@pytest.fixture
+def store():
+    store = RegisterStore()
+    store.set_holding_registers(0, [0x1234, 0x5678])
+    store.set_input_registers(65535, [9])
+    store.set_coils(0, [1, 0, 1, 1, 0, 0, 0, 0, 1])
+    store.set_discrete_inputs(65534, [0, 1])
+    return store
+
+
+@pytest.mark.parametrize("pdu, response", [
+    (bytes.fromhex("01 0000 0009"), bytes.fromhex("01 02 0d 01")),
+    (bytes.fromhex("02 fffe 0002"), bytes.fromhex("02 01 02")),
+    (bytes.fromhex("03 0000 0002"), bytes.fromhex("03 04 1234 5678")),
+    (bytes.fromhex("04 ffff 0001"), bytes.fromhex("04 02 0009")),
+])
+def test_reads(store, pdu, response):
+    assert process_pdu(store, pdu) == response
+
+
+def test_writes_echo_the_request(store):
+    pdu = bytes.fromhex("05 0001 ff00")
+    assert process_pdu(store, pdu) == pdu
+    pdu = bytes.fromhex("06 0010 abcd")
+    assert process_pdu(store, pdu) == pdu
+    assert process_pdu(store, bytes.fromhex("0f 0020 000a 02 ff 02")) == bytes.fromhex("0f 0020 000a")
+    assert process_pdu(store, bytes.fromhex("10 0030 0002 04 0001 0002")) == bytes.fromhex("10 0030 0002")
+    assert store.get_coils(0, 2) == [True, True]
+    assert store.get_holding_registers(16, 1) == [0xABCD]
+    assert store.get_coils(32, 10) == [True] * 8 + [False, True]
+    assert store.get_holding_registers(48, 2) == [1, 2]
+
+
+@pytest.mark.parametrize("pdu, response", [
+    # Función no soportada
+    (bytes.fromhex("2b 0e01 00"), bytes.fromhex("ab 01")),
+    # Trama corta
+    (bytes.fromhex("03 0000"), bytes.fromhex("83 03")),
+    (bytes.fromhex("10 0000 0001"), bytes.fromhex("90 03")),
+    # Cantidades fuera de límite
+    (bytes.fromhex("01 0000 0000"), bytes.fromhex("81 03")),
+    (bytes.fromhex("02 0000 07d1"), bytes.fromhex("82 03")),
+    (bytes.fromhex("03 0000 007e"), bytes.fromhex("83 03")),
+    (bytes.fromhex("04 0000 0000"), bytes.fromhex("84 03")),
+    # Valor de coil distinto de 0x0000/0xFF00
+    (bytes.fromhex("05 0000 0001"), bytes.fromhex("85 03")),
+    # Recuento de bytes incoherente o datos incompletos
+    (bytes.fromhex("0f 0000 0009 01 ff"), bytes.fromhex("8f 03")),
+    (bytes.fromhex("0f 0000 0009 02 ff"), bytes.fromhex("8f 03")),
+    (bytes.fromhex("10 0000 0002 04 0001"), bytes.fromhex("90 03")),
+    # Direcciones fuera de la tabla
+    (bytes.fromhex("01 fff0 0011"), bytes.fromhex("81 02")),
+    (bytes.fromhex("02 ffff 0002"), bytes.fromhex("82 02")),
+    (bytes.fromhex("03 ff84 007d"), bytes.fromhex("83 02")),
+    (bytes.fromhex("04 ffff 0002"), bytes.fromhex("84 02")),
+    (bytes.fromhex("0f ffff 0002 01 03"), bytes.fromhex("8f 02")),
+    (bytes.fromhex("10 ffff 0002 04 0001 0002"), bytes.fromhex("90 02")),
+])
+def test_exception_codes(store, pdu, response):
+    assert process_pdu(store, pdu) == response
+
+
+def test_rejected_writes_leave_the_store_untouched(store):
+    before = store.get_holding_registers(65534, 2)
+    process_pdu(store, bytes.fromhex("10 fffe 0003 06") + struct.pack(">3H", 1, 2, 3))
+    assert store.get_holding_registers(65534, 2) == before
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from master.modbus_master import ModbusMasterClient
+from master.scheduler import ScanScheduler
+from master.tags import Tag, TagSet
+from shared.protocol import COILS, HOLDING_REGISTERS
+
+
+class FakeClient:
+    """Cliente simulado: cada dirección vale su propio número; `delay` simula un dispositivo lento."""
+
+    def __init__(self, delay=0.0, missing=(), fail=False):
+        self.delay = delay
+        self.missing = set(missing)
+        self.fail = fail
+        self.calls = []
+
+    def read_tables(self, scans):
+        self.calls.append({table: list(addresses) for table, addresses in scans.items()})
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("link down")
+        result = {}
+        for table, addresses in scans.items():
+            values = result.setdefault(table, {})
+            for item in addresses:
+                start, count = item if isinstance(item, tuple) else (item, 1)
+                values.update((addr, addr) for addr in range(start, start + count) if addr not in self.missing)
+        return result
+
+
+def test_groups_close_to_due_share_requests():
+    client = FakeClient()
+    scheduler = ScanScheduler(client)
+    scheduler.add_group("fast", [1, 2], rate=1.0)
+    now = time.monotonic()
+    assert [r.group for r in scheduler.run_pending(now)] == ["fast"]
+
+    scheduler.add_group("slow", [(10, 2)], rate=2.0, table=COILS)
+    # "slow" vence ya y "fast" vence en 0.2 s (dentro de la ventana del 25 %)
+    results = scheduler.run_pending(now + 0.8)
+    assert sorted(r.group for r in results) == ["fast", "slow"]
+    assert client.calls[-1] == {HOLDING_REGISTERS: [1, 2], COILS: [(10, 2)]}
+    assert {r.group: r.values for r in results} == {"fast": {1: 1, 2: 2}, "slow": {10: 10, 11: 11}}
+    assert scheduler.run_pending(now + 0.9) == []
+    assert len(client.calls) == 2
+
+
+def test_tag_groups_and_missing_values():
+    client = FakeClient(missing={5})
+    scheduler = ScanScheduler(client)
+    scheduler.add_group("tags", TagSet([Tag("a", 0), Tag("b", 4, "uint32")]), rate=1.0)
+    scheduler.add_group("raw", [(3, 3)], rate=1.0)
+    results = {r.group: r for r in scheduler.run_pending(time.monotonic())}
+    assert results["tags"].values == {"a": 0, "b": None}
+    assert results["tags"].error == "1 values missing"
+    assert results["raw"].values == {3: 3, 4: 4}
+    assert not results["raw"].ok
+    assert scheduler.stats()["raw"]["errors"] == 1
+
+
+def test_read_errors_are_reported_per_group():
+    scheduler = ScanScheduler(FakeClient(fail=True))
+    scheduler.add_group("g", [0], rate=1.0)
+    [result] = scheduler.run_pending(time.monotonic())
+    assert result.error == "link down" and result.values == {}
+
+
+def test_slow_device_backs_off_and_recovers():
+    client = FakeClient(delay=0.03)
+    scheduler = ScanScheduler(client, max_backoff=2.0)
+    group = scheduler.add_group("g", [0], rate=0.01)
+    for _ in range(3):
+        scheduler.run_pending(group.next_due)
+    assert group.interval == pytest.approx(0.02)
+    assert group.backoff == pytest.approx(2.0)
+    client.delay = 0.0
+    scheduler.run_pending(group.next_due)
+    assert group.interval == pytest.approx(0.01)
+
+
+def test_missed_cycles_are_counted():
+    scheduler = ScanScheduler(FakeClient())
+    group = scheduler.add_group("g", [0], rate=1.0)
+    now = time.monotonic()
+    scheduler.run_pending(now)
+    scheduler.run_pending(now + 3.5)
+    assert group.missed == 2
+    assert group.max_lateness == pytest.approx(2.5)
+
+
+@pytest.mark.parametrize("tags, rate, table, message", [
+    ([0], 0, HOLDING_REGISTERS, "Scan rate"),
+    ([0], 1, "registers", "Unknown table"),
+    (TagSet([Tag("a", 0)]), 1, COILS, "register table"),
+])
+def test_invalid_groups(tags, rate, table, message):
+    with pytest.raises(ValueError, match=message):
+        ScanScheduler(FakeClient()).add_group("g", tags, rate, table)
+
+
+def test_background_thread_against_slave(slave_server):
+    slave = slave_server()
+    slave.databank.set_holding_registers(0, [7, 8])
+    slave.databank.set_coils(0, [1])
+    client = ModbusMasterClient("127.0.0.1", slave.server.port)
+    assert client.connect()
+    scheduler = ScanScheduler(client)
+    scheduler.add_group("regs", [0, 1], rate=0.05)
+    scheduler.add_group("coils", [0], rate=0.05, table=COILS)
+    results = []
+    done = threading.Event()
+
+    def callback(result):
+        results.append(result)
+        if len(results) >= 4:
+            done.set()
+
+    scheduler.start(callback)
+    try:
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
+        client.disconnect()
+    values = {r.group: r.values for r in results if r.ok}
+    assert values == {"regs": {0: 7, 1: 8}, "coils": {0: True}}
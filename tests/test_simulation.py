@@ -0,0 +1,100 @@
+import math
+import pytest
+from slave import simulation
+from slave.register_store import RegisterStore, COILS, DISCRETE_INPUTS, HOLDING_REGISTERS, INPUT_REGISTERS
+from slave.simulation import SimulationEngine, Ramp, Sine, RandomWalk, Counter, StepProfile
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    """Ejecuta la prueba con NumPy (si está instalado) y con las tablas array('H')."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(simulation, "np", None)
+    return request.param
+
+
+def _close(values, expected, tolerance):
+    return all(abs(int(v) - e) <= tolerance for v, e in zip(values, expected))
+
+
+def test_ramp_spreads_phase_per_register(backend):
+    ramp = Ramp(0, 4, low=0, high=400, period=1.0)
+    assert list(map(int, ramp.values(0.0))) == [0, 100, 200, 300]
+    assert list(map(int, ramp.values(0.25))) == [100, 200, 300, 0]
+    # Entre muestras de la tabla precalculada el error es de una muestra como mucho
+    expected = [400 * ((0.1234 + i / 4) % 1.0) for i in range(4)]
+    assert _close(ramp.values(0.1234), expected, 1)
+
+
+def test_sine_matches_formula(backend):
+    sine = Sine(10, 1000, amplitude=1000, offset=2000, period=2.0)
+    for t in (0.0, 0.37, 1.5, 123.456):
+        expected = [2000 + 1000 * math.sin(2 * math.pi * (t / 2.0 + i / 1000)) for i in range(1000)]
+        values = sine.values(t)
+        assert len(values) == 1000
+        assert _close(values, expected, 2)
+
+
+def test_sine_without_spread_is_uniform(backend):
+    values = list(map(int, Sine(0, 8, spread=False, period=1.0).values(0.3)))
+    assert len(set(values)) == 1
+
+
+def test_random_walk_stays_in_bounds_and_moves(backend):
+    walk = RandomWalk(0, 50, step=100, low=1000, high=2000, seed=3)
+    blocks = [list(map(int, walk.values(t))) for t in range(200)]
+    assert all(len(block) == 50 and all(1000 <= v <= 2000 for v in block) for block in blocks)
+    assert blocks[0] != blocks[-1]
+    # Cada paso por registro es como mucho `step` (redondeo incluido)
+    assert all(abs(a - b) <= 101 for prev, block in zip(blocks, blocks[1:]) for a, b in zip(prev, block))
+
+
+def test_counter_and_step_profile(tmp_path):
+    counter = Counter(0, 3, step=0x8000)
+    assert list(counter.values(0)) == [0x8000] * 3
+    assert list(counter.values(0)) == [0] * 3
+    path = tmp_path / "profile.csv"
+    path.write_text("time,value\n0,1,2\n1,5\n2,9\n")
+    profile = StepProfile(0, 3, str(path))
+    assert list(profile.values(0.5)) == [1, 2, 1]
+    assert list(profile.values(1.0)) == [5, 5, 5]
+    assert list(profile.values(2.5)) == [1, 2, 1]     # se repite cada 2 s
+
+
+@pytest.mark.parametrize("row", ["0,-1,70000", "0,65536", "0,1.5", "0,abc"])
+def test_step_profile_rejects_invalid_values(tmp_path, row):
+    path = tmp_path / "profile.csv"
+    path.write_text(f"time,value\n0,1\n{row}\n")
+    with pytest.raises(ValueError, match="Invalid profile row 3"):
+        StepProfile(0, 2, str(path))
+
+
+def test_engine_tick_writes_blocks_and_notifies(backend):
+    store = RegisterStore()
+    changes = []
+    store.subscribe(lambda table, address, count: changes.append((table, address, count)))
+    engine = SimulationEngine(store)
+    engine.add(Ramp(100, 4, low=0, high=400, period=1.0))
+    engine.add(Counter(0, 2))
+    engine.add(Sine(0, 2, table=INPUT_REGISTERS))
+    engine.tick(0.25)
+    assert store.get_values(HOLDING_REGISTERS, 100, 4) == [100, 200, 300, 0]
+    assert store.get_values(HOLDING_REGISTERS, 0, 2) == [1, 1]
+    assert (HOLDING_REGISTERS, 100, 4) in changes and len(changes) == 3
+
+
+@pytest.mark.parametrize("table", [COILS, DISCRETE_INPUTS])
+def test_engine_rejects_bit_tables(table):
+    engine = SimulationEngine(RegisterStore())
+    with pytest.raises(ValueError, match="only write holding or input registers"):
+        engine.add(Counter(0, 1, table=table))
+
+
+def test_engine_rejects_out_of_range():
+    engine = SimulationEngine(RegisterStore())
+    with pytest.raises(ValueError, match="out of range"):
+        engine.add(Ramp(65530, 10))
+    with pytest.raises(ValueError):
+        engine.rate = 1000
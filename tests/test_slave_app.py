@@ -0,0 +1,49 @@
+import gc
+import threading
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtTest import QTest
+
+from tests.conftest import free_port
+
+
+@pytest.fixture
+def app(qapp):
+    from slave.slave_app import SlaveApp
+    window = SlaveApp()
+    window.ip_input.setText("127.0.0.1")
+    window.port_input.setText(str(free_port()))
+    window.toggle_server()
+    assert window.server.running
+    yield window
+    if window.server and window.server.running:
+        window.toggle_server()
+    window.close()
+    # Destruir la ventana en el hilo de la GUI (no en una recolección desde otro hilo)
+    window.deleteLater()
+    QTest.qWait(0)
+    del window
+    gc.collect()
+
+
+def test_changes_from_other_threads_are_coalesced(app):
+    emitted = []
+    app.registers_changed.connect(lambda: emitted.append(1))
+
+    def write():
+        for address in (5, 50, 20):
+            app.server.databank.set_holding_registers(address, [address])
+        # Otra tabla: no se muestra, no avisa
+        app.server.databank.set_input_registers(0, [1])
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+    assert app._dirty == (5, 51)
+    QTest.qWait(50)
+    assert len(emitted) == 1
+    assert app._dirty is None
+    assert [app.model.value(address) for address in (5, 20, 50)] == [5, 20, 50]
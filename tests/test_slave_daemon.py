@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from pyModbusTCP.client import ModbusClient
+from slave.slave_daemon import SlaveDaemon, load_config, main
+from tests.conftest import free_port
+
+
+def _daemon(tmp_path, server):
+    path = tmp_path / "daemon.json"
+    path.write_text(json.dumps({"engine": "async", "servers": [{"port": free_port(), **server}]}))
+    return SlaveDaemon(load_config(str(path)))
+
+
+def test_values_for_all_tables(tmp_path):
+    daemon = _daemon(tmp_path, {"values": {
+        "holding_registers": {"100": [1, 2, 3]},
+        "input": {"0x10": 7},
+        "coils": {"0": [1, 0, 1]},
+        "di": {"9": [0, 1]},
+    }})
+    store = daemon.servers[0].databank
+    assert store.get_values("holding_registers", 100, 3) == [1, 2, 3]
+    assert store.get_values("input_registers", 16, 1) == [7]
+    assert store.get_values("coils", 0, 3) == [True, False, True]
+    assert store.get_values("discrete_inputs", 9, 2) == [False, True]
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"holding_registers": {"65535": [1, 2]}}, "values.holding_registers.65535 does not fit"),
+    ({"coils": {"65535": [1, 1]}}, "values.coils.65535 does not fit"),
+    ({"hr": {"0": [70000]}}, "Invalid value in values.hr.0"),
+    ({"coils": {"0": [2]}}, "Invalid value in values.coils.0"),
+    ({"nope": {"0": [1]}}, "Unknown table: nope"),
+])
+def test_invalid_values_name_the_entry(tmp_path, values, message):
+    with pytest.raises(ValueError, match=message):
+        _daemon(tmp_path, {"values": values})
+
+
+def test_profiles_per_server_and_replica(tmp_path):
+    daemon = _daemon(tmp_path, {"profile": {"max_connections": 2},
+                                "devices": [{"unit_ids": [1, 3], "profile": {"latency": 0.01}}]})
+    server = daemon.servers[0]
+    assert daemon.devices == 3
+    assert server.server.max_connections == 2
+    assert server.profiles[1] is not server.profiles[2]
+    assert server.profiles[3].latency == 0.01
+
+
+def test_unknown_profile_option(tmp_path):
+    with pytest.raises(ValueError, match="Unknown profile option: bogus"):
+        _daemon(tmp_path, {"profile": {"bogus": 1}})
+
+
+@pytest.mark.parametrize("without_resource", [False, True])
+def test_start_and_stop(tmp_path, monkeypatch, without_resource):
+    from slave import slave_daemon
+    if without_resource:
+        # Windows no tiene el módulo resource
+        monkeypatch.setattr(slave_daemon, "resource", None)
+    daemon = _daemon(tmp_path, {"devices": [{"unit_ids": [1, 3]}]})
+    assert daemon.start()
+    try:
+        assert daemon.devices == 3
+        assert all(server.running for server in daemon.servers)
+    finally:
+        daemon.stop(0)
+    assert not any(server.running for server in daemon.servers)
+
+
+def test_stop_drains_in_flight_requests(tmp_path):
+    daemon = _daemon(tmp_path, {"profile": {"latency": 0.3}, "values": {"hr": {"0": [42]}}})
+    assert daemon.start()
+    client = ModbusClient("127.0.0.1", daemon.servers[0].server.port, auto_open=True, timeout=2)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(client.read_holding_registers(0, 1)))
+    thread.start()
+    time.sleep(0.1)
+    # La petición en curso recibe su respuesta antes del cierre
+    daemon.stop(2)
+    thread.join()
+    client.close()
+    assert results == [[42]]
+
+
+def test_check_validates_the_configuration(tmp_path, capsys):
+    path = tmp_path / "daemon.json"
+    # Rangos inclusivos: 3 puertos con 2 dispositivos cada uno
+    path.write_text(json.dumps({"servers": [{"ports": [20000, 20002], "devices": [{"unit_ids": [1, 2]}]}]}))
+    assert main([str(path), "--check"]) == 0
+    assert capsys.readouterr().out.strip() == "3 servers, 6 devices, 0 generators"
+
+
+def test_daemon_does_not_import_qt():
+    code = "import sys, slave.slave_daemon; print(any(name.startswith('PySide6') for name in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,104 @@
+import pytest
+
+from slave.register_store import RegisterStore
+from slave.snapshot import PersistentSnapshot, import_csv, load_snapshot, save_snapshot
+
+
+def _csv(tmp_path, text):
+    path = tmp_path / "values.csv"
+    path.write_text(text)
+    return str(path)
+
+
+# ------------------------------------------------
+# Importación CSV
+# ------------------------------------------------
+def test_import_csv_groups_tables_and_skips_header(tmp_path):
+    store = RegisterStore()
+    path = _csv(tmp_path, "table,address,value\nhr,10,1\nhr,11,0x10\nco,5,1\nir,0,65535\n# comentario\n")
+    assert import_csv(path, store) == 4
+    assert store.get_holding_registers(10, 2) == [1, 16]
+    assert store.get_coils(5, 1) == [1]
+    assert store.get_input_registers(0, 1) == [65535]
+
+
+@pytest.mark.parametrize("text, line", [
+    ("hr,1,70000\n", 1),
+    ("address,value\n1,-1\n", 2),
+    ("table,address,value\nco,3,2\n", 2),
+    ("di,0,1\ndi,1,5\n", 2),
+])
+def test_import_csv_rejects_out_of_range_values(tmp_path, text, line):
+    store = RegisterStore()
+    with pytest.raises(ValueError, match=f"Invalid CSV row {line}"):
+        import_csv(_csv(tmp_path, text), store)
+    assert store.get_holding_registers(0, 2) == [0, 0]
+
+
+def test_import_csv_rejects_blocks_out_of_range(tmp_path):
+    with pytest.raises(ValueError, match="out of range"):
+        import_csv(_csv(tmp_path, "hr,65535,1\nhr,65536,1\n"), RegisterStore())
+
+
+# ------------------------------------------------
+# Snapshots
+# ------------------------------------------------
+@pytest.mark.parametrize("sparse, dense", [(False, False), (True, False), (True, True)])
+def test_snapshot_round_trip(tmp_path, sparse, dense):
+    stores = {None: RegisterStore(sparse=sparse), 7: RegisterStore(sparse=sparse)}
+    stores[None].set_holding_registers(100, [1, 2, 3])
+    stores[7].set_input_registers(65533, [4, 5, 6])
+    stores[7].set_coils(9, [1, 0, 1])
+    path = str(tmp_path / "regs.snap")
+    save_snapshot(path, stores, dense=dense)
+
+    loaded = load_snapshot(path)
+    assert set(loaded) == {None, 7}
+    assert loaded[None].get_holding_registers(100, 3) == [1, 2, 3]
+    assert loaded[7].get_input_registers(65533, 3) == [4, 5, 6]
+    assert loaded[7].get_coils(9, 3) == [1, 0, 1]
+
+
+def test_persistent_snapshot_keeps_state_across_reopen(tmp_path):
+    path = str(tmp_path / "live.snap")
+    store = RegisterStore()
+    snapshot = PersistentSnapshot(path, {1: store})
+    store.set_holding_registers(42, [1234])
+    snapshot.close()
+
+    reopened = RegisterStore()
+    snapshot = PersistentSnapshot(path, {1: reopened})
+    assert reopened.get_holding_registers(42, 1) == [1234]
+    snapshot.close()
+
+
+def test_reuse_checks_the_whole_directory(tmp_path):
+    path = str(tmp_path / "farm.snap")
+    stores = {unit_id: RegisterStore(size=16) for unit_id in range(300)}
+    save_snapshot(path, stores, dense=True)
+    assert PersistentSnapshot._reusable(path, stores)
+
+    # Un dispositivo distinto más allá de la entrada 256 invalida el fichero
+    changed = dict(stores)
+    del changed[299]
+    changed[1000] = RegisterStore(size=16)
+    assert not PersistentSnapshot._reusable(path, changed)
+
+    # Dispositivos de más en el fichero, o un fichero truncado, tampoco sirven
+    assert not PersistentSnapshot._reusable(path, {unit_id: stores[unit_id] for unit_id in range(299)})
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 8)
+    assert not PersistentSnapshot._reusable(path, stores)
+
+
+def test_reopen_with_new_device_recovers_existing_state(tmp_path):
+    path = str(tmp_path / "live.snap")
+    first = RegisterStore(size=16)
+    first.set_holding_registers(3, [77])
+    PersistentSnapshot(path, {1: first}).close()
+
+    recovered, added = RegisterStore(size=16), RegisterStore(size=16)
+    snapshot = PersistentSnapshot(path, {1: recovered, 2: added})
+    assert recovered.get_holding_registers(3, 1) == [77]
+    assert load_snapshot(path).keys() == {1, 2}
+    snapshot.close()
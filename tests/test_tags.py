@@ -0,0 +1,85 @@
+import struct
+
+import pytest
+
+from master.tags import Tag, TagSet, load_tags
+
+
+def _words(fmt, value):
+    """Registros (palabra alta primero, bytes big-endian) de un valor empaquetado con `fmt`."""
+    raw = struct.pack(f">{fmt}", value)
+    return list(struct.unpack(f">{len(raw) // 2}H", raw))
+
+
+@pytest.mark.parametrize("type, fmt, value", [
+    ("int16", "h", -2),
+    ("uint16", "H", 65000),
+    ("int32", "i", -100000),
+    ("uint32", "I", 4000000000),
+    ("int64", "q", -(1 << 40)),
+    ("uint64", "Q", 1 << 63),
+    ("float32", "f", 1.5),
+    ("float64", "d", -0.125),
+])
+def test_numeric_types(type, fmt, value):
+    words = _words(fmt, value)
+    tags = TagSet([Tag("a", 10, type), Tag("b", 20, type, word_order="little")])
+    registers = dict(zip(range(10, 10 + len(words)), words))
+    registers.update(zip(range(20, 20 + len(words)), reversed(words)))
+    assert tags.decode(registers) == {"a": value, "b": value}
+
+
+def test_byte_order_scale_and_offset():
+    swapped = struct.unpack("<H", struct.pack(">H", 1234))[0]
+    tags = TagSet([
+        Tag("swapped", 0, "uint16", byte_order="little"),
+        Tag("scaled", 1, "int16", scale=0.1, offset=-5),
+    ])
+    assert tags.decode([swapped, 300]) == {"swapped": 1234, "scaled": pytest.approx(25.0)}
+
+
+def test_strings_and_bitfields():
+    tags = TagSet([
+        Tag("model", 0, "string", length=5),
+        Tag("mode", 3, "bitfield", bit=4, width=3),
+        Tag("flag", 3, "bitfield", bit=15),
+    ])
+    words = list(struct.unpack(">3H", b"PLC1\x00\x00"))
+    assert tags.decode(words + [0b1000_0000_0101_0000]) == {"model": "PLC1", "mode": 5, "flag": 1}
+
+
+def test_missing_registers_give_none():
+    tags = TagSet([Tag("a", 0, "uint32"), Tag("b", 2, "uint32"), Tag("c", 10)])
+    result = tags.decode({0: 0, 1: 7, 2: 1})
+    assert result == {"a": 7, "b": None, "c": None}
+    assert tags.addresses() == [(0, 2), (2, 2), (10, 1)]
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"type": "int8"}, "Unknown tag type"),
+    ({"word_order": "middle"}, "Invalid word/byte order"),
+    ({"type": "bitfield", "bit": 12, "width": 8}, "Invalid bitfield"),
+    ({"address": 65535, "type": "uint32"}, "out of range"),
+])
+def test_invalid_tags(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        Tag("x", **{"address": 0, **kwargs})
+
+
+def test_duplicate_names_are_rejected():
+    with pytest.raises(ValueError, match="Duplicate"):
+        TagSet([Tag("x", 0), Tag("x", 1)])
+
+
+def test_load_tags_from_csv(tmp_path):
+    path = tmp_path / "tags.csv"
+    path.write_text("name,address,type,word_order,scale\n"
+                    "temp,0,int16,,0.5\n"
+                    "energy,1,uint32,little,\n")
+    tags = load_tags(str(path))
+    assert [tag.name for tag in tags] == ["temp", "energy"]
+    assert tags.decode([10, 2, 1]) == {"temp": 5.0, "energy": (1 << 16) + 2}
+
+    path.write_text("name,address\ntemp,abc\n")
+    with pytest.raises(ValueError, match="Invalid address in tag row 2"):
+        load_tags(str(path))